@@ -1,10 +1,23 @@
 """Health and bootstrap endpoints."""
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
 from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 
 from app.databricks import delta_tables, vector_search
+from app.utils.logging import get_logger
+from app.utils.metrics import span
 
+logger = get_logger(__name__)
 router = APIRouter(prefix="/health", tags=["health"])
 
+# (name, step, gating): gating steps run first and must succeed before the service is
+# ready; the rest run afterwards in the background and only log failures.
+WarmupStep = Tuple[str, Callable[[], Any], bool]
+
 
 def bootstrap_platform() -> None:
     """Initialize tables and vector index if they do not exist.
@@ -16,7 +29,80 @@ def bootstrap_platform() -> None:
     vector_search.ensure_vector_index()
 
 
-@router.get("/ready")
-async def readiness_probe() -> dict[str, str]:
-    """Return a simple readiness payload."""
+class Readiness:
+    """Background warm-up whose completion gates ``/health/ready``.
+
+    Steps run in order on the threadpool after the server starts accepting
+    connections, so the process is live (``/health/live``) immediately and a load
+    balancer only routes traffic once indexes are mapped and services are built.
+    Non-gating steps (such as contacting the MLflow tracking server) follow once the
+    service is ready, so a slow or unreachable dependency never delays readiness.
+    """
+
+    def __init__(self) -> None:
+        self.status = "starting"
+        self.error: Optional[str] = None
+        self.steps_ms: Dict[str, float] = {}
+        self.warnings: Dict[str, str] = {}
+        self.started = time.perf_counter()
+        self.ready_ms: Optional[float] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._settled = asyncio.Event()
+
+    def start(self, steps: List[WarmupStep]) -> None:
+        self.started = time.perf_counter()
+        self._task = asyncio.get_running_loop().create_task(self._run(steps))
+
+    async def wait(self) -> None:
+        """Wait until the service is ready or warm-up has failed."""
+        await self._settled.wait()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "error": self.error,
+            "ready_ms": self.ready_ms,
+            "steps_ms": self.steps_ms,
+            "warnings": self.warnings,
+        }
+
+    async def _run(self, steps: List[WarmupStep]) -> None:
+        for name, step, _ in (entry for entry in steps if entry[2]):
+            try:
+                await self._step(name, step)
+            except Exception as exc:  # noqa: BLE001 - reported through the readiness probe.
+                self.status, self.error = "failed", f"{name}: {exc}"
+                logger.exception("Startup warm-up failed", extra={"step": name})
+                self._settled.set()
+                return
+        self.ready_ms = (time.perf_counter() - self.started) * 1000
+        self.status = "ok"
+        self._settled.set()
+        logger.info("Startup warm-up complete", extra={"ready_ms": self.ready_ms, "steps_ms": self.steps_ms})
+        for name, step, _ in (entry for entry in steps if not entry[2]):
+            try:
+                await self._step(name, step)
+            except Exception as exc:  # noqa: BLE001 - optional; retried lazily on first use.
+                self.warnings[name] = str(exc)
+                logger.warning("Background warm-up step failed", extra={"step": name, "error": str(exc)})
+
+    async def _step(self, name: str, step: Callable[[], Any]) -> None:
+        begin = time.perf_counter()
+        with span(f"warmup_{name}"):
+            await run_in_threadpool(step)
+        self.steps_ms[name] = (time.perf_counter() - begin) * 1000
+
+
+readiness = Readiness()
+
+
+@router.get("/live")
+async def liveness_probe() -> Dict[str, str]:
+    """Report that the process is serving HTTP, warm or not."""
     return {"status": "ok"}
+
+
+@router.get("/ready")
+async def readiness_probe() -> JSONResponse:
+    """Return 200 once startup warm-up has finished, 503 while starting or after a failure."""
+    return JSONResponse(readiness.to_dict(), status_code=200 if readiness.status == "ok" else 503)
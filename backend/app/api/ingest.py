@@ -1,14 +1,143 @@
 """Document ingestion routes."""
-from fastapi import APIRouter, UploadFile
+import tempfile
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 
+from fastapi import APIRouter, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+from app.databricks import vector_search
+from app.services.bulk_ingestion_service import BulkFile, BulkIngestionService, expand_upload
 from app.services.ingestion_service import IngestionService
+from app.services.pipeline_service import IngestionPipeline
 
 router = APIRouter(prefix="/ingest", tags=["ingest"])
-service = IngestionService()
+
+
+@lru_cache()
+def get_service() -> IngestionService:
+    """Return the process-wide ingestion service, built on first use."""
+    return IngestionService()
+
+
+@lru_cache()
+def get_bulk_service() -> BulkIngestionService:
+    """Return the process-wide bulk service; ``main`` starts its shared worker pool at startup."""
+    return BulkIngestionService()
+
+
+@lru_cache()
+def get_pipeline() -> IngestionPipeline:
+    """Return the process-wide pipeline, sharing the ingestion service's chunker."""
+    return IngestionPipeline(chunking=get_service().chunking)
 
 
 @router.post("/")
-async def ingest_document(file: UploadFile) -> dict[str, str]:
-    """Ingest a document and push into the Delta raw table."""
-    doc_id = await service.ingest_file(file)
-    return {"document_id": doc_id}
+async def ingest_document(
+    file: UploadFile, stream: bool = False, document_id: Optional[str] = None
+) -> Dict[str, Optional[str]]:
+    """Ingest a document and push into the Delta raw table.
+
+    Each upload becomes a new document unless ``document_id`` names an existing one, in
+    which case that document is re-ingested and chunks it no longer has are removed.
+    ``stream=true`` reads the upload in fixed-size blocks and also writes parsed text
+    and chunks, keeping memory bounded for very large files. When the background
+    pipeline is enabled the document is chunked and embedded asynchronously; poll
+    ``/ingest/jobs/{job_id}`` to see when it becomes searchable.
+    """
+    service, pipeline = get_service(), get_pipeline()
+    if not (service.settings.pipeline_enabled and pipeline.running):
+        doc_id = await (
+            service.ingest_file_streaming(file, document_id=document_id)
+            if stream
+            else service.ingest_file(file, document_id)
+        )
+        return {"document_id": doc_id, "job_id": None}
+    if stream:
+        job = pipeline.create_job()
+        try:
+            doc_id = await service.ingest_file_streaming(
+                file,
+                on_chunks=lambda _doc, batch: pipeline.submit_chunks_threadsafe(job, batch),
+                document_id=document_id,
+            )
+        except Exception as exc:
+            pipeline.fail(job, exc)
+            raise
+        job.document_id = doc_id
+        pipeline.seal(job)
+    else:
+        document = await service.ingest_upload(file, document_id)
+        job = await pipeline.submit_document(document)
+        doc_id = document.id
+    return {"document_id": doc_id, "job_id": job.id}
+
+
+@router.post("/bulk")
+async def ingest_bulk(files: List[UploadFile]) -> Dict[str, Any]:
+    """Ingest many files (or zip/tar archives of files) in one request.
+
+    Uploads and archive members are spooled to a temporary directory rather than read
+    into memory. Normalization and chunking fan out across the shared process pool and
+    Delta writes are grouped; the run is tracked as one MLflow run. With the pipeline
+    enabled, chunks are queued for embedding under a single job id.
+    """
+    service, pipeline = get_service(), get_pipeline()
+    job = pipeline.create_job() if service.settings.pipeline_enabled and pipeline.running else None
+    on_chunks = None if job is None else lambda chunks: pipeline.submit_chunks_threadsafe(job, chunks)
+    with tempfile.TemporaryDirectory(prefix="rag-bulk-") as spool_dir:
+        try:
+            items: List[BulkFile] = []
+            for upload in files:
+                items.extend(await run_in_threadpool(_spool_upload, upload, spool_dir))
+            result = await run_in_threadpool(get_bulk_service().ingest, items, on_chunks)
+        except Exception as exc:
+            if job is not None:
+                pipeline.fail(job, exc)
+            raise
+    if job is not None:
+        pipeline.seal(job)
+    return {
+        "document_ids": result.document_ids,
+        "chunks": result.chunks,
+        "docs_per_second": result.docs_per_second,
+        "job_id": None if job is None else job.id,
+    }
+
+
+def _spool_upload(upload: UploadFile, spool_dir: str) -> List[BulkFile]:
+    return list(expand_upload(upload.filename or "upload", upload.file, spool_dir, upload.content_type))
+
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str) -> Dict[str, Any]:
+    """Report progress of a background chunk/embed job."""
+    job = get_pipeline().get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return job.to_dict()
+
+
+@router.get("/pipeline/metrics")
+async def pipeline_metrics() -> Dict[str, Any]:
+    """Report pipeline throughput, queue depths and ingest-to-searchable latency."""
+    return get_pipeline().metrics()
+
+
+@router.get("/index")
+async def index_status() -> Dict[str, Any]:
+    """Report the live vector index generation, its versions and the last rebuild."""
+    return await run_in_threadpool(vector_search.get_index_generations().status)
+
+
+@router.post("/index/rebuild", status_code=202)
+async def rebuild_index(delta_version: Optional[int] = None) -> Dict[str, Any]:
+    """Rebuild the vector index from ``embedded_chunks`` in the background and hot-swap it.
+
+    Queries keep using the live generation until the new one is complete. ``delta_version``
+    rebuilds from an older ``embedded_chunks`` version; poll ``/ingest/index`` for progress.
+    """
+    try:
+        return await run_in_threadpool(vector_search.rebuild_index, delta_version, True)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
@@ -0,0 +1,68 @@
+"""Prometheus scrape endpoint and per-request timing middleware."""
+import time
+from typing import Any, Awaitable, Callable, Dict, MutableMapping
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.utils.metrics import collect_request_timings, get_metrics, server_timing
+
+router = APIRouter(tags=["metrics"])
+
+HTTP_SECONDS = "rag_http_request_duration_seconds"
+HTTP_REQUESTS = "rag_http_requests_total"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Message = MutableMapping[str, Any]
+ASGIApp = Callable[[Message, Callable[[], Awaitable[Message]], Callable[[Message], Awaitable[None]]], Awaitable[None]]
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """Stage and HTTP latency histograms and counters in the Prometheus text format."""
+    return PlainTextResponse(get_metrics().render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+class TimingMiddleware:
+    """Record latency and status per route, and optionally a ``Server-Timing`` header.
+
+    A plain ASGI middleware (rather than ``BaseHTTPMiddleware``) so streaming responses
+    pass through untouched. Routes are labelled by their template (``/ingest/jobs/{job_id}``),
+    keeping series bounded. With ``timing_header`` the response carries the per-stage
+    breakdown recorded before its headers were sent, plus ``total``.
+    """
+
+    def __init__(self, app: ASGIApp, timing_header: bool = False) -> None:
+        self.app = app
+        self.timing_header = timing_header
+        registry = get_metrics()
+        registry.describe(HTTP_SECONDS, "HTTP request latency by route.")
+        registry.describe(HTTP_REQUESTS, "HTTP requests by route and status.")
+
+    async def __call__(self, scope: Message, receive: Callable[[], Awaitable[Message]], send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.timing_header:
+                    breakdown: Dict[str, float] = {**timings, "total": (time.perf_counter() - start) * 1000}
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(breakdown).encode("latin-1")))
+                    message["headers"] = headers
+            await send(message)
+
+        with collect_request_timings() as timings:
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                route = scope.get("route")
+                path = getattr(route, "path", "unmatched")
+                registry = get_metrics()
+                registry.observe(HTTP_SECONDS, time.perf_counter() - start, method=scope["method"], route=path)
+                registry.increment(HTTP_REQUESTS, method=scope["method"], route=path, status=str(status))
@@ -1,14 +1,81 @@
 """Query endpoint for retrieval and generation."""
-from fastapi import APIRouter
+import json
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict
 
-from app.models.query import QueryRequest, QueryResponse
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.models.query import BatchQueryRequest, BatchQueryResponse, QueryRequest, QueryResponse
 from app.services.generation_service import GenerationService
 
 router = APIRouter(prefix="/query", tags=["query"])
-generation_service = GenerationService()
+
+
+@lru_cache()
+def get_generation_service() -> GenerationService:
+    """Return the process-wide generation service, built on first use."""
+    return GenerationService()
 
 
 @router.post("/")
 async def run_query(payload: QueryRequest) -> QueryResponse:
     """Execute a full RAG flow given a user query."""
-    return await generation_service.generate_response(payload)
+    try:
+        return await get_generation_service().generate_response(payload)
+    except ValueError as exc:  # Unknown retrieval mode, bad weights or unindexed filter field.
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@router.post("/stream")
+async def stream_query(payload: QueryRequest) -> StreamingResponse:
+    """Stream a RAG response as server-sent events.
+
+    Events: ``retrieval`` (citations for the retrieved chunks, sent as soon as retrieval
+    finishes), one ``token`` per generated token, then ``done`` with token count and
+    ``ttfb_ms``/``first_token_ms``/``total_ms`` timings. Errors after the stream has
+    started arrive as an ``error`` event.
+    """
+    events = get_generation_service().stream_response(payload)
+    try:
+        first = await events.__anext__()  # Validation errors still map to HTTP 400.
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    async def body() -> AsyncIterator[str]:
+        yield _sse(*first)
+        try:
+            async for event in events:
+                yield _sse(*event)
+        except Exception as exc:  # noqa: BLE001 - the status line has already been sent.
+            yield _sse("error", {"detail": str(exc)})
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.post("/batch")
+async def run_query_batch(payload: BatchQueryRequest) -> BatchQueryResponse:
+    """Answer many queries with batched embedding and matrix-level retrieval."""
+    limit = get_generation_service().settings.query_batch_max_size
+    if len(payload.queries) > limit:
+        raise HTTPException(status_code=413, detail=f"At most {limit} queries per batch")
+    try:
+        return BatchQueryResponse(results=await get_generation_service().generate_batch(payload.queries))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@router.get("/batcher")
+async def batcher_metrics() -> dict:
+    """Report micro-batch sizes and queueing delay for single-query retrieval."""
+    return get_generation_service().retrieval.batcher.metrics()
+
+
+@router.get("/cache")
+async def cache_stats() -> dict[str, dict[str, float]]:
+    """Report query-embedding and retrieval-result cache counters."""
+    return get_generation_service().retrieval.cache_stats()
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -14,12 +14,101 @@ class Settings(BaseSettings):
     schema: str = Field("rag_platform", description="Schema used for Delta tables")
     vector_index_name: str = Field("rag_chunks_vs", description="Vector Search index name")
     embedding_model: str = Field("databricks-bge-large-en", description="Default embedding model")
+    embedding_batch_size: int = Field(256, description="Texts sent per embedding request")
+    embedding_max_workers: int = Field(1, description="Concurrent embedding requests for model-serving backends")
+    fingerprint_store_path: Optional[str] = Field(
+        None, description="SQLite cache of chunk embeddings by content; defaults next to local_vector_store_path"
+    )
     llm_model: str = Field("databricks-dbrx-instruct", description="Default LLM for generation")
+    mock_llm_token_delay_ms: float = Field(0.0, description="Simulated per-token decode time of the local mock LLM")
+    llm_max_tokens: int = Field(512, description="Completion tokens requested from the LLM endpoint")
+    serving_backend: str = Field(
+        "mock", description="Embedding, search and LLM calls: 'mock' (in-process) or 'http' (serving endpoints)"
+    )
+    serving_url: Optional[str] = Field(
+        None, description="Base URL of the serving endpoints; defaults to databricks_host"
+    )
+    serving_max_connections: int = Field(64, description="Pooled keep-alive connections to the serving endpoints")
+    serving_keepalive_seconds: float = Field(30.0, description="Idle time before a pooled connection is closed")
+    serving_timeout_seconds: float = Field(30.0, description="Read/write/pool timeout of a serving call")
+    serving_connect_timeout_seconds: float = Field(5.0, description="Connect timeout of a serving call")
+    serving_max_retries: int = Field(3, description="Retries after a timeout, connection error, 429 or 5xx")
+    serving_retry_backoff_ms: float = Field(100.0, description="Base of the jittered exponential retry backoff")
+    serving_embedding_concurrency: int = Field(16, description="In-flight calls to the embedding endpoint")
+    serving_vector_search_concurrency: int = Field(32, description="In-flight calls to the Vector Search query API")
+    serving_llm_concurrency: int = Field(8, description="In-flight calls to the LLM endpoint")
+    serving_coalesce: bool = Field(True, description="Share one call between identical in-flight requests")
     experiment_name: str = Field("/Shared/rag-platform", description="MLflow experiment name")
     chunk_size: int = Field(800, description="Chunk size for text splitting")
     chunk_overlap: int = Field(120, description="Token overlap between chunks")
+    context_packing: bool = Field(True, description="Merge, de-duplicate and budget retrieved chunks before prompting")
+    context_token_budget: int = Field(3000, description="Maximum context tokens packed into a prompt")
+    context_dedup_threshold: float = Field(
+        0.9, description="Shingle Jaccard similarity at which passages count as duplicates"
+    )
+    chunk_boundary: str = Field("whitespace", description="Chunk boundaries: 'whitespace', 'sentence' or 'paragraph'")
+    ingest_block_size: int = Field(1 << 20, description="Bytes read per block when streaming uploads")
+    ingest_chunk_batch_size: int = Field(256, description="Chunks per Delta write when streaming uploads")
+    bulk_ingest_workers: int = Field(0, description="Processes for bulk normalization/chunking; 0 uses all cores")
+    bulk_ingest_write_batch_size: int = Field(500, description="Documents per grouped Delta write in bulk ingestion")
+    pipeline_enabled: bool = Field(True, description="Chunk and embed uploads in the background pipeline")
+    pipeline_queue_size: int = Field(64, description="Capacity of each pipeline stage queue")
+    pipeline_chunk_workers: int = Field(2, description="Concurrent chunking workers")
+    pipeline_embed_workers: int = Field(2, description="Concurrent embedding workers")
+    pipeline_job_history: int = Field(10000, description="Pipeline jobs retained for status lookups")
+    local_delta_path: str = Field("/tmp/rag_delta", description="Root of the local partitioned-Parquet Delta tables")
     log_level: str = Field("INFO", description="Logging verbosity")
-    local_vector_store_path: str = Field("/tmp/vector_store.faiss", description="Local FAISS file for parity")
+    startup_warmup: bool = Field(
+        True, description="Build services and warm indexes before /health/ready reports ready"
+    )
+    telemetry_queue_size: int = Field(10000, description="Pending MLflow telemetry events before dropping")
+    telemetry_batch_size: int = Field(200, description="Telemetry events written per MLflow flush")
+    telemetry_flush_interval_seconds: float = Field(5.0, description="Maximum wait between telemetry flushes")
+    telemetry_sample_rate: float = Field(1.0, description="Fraction of serving events sent to MLflow")
+    metrics_timing_header: bool = Field(
+        False, description="Add a Server-Timing header with per-stage durations to HTTP responses"
+    )
+    local_vector_store_path: str = Field(
+        "/tmp/vector_store.faiss", description="Memory-mapped float32 matrix backing the local index"
+    )
+    index_keep_generations: int = Field(
+        2, description="Local index generations kept on disk, including the live one, after a rebuild"
+    )
+    index_rebuild_batch_size: int = Field(10000, description="embedded_chunks rows upserted per write in a rebuild")
+    vector_index_mode: str = Field("flat", description="Local index mode: 'flat' (exact) or 'ivf' (approximate)")
+    ivf_nlist: int = Field(1024, description="Number of k-means coarse centroids for the IVF index")
+    ivf_nprobe: int = Field(16, description="Inverted lists scanned per IVF query")
+    ivf_min_train_rows: int = Field(50000, description="Rows required before the IVF index trains")
+    ivf_save_every: int = Field(
+        10000, description="Rows assigned between IVF saves; training, rebuilds and shutdown also save"
+    )
+    vector_quantization: str = Field(
+        "none", description="Compressed vector codes scored before float re-ranking: 'none', 'int8' or 'pq'"
+    )
+    pq_subvectors: int = Field(8, description="Product-quantization sub-vectors (code bytes) per embedding")
+    pq_centroids: int = Field(256, description="Codewords per product-quantization sub-vector (at most 256)")
+    quantization_rerank: int = Field(
+        4, description="Re-rank k times this many quantized candidates against float32 vectors; 0 disables"
+    )
+    quantization_min_train_rows: int = Field(10000, description="Rows required before the quantizer trains")
+    filter_fields: str = Field(
+        "document_id,content_type", description="Comma-separated metadata fields indexed for query filters"
+    )
+    lexical_index_path: str = Field("/tmp/rag_lexical", description="Journal and snapshot of the BM25 index")
+    lexical_snapshot_every: int = Field(10000, description="Documents indexed between BM25 snapshots")
+    retrieval_mode: str = Field("vector", description="Default retrieval: 'vector', 'lexical' or 'hybrid'")
+    hybrid_candidates: int = Field(50, description="Candidates fetched from each retriever before fusion")
+    hybrid_rrf_k: int = Field(60, description="Reciprocal-rank-fusion damping constant")
+    hybrid_vector_weight: float = Field(1.0, description="Default weight of vector ranks in hybrid fusion")
+    hybrid_lexical_weight: float = Field(1.0, description="Default weight of BM25 ranks in hybrid fusion")
+    evaluation_workers: int = Field(4, description="Threads issuing queries in offline retrieval evaluation")
+    query_batch_max_size: int = Field(1000, description="Queries accepted per /query/batch request")
+    query_micro_batching: bool = Field(True, description="Coalesce concurrent /query retrievals into batches")
+    query_micro_batch_size: int = Field(32, description="Queries that flush a micro-batch immediately")
+    query_micro_batch_delay_ms: float = Field(2.0, description="Longest a query waits for its micro-batch to fill")
+    query_embedding_cache_size: int = Field(10000, description="Cached query embeddings (0 disables)")
+    retrieval_cache_size: int = Field(2048, description="Cached top-k result sets (0 disables)")
+    retrieval_cache_ttl_seconds: float = Field(300.0, description="Retrieval cache entry lifetime; 0 keeps until evicted")
 
     class Config:
         env_file = ".env"
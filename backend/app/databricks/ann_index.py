@@ -0,0 +1,224 @@
+"""Inverted-file (IVF) approximate nearest-neighbour layer for the local vector index."""
+from __future__ import annotations
+
+import os
+import threading
+from array import array
+from typing import List, Optional
+
+import numpy as np
+
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+KMEANS_ITERATIONS = 12
+TRAIN_SAMPLES_PER_LIST = 64
+RETRAIN_GROWTH = 4
+
+
+class IVFIndex:
+    """Coarse k-means quantizer whose inverted lists hold rows of the local matrix.
+
+    The IVF layer never copies vectors: it keeps ``nlist`` centroids plus one int32 list
+    assignment per matrix row, persisted together in ``path``. Inverted lists are derived
+    from the assignments with one sort after loading or training; upserts then append
+    their rows to the lists they land in. A row that moves to another list leaves a stale
+    entry behind, which searches skip and which is compacted away the next time its list
+    is written to or found mostly stale, so a search only scores the rows of the
+    ``nprobe`` closest lists.
+
+    ``add`` saves only after training or once ``save_every`` rows were assigned since the
+    last save; ``flush`` saves the rest (rebuilds and shutdown). Rows assigned but not
+    saved are re-derived from the matrix by other processes' ``sync``.
+
+    Until the matrix holds ``min_train_rows`` rows the index reports itself untrained and
+    callers fall back to exact search. It retrains once the corpus has grown by
+    ``RETRAIN_GROWTH`` times since the last training run.
+    """
+
+    def __init__(
+        self, path: str, nlist: int, nprobe: int, min_train_rows: int, save_every: int = 10_000, seed: int = 0
+    ) -> None:
+        self.path = path
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_rows = max(min_train_rows, nlist)
+        self.save_every = save_every
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.RLock()
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.trained_rows = 0
+        self.version = 0
+        self._unsaved = 0
+        self._list_rows: Optional[List[array]] = None
+        self._stale = np.zeros(0, dtype=np.int64)
+        self.load()
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def load(self) -> None:
+        """Load persisted centroids and assignments if present."""
+        if not os.path.exists(self.path):
+            return
+        with self._lock, np.load(self.path) as data:
+            self.centroids = data["centroids"]
+            self.assignments = data["assignments"]
+            self.trained_rows = int(data["trained_rows"])
+            self.version = int(data["version"])
+            self.nlist = self.centroids.shape[0]
+            self._unsaved = 0
+            self._invalidate_lists()
+
+    def sync(self, matrix: np.ndarray, version: int) -> None:
+        """Bring the IVF state up to date with ``matrix`` at index ``version``."""
+        with self._lock:
+            if version == self.version:
+                return
+            if os.path.exists(self.path) and self._stored_version() > self.version:
+                self.load()
+            count = matrix.shape[0]
+            if not self.trained or count >= self.trained_rows * RETRAIN_GROWTH:
+                if count >= self.min_train_rows:
+                    self.train(matrix)
+            elif self.assignments.shape[0] < count:
+                start = self.assignments.shape[0]
+                self.assign(np.arange(start, count), matrix[start:count])
+            self.version = version
+
+    def add(self, rows: np.ndarray, vectors: np.ndarray, matrix: np.ndarray, version: int) -> None:
+        """Incrementally assign upserted rows, training first if the corpus is large enough."""
+        with self._lock:
+            if self.trained and matrix.shape[0] < self.trained_rows * RETRAIN_GROWTH:
+                self.assign(rows, vectors)
+                self._unsaved += rows.size
+                self.version = version
+                if self._unsaved >= self.save_every:
+                    self.save()
+            elif matrix.shape[0] >= self.min_train_rows:
+                self.train(matrix)
+                self.version = version
+                self.save()
+            else:
+                self.version = version
+
+    def flush(self) -> None:
+        """Save assignments made since the last save."""
+        with self._lock:
+            if self.trained and self._unsaved:
+                self.save()
+
+    def assign(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        """Point each row at its nearest centroid, growing the assignment table as needed."""
+        needed = int(rows.max()) + 1 if rows.size else 0
+        if needed > self.assignments.shape[0]:
+            grown = np.full(needed, -1, dtype=np.int32)
+            grown[: self.assignments.shape[0]] = self.assignments
+            self.assignments = grown
+        previous = self.assignments[rows]
+        labels = nearest_centroids(vectors, self.centroids)
+        self.assignments[rows] = labels
+        if self._list_rows is None:
+            return
+        moved = previous != labels
+        np.add.at(self._stale, previous[moved & (previous >= 0)], 1)
+        for target in np.unique(labels[moved]):
+            entering = rows[moved & (labels == target)]
+            if self._stale[target]:
+                # A stale copy of an entering row may still sit in this list; compact it first.
+                kept = self._compact(int(target))
+                entering = entering[~np.isin(entering, kept)]
+            self._list_rows[target].extend(entering.astype(np.int32).tolist())
+
+    def train(self, matrix: np.ndarray) -> None:
+        """Run spherical k-means on a sample of ``matrix`` and reassign every row."""
+        count = matrix.shape[0]
+        nlist = min(self.nlist, count)
+        sample_size = min(count, nlist * TRAIN_SAMPLES_PER_LIST)
+        sample_rows = np.sort(self._rng.choice(count, size=sample_size, replace=False))
+        sample = np.asarray(matrix[sample_rows], dtype=np.float32)
+        centroids = sample[self._rng.choice(sample_size, size=nlist, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            labels = nearest_centroids(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            sizes = np.bincount(labels, minlength=nlist)
+            empty = sizes == 0
+            if empty.any():
+                sums[empty] = sample[self._rng.choice(sample_size, size=int(empty.sum()), replace=False)]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+        self.centroids = centroids
+        self.nlist = nlist
+        self.assignments = np.empty(0, dtype=np.int32)
+        self._invalidate_lists()
+        self.assign(np.arange(count), matrix[:count])
+        self.trained_rows = count
+        logger.info("Trained IVF coarse quantizer", extra={"nlist": nlist, "rows": count, "sample": sample_size})
+
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Return the matrix rows stored in the ``nprobe`` lists closest to ``query``."""
+        with self._lock:
+            lists = self._lists()
+            nprobe = min(nprobe or self.nprobe, self.nlist)
+            centroid_scores = self.centroids @ query
+            probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+            parts = []
+            for probe in probes:
+                if self._stale[probe] * 2 > len(lists[probe]):
+                    parts.append(self._compact(int(probe)))
+                    continue
+                rows = np.array(lists[probe], dtype=np.int64)
+                parts.append(rows[self.assignments[rows] == probe] if self._stale[probe] else rows)
+        return np.concatenate(parts)
+
+    def save(self) -> None:
+        """Persist centroids and assignments atomically."""
+        tmp_path = f"{self.path}.tmp.{os.getpid()}.npz"
+        np.savez(
+            tmp_path,
+            centroids=self.centroids,
+            assignments=self.assignments,
+            trained_rows=self.trained_rows,
+            version=self.version,
+        )
+        os.replace(tmp_path, self.path)
+        self._unsaved = 0
+
+    def _lists(self) -> List[array]:
+        if self._list_rows is None:
+            live = np.flatnonzero(self.assignments >= 0)
+            order = np.argsort(self.assignments[live], kind="stable")
+            rows = live[order].astype(np.int32)
+            offsets = np.concatenate(([0], np.cumsum(np.bincount(self.assignments[live], minlength=self.nlist))))
+            self._list_rows = [array("i", rows[offsets[i] : offsets[i + 1]].tobytes()) for i in range(self.nlist)]
+            self._stale = np.zeros(self.nlist, dtype=np.int64)
+        return self._list_rows
+
+    def _compact(self, target: int) -> np.ndarray:
+        """Drop entries of rows that moved out of list ``target``; returns the remaining rows."""
+        rows = np.array(self._list_rows[target], dtype=np.int64)
+        rows = rows[self.assignments[rows] == target]
+        self._list_rows[target] = array("i", rows.astype(np.int32).tobytes())
+        self._stale[target] = 0
+        return rows
+
+    def _invalidate_lists(self) -> None:
+        self._list_rows = None
+
+    def _stored_version(self) -> int:
+        with np.load(self.path) as data:
+            return int(data["version"])
+
+
+def nearest_centroids(vectors: np.ndarray, centroids: np.ndarray, batch_size: int = 8192) -> np.ndarray:
+    """Assign each (normalised) vector to the centroid with the highest inner product."""
+    labels = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], batch_size):
+        block = np.asarray(vectors[start : start + batch_size], dtype=np.float32)
+        labels[start : start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return labels
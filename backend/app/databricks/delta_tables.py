@@ -1,9 +1,17 @@
 """Delta Lake table management and simplified IO helpers."""
 from __future__ import annotations
 
-from typing import Iterable, List
+import json
+import os
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pyarrow as pa
 
 from app.config import get_settings
+from app.databricks.local_delta import LocalDeltaTable
 from app.models.chunk import Chunk
 from app.models.document import Document
 from app.utils.logging import get_logger
@@ -17,14 +25,109 @@ PARSED_TABLE = f"{settings.catalog}.{settings.schema}.parsed_documents"
 CHUNK_TABLE = f"{settings.catalog}.{settings.schema}.chunked_documents"
 EMBEDDED_TABLE = f"{settings.catalog}.{settings.schema}.embedded_chunks"
 
+# Local layout mirrors the documented Delta partitioning.
+PARTITION_COLUMNS: Dict[str, str] = {
+    RAW_TABLE: "ingestion_date",
+    PARSED_TABLE: "ingestion_date",
+    CHUNK_TABLE: "document_id",
+    EMBEDDED_TABLE: "document_id",
+}
+
+_DOCUMENT_FIELDS = [
+    pa.field("id", pa.string()),
+    pa.field("name", pa.string()),
+    pa.field("source_path", pa.string()),
+    pa.field("ingestion_ts", pa.timestamp("ms", tz="UTC")),
+    pa.field("ingestion_date", pa.string()),
+    # Null for whole documents; the block index for parts of a streamed upload.
+    pa.field("part_index", pa.int32()),
+    pa.field("content_type", pa.string()),
+    pa.field("metadata", pa.string()),
+]
+RAW_SCHEMA = pa.schema(_DOCUMENT_FIELDS + [pa.field("content", pa.string())])
+PARSED_SCHEMA = pa.schema(_DOCUMENT_FIELDS + [pa.field("cleaned_text", pa.string())])
+CHUNK_SCHEMA = pa.schema(
+    [
+        pa.field("id", pa.string()),
+        pa.field("document_id", pa.string()),
+        pa.field("chunk_index", pa.int32()),
+        pa.field("content", pa.string()),
+        pa.field("metadata", pa.string()),
+        pa.field("content_hash", pa.string()),
+        pa.field("start_offset", pa.int64()),
+        pa.field("end_offset", pa.int64()),
+    ]
+)
+
+
+# (document, part_index, text) as written to the raw or parsed table.
+DocumentRecord = Tuple[Document, Optional[int], str]
+
+
+def embedded_schema(dim: int) -> pa.Schema:
+    """Schema of ``embedded_chunks`` with ``dim``-wide fixed-size float32 vectors."""
+    return pa.schema(
+        [
+            pa.field("chunk_id", pa.string()),
+            pa.field("document_id", pa.string()),
+            pa.field("chunk_index", pa.int32()),
+            pa.field("content_hash", pa.string()),
+            pa.field("embedding_model", pa.string()),
+            pa.field("embedding", pa.list_(pa.float32(), dim)),
+        ]
+    )
+
+
+@lru_cache(maxsize=None)
+def get_table(name: str) -> LocalDeltaTable:
+    """Return the local Delta table for ``name`` under ``local_delta_path``."""
+    return LocalDeltaTable(os.path.join(settings.local_delta_path, name), PARTITION_COLUMNS[name])
+
 
 def ensure_all_tables() -> None:
     """Create all tables if they do not yet exist.
 
-    In Databricks this would execute DDL statements. Locally we log intent to keep
-    the code path visible for reviewers.
+    In Databricks this would execute DDL statements. Locally each table is a directory
+    of partitioned Parquet files plus a ``_delta_log`` under ``local_delta_path``.
     """
     logger.info("Ensuring Delta tables exist", extra={"tables": [RAW_TABLE, PARSED_TABLE, CHUNK_TABLE, EMBEDDED_TABLE]})
+    for name in PARTITION_COLUMNS:
+        get_table(name)
+
+
+def scan(
+    table: str,
+    columns: Optional[Sequence[str]] = None,
+    partition_values: Optional[Iterable[str]] = None,
+    version: Optional[int] = None,
+    since_version: Optional[int] = None,
+) -> pa.Table:
+    """Read ``table`` with partition pruning and column projection, optionally as of ``version``.
+
+    ``since_version`` keeps only rows appended after that version, for incremental syncs.
+    """
+    return get_table(table).scan(columns, partition_values, version, since_version)
+
+
+def iter_batches(
+    table: str,
+    columns: Optional[Sequence[str]] = None,
+    partition_values: Optional[Iterable[str]] = None,
+    version: Optional[int] = None,
+    since_version: Optional[int] = None,
+) -> Iterable[pa.RecordBatch]:
+    """Stream ``table`` in record batches; same pruning and projection as ``scan``."""
+    return get_table(table).iter_batches(columns, partition_values, version, since_version=since_version)
+
+
+def removed_partitions(table: str, since_version: int, version: Optional[int] = None) -> Set[str]:
+    """Partition values of ``table`` whose files were replaced or deleted after ``since_version``."""
+    return get_table(table).removed_partitions(since_version, version)
+
+
+def compact_all(target_rows: int = 100_000) -> Dict[str, Optional[int]]:
+    """Merge small files in every table; maps table name to the new version (None if idle)."""
+    return {name: get_table(name).compact(target_rows) for name in PARTITION_COLUMNS}
 
 
 def write_raw_document(document: Document) -> None:
@@ -33,6 +136,26 @@ def write_raw_document(document: Document) -> None:
         "Writing raw document to Delta",
         extra={"table": RAW_TABLE, "document_id": document.id, "partitioning": "ingestion_date"},
     )
+    _append_documents(RAW_TABLE, RAW_SCHEMA, [(document, None, document.raw_text)])
+
+
+def write_raw_documents(documents: Iterable[Document]) -> None:
+    """Persist a batch of raw documents with a single Delta append."""
+    document_list = list(documents)
+    logger.info(
+        "Writing raw document batch to Delta",
+        extra={"table": RAW_TABLE, "count": len(document_list), "partitioning": "ingestion_date"},
+    )
+    _append_documents(RAW_TABLE, RAW_SCHEMA, [(document, None, document.raw_text) for document in document_list])
+
+
+def write_raw_document_part(document: Document, part_index: int, text: str) -> None:
+    """Append one decoded block of a streamed upload to the raw table."""
+    logger.debug(
+        "Writing raw document part to Delta",
+        extra={"table": RAW_TABLE, "document_id": document.id, "part_index": part_index, "characters": len(text)},
+    )
+    _append_documents(RAW_TABLE, RAW_SCHEMA, [(document, part_index, text)])
 
 
 def write_parsed_document(document: Document) -> None:
@@ -41,21 +164,129 @@ def write_parsed_document(document: Document) -> None:
         "Writing parsed document to Delta",
         extra={"table": PARSED_TABLE, "document_id": document.id, "comment": "Tracks lineage from raw"},
     )
+    _append_documents(PARSED_TABLE, PARSED_SCHEMA, [(document, None, document.cleaned_text)])
+
+
+def write_parsed_documents(documents: Iterable[Document]) -> None:
+    """Persist a batch of parsed documents with a single Delta append."""
+    document_list = list(documents)
+    logger.info(
+        "Writing parsed document batch to Delta",
+        extra={"table": PARSED_TABLE, "count": len(document_list), "comment": "Tracks lineage from raw"},
+    )
+    _append_documents(
+        PARSED_TABLE, PARSED_SCHEMA, [(document, None, document.cleaned_text) for document in document_list]
+    )
+
+
+def write_parsed_document_part(document: Document, part_index: int, text: str) -> None:
+    """Append one normalized block of a streamed upload to the parsed table."""
+    logger.debug(
+        "Writing parsed document part to Delta",
+        extra={"table": PARSED_TABLE, "document_id": document.id, "part_index": part_index, "characters": len(text)},
+    )
+    _append_documents(PARSED_TABLE, PARSED_SCHEMA, [(document, part_index, text)])
 
 
-def write_chunks(chunks: Iterable[Chunk]) -> None:
-    """Persist chunk metadata to Delta."""
+def write_chunks(chunks: Iterable[Chunk], replace_documents: Optional[Iterable[str]] = None) -> None:
+    """Persist chunk metadata to Delta.
+
+    Earlier chunks of ``replace_documents`` are removed in the same commit, so a
+    re-ingested document's partition holds only its new chunks.
+    """
     chunk_list = list(chunks)
+    replaced = list(replace_documents or ())
     logger.info(
         "Writing chunks to Delta",
-        extra={"table": CHUNK_TABLE, "count": len(chunk_list), "partitioning": "document_id"},
+        extra={"table": CHUNK_TABLE, "count": len(chunk_list), "partitioning": "document_id", "replaced": replaced},
+    )
+    if not chunk_list and not replaced:
+        return
+    table = pa.Table.from_pydict(
+        {
+            "id": [chunk.id for chunk in chunk_list],
+            "document_id": [chunk.document_id for chunk in chunk_list],
+            "chunk_index": [chunk.chunk_index for chunk in chunk_list],
+            "content": [chunk.content for chunk in chunk_list],
+            "metadata": [json.dumps(chunk.metadata, default=str) for chunk in chunk_list],
+            "content_hash": [chunk.content_hash for chunk in chunk_list],
+            "start_offset": [chunk.start_offset for chunk in chunk_list],
+            "end_offset": [chunk.end_offset for chunk in chunk_list],
+        },
+        schema=CHUNK_SCHEMA,
     )
+    get_table(CHUNK_TABLE).append(table, replace_partitions=replaced)
+
+
+def document_chunk_ids(document_ids: Iterable[str]) -> Dict[str, Set[str]]:
+    """Chunk ids currently written for each of ``document_ids`` (missing documents map to nothing)."""
+    ids: Dict[str, Set[str]] = {}
+    table = scan(CHUNK_TABLE, ["id", "document_id"], partition_values=list(document_ids))
+    if table.num_rows == 0:
+        return ids
+    for chunk_id, document_id in zip(table.column("id").to_pylist(), table.column("document_id").to_pylist()):
+        ids.setdefault(document_id, set()).add(chunk_id)
+    return ids
+
 
+def delete_embeddings(chunk_ids: Mapping[str, Iterable[str]]) -> None:
+    """Delete ``embedded_chunks`` rows of the given chunk ids, keyed by document id."""
+    version = get_table(EMBEDDED_TABLE).delete("chunk_id", chunk_ids)
+    logger.info("Deleted embeddings from Delta", extra={"table": EMBEDDED_TABLE, "version": version})
 
-def write_embeddings(chunks: Iterable[Chunk]) -> None:
-    """Persist embeddings to Delta."""
+
+def write_embeddings(chunks: Iterable[Chunk], embeddings: Optional[np.ndarray] = None) -> None:
+    """Persist embeddings to Delta, optionally as one batch matrix aligned with ``chunks``."""
     chunk_list = list(chunks)
     logger.info(
         "Writing embeddings to Delta",
-        extra={"table": EMBEDDED_TABLE, "count": len(chunk_list), "versioning": "delta time travel"},
+        extra={
+            "table": EMBEDDED_TABLE,
+            "count": len(chunk_list),
+            "dim": None if embeddings is None else embeddings.shape[1],
+            "versioning": "delta time travel",
+        },
+    )
+    if not chunk_list:
+        return
+    if embeddings is None:
+        embeddings = np.vstack([np.asarray(chunk.embedding, dtype=np.float32) for chunk in chunk_list])
+    matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+    dim = matrix.shape[1]
+    # The matrix buffer becomes the child array of a fixed-size list column without per-row copies.
+    vectors = pa.FixedSizeListArray.from_arrays(pa.array(matrix.ravel(), type=pa.float32()), dim)
+    table = pa.Table.from_arrays(
+        [
+            pa.array([chunk.id for chunk in chunk_list], pa.string()),
+            pa.array([chunk.document_id for chunk in chunk_list], pa.string()),
+            pa.array([chunk.chunk_index for chunk in chunk_list], pa.int32()),
+            pa.array([chunk.content_hash for chunk in chunk_list], pa.string()),
+            pa.array([settings.embedding_model] * len(chunk_list), pa.string()),
+            vectors,
+        ],
+        schema=embedded_schema(dim),
+    )
+    get_table(EMBEDDED_TABLE).append(table)
+
+
+def _append_documents(name: str, schema: pa.Schema, records: List[DocumentRecord]) -> None:
+    """Append ``(document, part_index, text)`` records, stamped with the write time."""
+    if not records:
+        return
+    now = datetime.now(timezone.utc)
+    text_column = schema.names[-1]
+    table = pa.Table.from_pydict(
+        {
+            "id": [document.id for document, _, _ in records],
+            "name": [document.name for document, _, _ in records],
+            "source_path": [document.source_path for document, _, _ in records],
+            "ingestion_ts": [now] * len(records),
+            "ingestion_date": [now.strftime("%Y-%m-%d")] * len(records),
+            "part_index": [part_index for _, part_index, _ in records],
+            "content_type": [document.metadata.get("content_type") for document, _, _ in records],
+            "metadata": [json.dumps(document.metadata, default=str) for document, _, _ in records],
+            text_column: [text for _, _, text in records],
+        },
+        schema=schema,
     )
+    get_table(name).append(table)
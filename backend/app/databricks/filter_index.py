@@ -0,0 +1,162 @@
+"""Per-field posting lists used to pre-filter vector and lexical search."""
+from __future__ import annotations
+
+import json
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+FilterValue = Union[str, int, float, bool]
+# ``{field: value}`` matches rows whose field equals ``value`` (or contains it, for list
+# metadata); ``{field: [v1, v2]}`` matches any of the values. Fields are ANDed.
+Filters = Mapping[str, Union[FilterValue, Sequence[FilterValue]]]
+SCALAR_TYPES = (str, int, float, bool)
+
+
+class FilterIndex:
+    """Posting lists of row numbers for each ``(field, value)`` pair.
+
+    ``document_id`` is read from the record itself and every other field from its
+    ``metadata``. Scalar values are indexed directly and list values once per element;
+    other values are not filterable. A filter resolves to the sorted rows it allows
+    before anything is scored, so the cost of a selective filter is proportional to the
+    rows it matches rather than to the size of the index.
+    """
+
+    def __init__(self, fields: Iterable[str]) -> None:
+        self.fields = tuple(fields)
+        self._postings: Dict[str, Dict[Any, array]] = {field: {} for field in self.fields}
+
+    def add(self, row: int, record: Any) -> None:
+        self._append(row, self._values(record))
+
+    def replace(self, row: int, previous: Any, record: Any) -> None:
+        """Re-index ``row`` after its record changed from ``previous`` to ``record``."""
+        old, new = set(self._values(previous)), set(self._values(record))
+        self._discard(row, old - new)
+        self._append(row, new - old)
+
+    def remove(self, row: int, record: Any) -> None:
+        """Stop matching ``row``, last indexed as ``record``."""
+        self._discard(row, set(self._values(record)))
+
+    def rows(self, filters: Optional[Filters]) -> Optional[np.ndarray]:
+        """Sorted rows matching every field of ``filters``; None when there is no filter.
+
+        Callers serialise this with ``add``/``replace``: the postings are read through
+        zero-copy views, which block appends while they are alive.
+        """
+        if not filters:
+            return None
+        result: Optional[np.ndarray] = None
+        # Intersect the smallest candidate sets first so later steps stay cheap.
+        for allowed in sorted((self._field_rows(field, wanted) for field, wanted in filters.items()), key=len):
+            result = allowed if result is None else np.intersect1d(result, allowed, assume_unique=True)
+            if result.size == 0:
+                break
+        return result
+
+    def compact(self, keep: np.ndarray) -> None:
+        """Drop rows whose entry in the boolean ``keep`` mask is False."""
+        for values in self._postings.values():
+            for value in list(values):
+                rows = np.frombuffer(values[value], dtype=np.int32)
+                kept = rows[keep[rows]]
+                del rows
+                if kept.size:
+                    values[value] = array("i", kept.tobytes())
+                else:
+                    del values[value]
+
+    def state(self) -> Dict[str, np.ndarray]:
+        """Pack the postings into flat arrays (for ``np.savez``)."""
+        keys: List[List[Any]] = []
+        offsets = [0]
+        parts: List[np.ndarray] = []
+        for field, values in self._postings.items():
+            for value, posting in values.items():
+                keys.append([field, value])
+                parts.append(np.array(posting, dtype=np.int32))
+                offsets.append(offsets[-1] + len(posting))
+        return {
+            "filter_fields": _encode(list(self.fields)),
+            "filter_keys": _encode(keys),
+            "filter_offsets": np.asarray(offsets, dtype=np.int64),
+            "filter_rows": np.concatenate(parts) if parts else np.empty(0, dtype=np.int32),
+        }
+
+    def restore(self, state: Mapping[str, np.ndarray]) -> bool:
+        """Load postings packed by ``state``.
+
+        Returns False, loading nothing, when ``state`` was written for other fields; the
+        caller then has to re-index its records.
+        """
+        if "filter_fields" not in state or tuple(_decode(state["filter_fields"])) != self.fields:
+            return False
+        offsets, rows = state["filter_offsets"], state["filter_rows"]
+        for i, (field, value) in enumerate(_decode(state["filter_keys"])):
+            self._postings[field][value] = array("i", rows[offsets[i] : offsets[i + 1]].tobytes())
+        return True
+
+    def _field_rows(self, field: str, wanted: Union[FilterValue, Sequence[FilterValue]]) -> np.ndarray:
+        if field not in self._postings:
+            raise ValueError(f"Field {field!r} is not filterable; indexed fields are {self.fields}")
+        values = _flatten(wanted)
+        postings = [self._postings[field].get(value) for value in values]
+        parts = [np.frombuffer(posting, dtype=np.int32) for posting in postings if posting]
+        if not parts:
+            return np.empty(0, dtype=np.int32)
+        return _sorted_unique(np.concatenate(parts))
+
+    def _append(self, row: int, pairs: Iterable[Tuple[str, FilterValue]]) -> None:
+        for field, value in pairs:
+            posting = self._postings[field].get(value)
+            if posting is None:
+                posting = self._postings[field][value] = array("i")
+            posting.append(row)
+
+    def _discard(self, row: int, pairs: Iterable[Tuple[str, FilterValue]]) -> None:
+        for field, value in pairs:
+            posting = self._postings[field].get(value)
+            if posting is not None and row in posting:
+                posting.remove(row)
+                if not posting:
+                    del self._postings[field][value]
+
+    def _values(self, record: Any) -> Iterator[Tuple[str, FilterValue]]:
+        for field in self.fields:
+            value = record.document_id if field == "document_id" else record.metadata.get(field)
+            for item in _flatten(value):
+                yield field, item
+
+
+def _flatten(value: Any) -> List[FilterValue]:
+    if isinstance(value, SCALAR_TYPES):
+        return [value]
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return list(dict.fromkeys(item for item in value if isinstance(item, SCALAR_TYPES)))
+    return []
+
+
+def _sorted_unique(rows: np.ndarray) -> np.ndarray:
+    # Postings are usually already ascending (rows are appended in order); overwritten
+    # rows and multi-value filters are the exceptions. Plain sort + mask avoids
+    # ``np.unique``, which is far slower here.
+    if rows.size > 1 and not (rows[1:] > rows[:-1]).all():
+        rows = np.sort(rows)
+        rows = rows[np.concatenate(([True], rows[1:] != rows[:-1]))]
+    return rows
+
+
+def _encode(value: Any) -> np.ndarray:
+    return np.frombuffer(json.dumps(value).encode("utf-8"), dtype=np.uint8)
+
+
+def _decode(buffer: np.ndarray) -> Any:
+    return json.loads(buffer.tobytes().decode("utf-8"))
+
+
+def parse_fields(spec: str) -> List[str]:
+    """Split the comma-separated ``filter_fields`` setting."""
+    return [field.strip() for field in spec.split(",") if field.strip()]
@@ -0,0 +1,82 @@
+"""Persistent cache of chunk embeddings keyed by content fingerprint."""
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+
+from app.config import get_settings
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+# SQLite caps bound parameters per statement; stay well below the historical 999 limit.
+QUERY_BATCH = 500
+
+
+class FingerprintStore:
+    """SQLite-backed embeddings keyed by fingerprint (normalized text plus embedding model).
+
+    A vector is recorded once its text has been embedded, so the same text in a later
+    ingest, or in another document, reuses it instead of calling the model again. It
+    only saves embedding calls: every document still gets its own index rows. WAL mode
+    lets several workers read while one writes.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunk_embeddings ("
+                " fingerprint TEXT PRIMARY KEY,"
+                " model TEXT NOT NULL,"
+                " embedding BLOB NOT NULL,"
+                " embedded_at REAL NOT NULL)"
+            )
+
+    def lookup(self, fingerprints: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Return the cached float32 vector of every recorded fingerprint in ``fingerprints``."""
+        candidates = list(set(fingerprints))
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for start in range(0, len(candidates), QUERY_BATCH):
+                batch = candidates[start : start + QUERY_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT fingerprint, embedding FROM chunk_embeddings WHERE fingerprint IN ({placeholders})", batch
+                )
+                found.update((fingerprint, np.frombuffer(blob, dtype=np.float32)) for fingerprint, blob in rows)
+        return found
+
+    def record(self, entries: Iterable[Tuple[str, str, np.ndarray]]) -> None:
+        """Record ``(fingerprint, model, embedding)`` entries; existing fingerprints are kept."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO chunk_embeddings (fingerprint, model, embedding, embedded_at)"
+                " VALUES (?, ?, ?, ?)",
+                [
+                    (fingerprint, model, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                    for fingerprint, model, vector in entries
+                ],
+            )
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunk_embeddings").fetchone()[0]
+
+
+@lru_cache()
+def get_fingerprint_store() -> FingerprintStore:
+    """Return the process-wide store at ``fingerprint_store_path``, next to the local index by default."""
+    # "<index>-fingerprints" rather than a "<index>.*" sidecar, which index generations prune.
+    path = settings.fingerprint_store_path or f"{settings.local_vector_store_path}-fingerprints.sqlite"
+    return FingerprintStore(path)
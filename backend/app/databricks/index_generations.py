@@ -0,0 +1,355 @@
+"""Versioned generations of the local vector index, rebuilt from ``embedded_chunks`` and hot-swapped."""
+from __future__ import annotations
+
+import glob
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from app.databricks import delta_tables
+from app.databricks.local_index import IndexRow, LocalVectorIndex
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+EMBEDDING_COLUMNS = ["chunk_id", "document_id", "chunk_index", "embedding_model", "embedding"]
+CHUNK_COLUMNS = ["id", "content", "metadata", "start_offset", "end_offset"]
+# Catch-up passes over appends that landed while a generation was being built.
+CATCH_UP_ROUNDS = 3
+
+
+@dataclass
+class IndexGeneration:
+    """One build of the local index, with the queries currently reading it."""
+
+    number: int
+    index: LocalVectorIndex
+    # Last embedded_chunks version applied; -1 for a generation filled only by upserts.
+    delta_version: int = -1
+    readers: int = 0
+    retired: bool = False
+
+    @property
+    def label(self) -> str:
+        """``<generation>.<upsert version>``: the index version reported with results."""
+        return f"{self.number}.{self.index.version}"
+
+
+class IndexGenerations:
+    """Generations of the local index under one base path, with an atomic pointer to the live one.
+
+    Generation 0 is the index at ``path`` itself; generation ``n`` lives at
+    ``path.gen<n>`` with the same sidecar files. ``path.generation.json`` names the live
+    generation and is replaced atomically, so every process sharing the files switches
+    on its next query.
+
+    ``rebuild`` fills the next generation from an ``embedded_chunks`` snapshot while
+    queries keep reading the live one. It then replays appends committed since the
+    snapshot, swaps the pointer, and replays once more for appends that raced the swap.
+    Upserts between rebuilds go straight into the live generation.
+
+    Queries pin a generation with ``acquire``. A retired generation is dropped once its
+    last reader releases it. Its files are deleted once ``keep`` newer generations exist,
+    so other processes can finish queries against it.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        open_index: Callable[[str], LocalVectorIndex],
+        embedding_model: str,
+        keep: int = 2,
+        batch_rows: int = 10_000,
+    ) -> None:
+        self.path = path
+        self.pointer_path = f"{path}.generation.json"
+        self.keep = max(keep, 1)
+        self.batch_rows = batch_rows
+        self._open_index = open_index
+        self.embedding_model = embedding_model
+        self._lock = threading.RLock()
+        self._rebuild_lock = threading.Lock()
+        self._current: Optional[IndexGeneration] = None
+        self._held: Dict[int, IndexGeneration] = {}
+        self._pointer_stamp: Optional[tuple] = None
+        self._rebuild_thread: Optional[threading.Thread] = None
+        self.last_rebuild: Dict[str, Any] = {}
+
+    def current(self) -> IndexGeneration:
+        """Return the live generation, switching over if another process published a newer one."""
+        stamp = self._stamp()
+        with self._lock:
+            if self._current is None or stamp != self._pointer_stamp:
+                pointer = self._read_pointer()
+                self._pointer_stamp = stamp
+                if self._current is None or pointer["generation"] != self._current.number:
+                    number = pointer["generation"]
+                    index = self._open_index(self.generation_path(number))
+                    self._install(IndexGeneration(number, index, pointer.get("delta_version", -1)))
+            return self._current
+
+    @contextmanager
+    def acquire(self) -> Iterator[IndexGeneration]:
+        """Pin the live generation for one query or upsert; a concurrent swap leaves it readable."""
+        with self._lock:
+            generation = self.current()
+            generation.readers += 1
+        try:
+            yield generation
+        finally:
+            with self._lock:
+                generation.readers -= 1
+                if generation.retired and generation.readers == 0:
+                    self._held.pop(generation.number, None)
+                    self._prune()
+
+    def generation_path(self, number: int) -> str:
+        return self.path if number == 0 else f"{self.path}.gen{number}"
+
+    def rebuild(self, delta_version: Optional[int] = None) -> IndexGeneration:
+        """Build the next generation from ``embedded_chunks`` and make it live.
+
+        ``delta_version`` pins the snapshot (time travel). Without it the latest version is
+        used, and appends that arrive during the build are replayed before and after the swap.
+        """
+        if not self._rebuild_lock.acquire(blocking=False):
+            raise RuntimeError("An index rebuild is already running")
+        try:
+            started = time.perf_counter()
+            number = max([self.current().number, *self._numbers_on_disk()]) + 1
+            path = self.generation_path(number)
+            self._remove_generation(number)  # Leftovers of an interrupted build.
+            table = delta_tables.get_table(delta_tables.EMBEDDED_TABLE)
+            snapshot = table.version if delta_version is None else delta_version
+            generation = IndexGeneration(number, self._open_index(path), snapshot)
+            rows = self._apply(generation.index, version=snapshot)
+            if delta_version is None:
+                for _ in range(CATCH_UP_ROUNDS):
+                    if not self.apply_changes(generation):
+                        break
+            generation.index.flush()
+            with self._lock:
+                self._write_pointer(generation)
+                self._install(generation)
+            if delta_version is None:
+                self.apply_changes(generation)
+                generation.index.flush()
+            self.last_rebuild = {
+                "generation": number,
+                "delta_version": generation.delta_version,
+                "rows": rows,
+                "count": len(generation.index),
+                "seconds": time.perf_counter() - started,
+                "finished_at": time.time(),
+            }
+            logger.info("Swapped in rebuilt vector index generation", extra=self.last_rebuild)
+            return generation
+        finally:
+            self._rebuild_lock.release()
+
+    def start_rebuild(self, delta_version: Optional[int] = None) -> bool:
+        """Run ``rebuild`` on a background thread; False if one is already running."""
+        with self._lock:
+            if self.rebuilding:
+                return False
+
+            def run() -> None:
+                try:
+                    self.rebuild(delta_version)
+                except Exception:
+                    logger.exception("Vector index rebuild failed")
+                    self.last_rebuild = {"error": "rebuild failed; see logs", "finished_at": time.time()}
+
+            self._rebuild_thread = threading.Thread(target=run, name="index-rebuild", daemon=True)
+            self._rebuild_thread.start()
+            return True
+
+    @property
+    def rebuilding(self) -> bool:
+        return self._rebuild_thread is not None and self._rebuild_thread.is_alive()
+
+    def apply_changes(self, generation: Optional[IndexGeneration] = None) -> int:
+        """Upsert ``embedded_chunks`` rows appended since the generation's Delta version; returns rows applied.
+
+        Generations filled only by upserts (``delta_version`` -1) have no sync point and are skipped.
+        """
+        generation = generation or self.current()
+        if generation.delta_version < 0:
+            return 0
+        version = delta_tables.get_table(delta_tables.EMBEDDED_TABLE).version
+        if version <= generation.delta_version:
+            return 0
+        rows = self._apply(generation.index, version=version, since_version=generation.delta_version)
+        generation.delta_version = version
+        if generation is self._current:
+            with self._lock:
+                self._write_pointer(generation)
+        return rows
+
+    def status(self) -> Dict[str, Any]:
+        """Live generation, its versions and readers, and the last rebuild's outcome."""
+        generation = self.current()
+        return {
+            "generation": generation.number,
+            "index_version": generation.label,
+            "delta_version": generation.delta_version,
+            "rows": len(generation.index),
+            "readers": generation.readers,
+            "retired_in_use": sorted(number for number in self._held if number != generation.number),
+            "rebuilding": self.rebuilding,
+            "last_rebuild": self.last_rebuild,
+        }
+
+    def _apply(self, index: LocalVectorIndex, version: int, since_version: Optional[int] = None) -> int:
+        """Upsert embedded rows of ``version`` (only those added after ``since_version``) into ``index``.
+
+        Rows are applied in commit order, so a re-embedded chunk ends up with its latest vector.
+        When catching up, chunks deleted from ``embedded_chunks`` since ``since_version``
+        (stale chunks of re-ingested documents) are deleted from ``index`` too.
+        """
+        if version < 0:
+            return 0
+        pending: List[pa.RecordBatch] = []
+        applied = 0
+        batches = delta_tables.iter_batches(
+            delta_tables.EMBEDDED_TABLE, EMBEDDING_COLUMNS, version=version, since_version=since_version
+        )
+        for batch in batches:
+            if batch.num_rows == 0:
+                continue
+            pending.append(batch)
+            if sum(item.num_rows for item in pending) >= self.batch_rows:
+                applied += _upsert_batches(index, pending, self.embedding_model)
+                pending = []
+        if pending:
+            applied += _upsert_batches(index, pending, self.embedding_model)
+        if since_version is not None and since_version >= 0:
+            _delete_removed(index, version, since_version)
+        return applied
+
+    def _install(self, generation: IndexGeneration) -> None:
+        previous = self._current
+        self._current = generation
+        self._held[generation.number] = generation
+        if previous is not None and previous is not generation:
+            previous.retired = True
+            if previous.readers == 0:
+                self._held.pop(previous.number, None)
+        self._prune()
+
+    def _prune(self) -> None:
+        """Delete generations at least ``keep`` behind the live one that no local query holds."""
+        if self._current is None:
+            return
+        for number in self._numbers_on_disk():
+            if number <= self._current.number - self.keep and number not in self._held:
+                self._remove_generation(number)
+
+    def _numbers_on_disk(self) -> List[int]:
+        numbers = set()
+        pattern = re.compile(re.escape(self.path) + r"\.gen(\d+)$")
+        for path in glob.glob(glob.escape(self.path) + ".gen*"):
+            match = pattern.match(path)
+            if match:
+                numbers.add(int(match.group(1)))
+        if os.path.exists(self.path) or os.path.exists(f"{self.path}.manifest.json"):
+            numbers.add(0)
+        return sorted(numbers)
+
+    def _remove_generation(self, number: int) -> None:
+        path = self.generation_path(number)
+        sidecars = glob.glob(glob.escape(path) + ".*")
+        if number == 0:
+            sidecars = [name for name in sidecars if not name.startswith(f"{self.path}.gen")]
+        for name in [path, *sidecars]:
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                pass
+
+    def _stamp(self) -> Optional[tuple]:
+        try:
+            stat = os.stat(self.pointer_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _read_pointer(self) -> Dict[str, int]:
+        try:
+            with open(self.pointer_path, encoding="utf-8") as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return {"generation": 0, "delta_version": -1}
+
+    def _write_pointer(self, generation: IndexGeneration) -> None:
+        pointer = {"generation": generation.number, "delta_version": generation.delta_version}
+        tmp_path = f"{self.pointer_path}.tmp.{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(pointer, handle)
+        os.replace(tmp_path, self.pointer_path)
+        self._pointer_stamp = self._stamp()
+
+
+def _delete_removed(index: LocalVectorIndex, version: int, since_version: int) -> None:
+    """Delete index rows of documents whose ``embedded_chunks`` rows were deleted or replaced."""
+    documents = delta_tables.removed_partitions(delta_tables.EMBEDDED_TABLE, since_version, version)
+    if not documents:
+        return
+    live: Dict[str, Set[str]] = {document_id: set() for document_id in documents}
+    table = delta_tables.scan(
+        delta_tables.EMBEDDED_TABLE, ["document_id", "chunk_id"], partition_values=documents, version=version
+    )
+    for document_id, chunk_id in zip(table.column("document_id").to_pylist(), table.column("chunk_id").to_pylist()):
+        live[document_id].add(chunk_id)
+    index.delete(
+        chunk_id
+        for document_id, chunk_ids in live.items()
+        for chunk_id in index.document_chunk_ids(document_id)
+        if chunk_id not in chunk_ids
+    )
+
+
+def _upsert_batches(index: LocalVectorIndex, batches: List[pa.RecordBatch], model: str) -> int:
+    """Join embedded rows with their chunk text and upsert them as one index write."""
+    table = pa.Table.from_batches(batches)
+    if table.num_rows == 0:
+        return 0
+    table = table.filter(pc.equal(table.column("embedding_model"), model))
+    if table.num_rows == 0:
+        return 0
+    document_ids = table.column("document_id").unique().to_pylist()
+    chunks = delta_tables.scan(delta_tables.CHUNK_TABLE, CHUNK_COLUMNS, partition_values=document_ids)
+    by_id = {row["id"]: row for row in chunks.to_pylist()}
+    records = []
+    for chunk_id, document_id, chunk_index in zip(
+        table.column("chunk_id").to_pylist(),
+        table.column("document_id").to_pylist(),
+        table.column("chunk_index").to_pylist(),
+    ):
+        chunk = by_id.get(chunk_id, {})
+        records.append(
+            IndexRow(
+                row=-1,
+                chunk_id=chunk_id,
+                document_id=document_id,
+                chunk_index=chunk_index,
+                content=chunk.get("content") or "",
+                metadata=json.loads(chunk["metadata"]) if chunk.get("metadata") else {},
+                start_offset=chunk.get("start_offset"),
+                end_offset=chunk.get("end_offset"),
+            )
+        )
+    embeddings = table.column("embedding").combine_chunks()
+    dim = embeddings.type.list_size
+    vectors = embeddings.flatten().to_numpy(zero_copy_only=False).reshape(-1, dim).astype(np.float32, copy=False)
+    index.upsert(records, vectors)
+    return len(records)
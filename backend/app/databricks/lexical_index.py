@@ -0,0 +1,383 @@
+"""BM25 inverted index over chunk tokens, maintained incrementally as chunks are written."""
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import asdict
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import get_settings
+from app.databricks.filter_index import FilterIndex, Filters, parse_fields
+from app.databricks.local_index import IndexRow, top_k_indices
+from app.databricks.vector_search import VectorHit
+from app.models.chunk import Chunk
+from app.utils.logging import get_logger
+from app.utils.metrics import timed
+
+try:  # POSIX only; other platforms fall back to the in-process lock.
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+# Chunk tokens with surrounding punctuation stripped; inner separators are kept so
+# part numbers and error codes such as "xj-4410" or "0x80070005" stay one term.
+TERM_RE = re.compile(r"\w+(?:[-./:#]\w+)*")
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_TF = np.iinfo(np.uint16).max
+
+
+def tokenize(text: str) -> List[str]:
+    """Split chunk text into lowercase lexical terms."""
+    return TERM_RE.findall(text.lower())
+
+
+class LexicalIndex:
+    """Incremental BM25 index with compact posting lists.
+
+    Files written next to ``path``:
+
+    - ``path.docs.jsonl``: append-only journal of chunk records; line ``n`` is document
+      number ``n``. Re-adding a chunk id appends a new line and retires the old number;
+      deleting one appends a tombstone line that retires it without indexing anything.
+    - ``path.npz``: snapshot of the postings of every document journaled before it was
+      written, in CSR form (per-term offsets into int32 document numbers and uint16 term
+      frequencies) plus document lengths, liveness and journal offsets. Loading reads
+      the snapshot and re-tokenizes only the journal tail.
+
+    New documents land in small per-term pending lists that are merged into the CSR
+    arrays every ``snapshot_every`` documents. Records are read back from the journal by
+    offset, so chunk text is not held in memory. A ``FilterIndex`` over ``filter_fields``
+    maps documents to their metadata values and is saved with the snapshot.
+    """
+
+    def __init__(
+        self, path: str, snapshot_every: int = 10_000, filter_fields: Sequence[str] = ("document_id",)
+    ) -> None:
+        self.path = path
+        self.docs_path = f"{path}.docs.jsonl"
+        self.snapshot_path = f"{path}.npz"
+        self.lock_path = f"{path}.lock"
+        self.snapshot_every = snapshot_every
+        self._lock = threading.RLock()
+        self._terms: Dict[str, int] = {}
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._doc_ids = np.empty(0, dtype=np.int32)
+        self._tfs = np.empty(0, dtype=np.uint16)
+        self._pending: Dict[str, Tuple[array, array]] = {}
+        self._pending_docs = 0
+        self._lengths = array("i")
+        self._live = bytearray()
+        self._record_offsets = array("q")
+        self._doc_by_chunk: Dict[str, int] = {}
+        self._live_count = 0
+        self._live_length = 0
+        self._journal_offset = 0
+        self.filters = FilterIndex(filter_fields)
+        self._load_snapshot()
+        self.refresh()
+
+    @property
+    def version(self) -> int:
+        """Number of journal records indexed; every ``add`` bumps it."""
+        return len(self._lengths)
+
+    def __len__(self) -> int:
+        return self._live_count
+
+    def refresh(self) -> bool:
+        """Index journal records appended by other processes; True if any were found."""
+        with self._lock:
+            if not os.path.exists(self.docs_path):
+                return False
+            before = self.version
+            with open(self.docs_path, "rb") as handle:
+                handle.seek(self._journal_offset)
+                for line in handle:
+                    if not line.endswith(b"\n"):
+                        break  # A writer is mid-append; pick the line up on the next refresh.
+                    self._index_record(IndexRow(**json.loads(line)), self._journal_offset)
+                    self._journal_offset += len(line)
+            return self.version != before
+
+    def add(self, chunks: Iterable[Chunk]) -> int:
+        """Append chunk records and index their terms; returns the new version."""
+        records = [
+            IndexRow(
+                row=-1,
+                chunk_id=chunk.id,
+                document_id=chunk.document_id,
+                chunk_index=chunk.chunk_index,
+                content=chunk.content,
+                metadata=chunk.metadata,
+                start_offset=chunk.start_offset,
+                end_offset=chunk.end_offset,
+            )
+            for chunk in chunks
+        ]
+        if not records:
+            return self.version
+        with self._lock, self._writer_lock():
+            self.refresh()
+            return self._append(records)
+
+    def delete(self, chunk_ids: Iterable[str]) -> int:
+        """Journal tombstones for ``chunk_ids`` so they stop matching; returns the new version."""
+        with self._lock, self._writer_lock():
+            self.refresh()
+            records = [
+                IndexRow(row=-1, chunk_id=chunk_id, document_id="", chunk_index=-1, content="", deleted=True)
+                for chunk_id in dict.fromkeys(chunk_ids)
+                if chunk_id in self._doc_by_chunk
+            ]
+            if not records:
+                return self.version
+            return self._append(records)
+
+    def search(self, query: str, k: int, filters: Optional[Filters] = None) -> List[Tuple[IndexRow, float]]:
+        """Return the ``k`` live records matching ``filters`` with the highest BM25 score."""
+        self.refresh()
+        with self._lock:
+            allowed = self.filters.rows(filters)
+            if self._live_count == 0 or k <= 0 or (allowed is not None and allowed.size == 0):
+                return []
+            lengths = np.frombuffer(self._lengths, dtype=np.int32)
+            live = np.frombuffer(self._live, dtype=np.bool_)
+            total, average_length = self._live_count, self._live_length / self._live_count
+            doc_parts: List[np.ndarray] = []
+            score_parts: List[np.ndarray] = []
+            for term in set(tokenize(query)):
+                docs, tfs = self._postings(term)
+                keep = live[docs]
+                if allowed is not None:
+                    keep &= np.isin(docs, allowed)
+                docs, tfs = docs[keep], tfs[keep].astype(np.float32)
+                if docs.size == 0:
+                    continue
+                idf = math.log(1.0 + (total - docs.size + 0.5) / (docs.size + 0.5))
+                norm = BM25_K1 * (1.0 - BM25_B + BM25_B * lengths[docs] / average_length)
+                doc_parts.append(docs)
+                score_parts.append(idf * tfs * (BM25_K1 + 1.0) / (tfs + norm))
+            # Views pin the growable buffers; drop them before writers can append again.
+            del lengths, live
+        if not doc_parts:
+            return []
+        # Accumulate per-term contributions over matching documents only, not the corpus.
+        docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+        top = top_k_indices(scores, k)
+        return [(record, float(scores[i])) for record, i in zip(self._read_records(docs[top]), top)]
+
+    def _append(self, records: List[IndexRow]) -> int:
+        """Journal and index ``records``; callers hold both locks."""
+        with open(self.docs_path, "ab") as handle:
+            for record in records:
+                record.row = self.version
+                line = (json.dumps(asdict(record), default=str) + "\n").encode("utf-8")
+                handle.write(line)
+                self._index_record(record, self._journal_offset)
+                self._journal_offset += len(line)
+        if self._pending_docs >= self.snapshot_every:
+            self._write_snapshot()
+        return self.version
+
+    def _postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        term_id = self._terms.get(term)
+        if term_id is None:
+            docs, tfs = np.empty(0, dtype=np.int32), np.empty(0, dtype=np.uint16)
+        else:
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            docs, tfs = self._doc_ids[start:end], self._tfs[start:end]
+        pending = self._pending.get(term)
+        if pending is not None:
+            docs = np.concatenate([docs, np.frombuffer(pending[0], dtype=np.int32)])
+            tfs = np.concatenate([tfs, np.frombuffer(pending[1], dtype=np.uint16)])
+        return docs, tfs
+
+    def _index_record(self, record: IndexRow, journal_offset: int) -> None:
+        doc = len(self._lengths)
+        previous = self._doc_by_chunk.get(record.chunk_id)
+        if previous is not None and self._live[previous]:
+            self._live[previous] = 0
+            self._live_count -= 1
+            self._live_length -= self._lengths[previous]
+        if record.deleted:
+            # Tombstones still take a document number so numbers keep matching journal lines.
+            self._doc_by_chunk.pop(record.chunk_id, None)
+            self._lengths.append(0)
+            self._live.append(0)
+            self._record_offsets.append(journal_offset)
+            self._pending_docs += 1
+            return
+        counts = Counter(tokenize(record.content))
+        length = sum(counts.values())
+        self._doc_by_chunk[record.chunk_id] = doc
+        self._lengths.append(length)
+        self._live.append(1)
+        self._record_offsets.append(journal_offset)
+        self._live_count += 1
+        self._live_length += length
+        for term, tf in counts.items():
+            pending = self._pending.get(term)
+            if pending is None:
+                pending = self._pending[term] = (array("i"), array("H"))
+            pending[0].append(doc)
+            pending[1].append(min(tf, MAX_TF))
+        self._pending_docs += 1
+        self.filters.add(doc, record)
+
+    def _read_records(self, docs: Sequence[int]) -> List[IndexRow]:
+        records = []
+        with open(self.docs_path, "rb") as handle:
+            for doc in docs:
+                handle.seek(self._record_offsets[doc])
+                records.append(IndexRow(**json.loads(handle.readline())))
+        return records
+
+    def _write_snapshot(self) -> None:
+        """Merge pending postings into the CSR arrays, dropping retired documents."""
+        live = np.frombuffer(self._live, dtype=np.bool_).copy()
+        terms: Dict[str, int] = {}
+        offsets = [0]
+        doc_parts: List[np.ndarray] = []
+        tf_parts: List[np.ndarray] = []
+        for term in list(self._terms) + [t for t in self._pending if t not in self._terms]:
+            docs, tfs = self._postings(term)
+            keep = live[docs]
+            if not keep.any():
+                continue
+            terms[term] = len(terms)
+            doc_parts.append(docs[keep])
+            tf_parts.append(tfs[keep])
+            offsets.append(offsets[-1] + int(keep.sum()))
+        self._terms = terms
+        self._offsets = np.asarray(offsets, dtype=np.int64)
+        self._doc_ids = np.concatenate(doc_parts) if doc_parts else np.empty(0, dtype=np.int32)
+        self._tfs = np.concatenate(tf_parts) if tf_parts else np.empty(0, dtype=np.uint16)
+        self._pending = {}
+        self._pending_docs = 0
+        self.filters.compact(live)
+        chunk_ids = [""] * len(self._lengths)
+        for chunk_id, doc in self._doc_by_chunk.items():
+            chunk_ids[doc] = chunk_id
+        tmp_path = f"{self.path}.tmp.{os.getpid()}.npz"
+        np.savez(
+            tmp_path,
+            terms=_encode(list(terms)),
+            chunk_ids=_encode(chunk_ids),
+            offsets=self._offsets,
+            doc_ids=self._doc_ids,
+            tfs=self._tfs,
+            lengths=np.array(self._lengths, dtype=np.int32),
+            live=live,
+            record_offsets=np.array(self._record_offsets, dtype=np.int64),
+            journal_offset=np.int64(self._journal_offset),
+            **self.filters.state(),
+        )
+        os.replace(tmp_path, self.snapshot_path)
+        logger.info(
+            "Wrote lexical index snapshot",
+            extra={"path": self.snapshot_path, "documents": self._live_count, "terms": len(terms)},
+        )
+
+    def _load_snapshot(self) -> None:
+        if not os.path.exists(self.snapshot_path):
+            return
+        with np.load(self.snapshot_path) as snapshot:
+            self._terms = {term: i for i, term in enumerate(_decode(snapshot["terms"]))}
+            self._offsets = snapshot["offsets"]
+            self._doc_ids = snapshot["doc_ids"]
+            self._tfs = snapshot["tfs"]
+            self._lengths = array("i", snapshot["lengths"].tobytes())
+            self._live = bytearray(snapshot["live"].tobytes())
+            self._record_offsets = array("q", snapshot["record_offsets"].tobytes())
+            self._journal_offset = int(snapshot["journal_offset"])
+            chunk_ids = _decode(snapshot["chunk_ids"])
+            filters_loaded = self.filters.restore(snapshot)
+        if not filters_loaded:
+            self._reindex_filters()
+        live = np.array(self._live, dtype=np.bool_)
+        self._doc_by_chunk = {chunk_id: doc for doc, chunk_id in enumerate(chunk_ids) if live[doc]}
+        self._live_count = int(live.sum())
+        self._live_length = int(np.array(self._lengths, dtype=np.int64)[live].sum())
+
+    def _reindex_filters(self) -> None:
+        """Rebuild filter postings from the snapshotted journal prefix (fields changed)."""
+        with open(self.docs_path, "rb") as handle:
+            for doc in range(len(self._record_offsets)):
+                handle.seek(self._record_offsets[doc])
+                record = IndexRow(**json.loads(handle.readline()))
+                if not record.deleted:
+                    self.filters.add(doc, record)
+        logger.info("Rebuilt lexical filter postings", extra={"fields": self.filters.fields})
+
+    @contextmanager
+    def _writer_lock(self) -> Iterator[None]:
+        """Serialise writers across processes sharing the same files."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _encode(values: List[str]) -> np.ndarray:
+    return np.frombuffer(json.dumps(values).encode("utf-8"), dtype=np.uint8)
+
+
+def _decode(buffer: np.ndarray) -> List[str]:
+    return json.loads(buffer.tobytes().decode("utf-8"))
+
+
+@lru_cache()
+def get_lexical_index() -> LexicalIndex:
+    """Return the process-wide lexical index at ``lexical_index_path``."""
+    return LexicalIndex(
+        settings.lexical_index_path, settings.lexical_snapshot_every, parse_fields(settings.filter_fields)
+    )
+
+
+@timed("lexical_index")
+def index_chunks(chunks: Sequence[Chunk]) -> int:
+    """Add written chunks to the lexical index (Databricks would sync from the chunk table)."""
+    version = get_lexical_index().add(chunks)
+    logger.info("Indexed chunks for lexical search", extra={"count": len(chunks), "version": version})
+    return version
+
+
+@timed("lexical_index")
+def delete_chunks(chunk_ids: Iterable[str]) -> int:
+    """Remove chunks from the lexical index, e.g. ones a re-ingested document no longer has."""
+    version = get_lexical_index().delete(chunk_ids)
+    logger.info("Deleted chunks from lexical search", extra={"version": version})
+    return version
+
+
+@timed("lexical_search")
+def search_hits(query: str, k: int = 5, filters: Optional[Filters] = None) -> List[VectorHit]:
+    """Return the top-k chunks matching ``filters`` by BM25 score."""
+    return [
+        VectorHit(chunk=row.to_chunk(), score=score) for row, score in get_lexical_index().search(query, k, filters)
+    ]
+
+
+def index_version() -> int:
+    index = get_lexical_index()
+    index.refresh()
+    return index.version
@@ -0,0 +1,295 @@
+"""Local columnar stand-in for Delta tables: partitioned Parquet plus a version log."""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from app.utils.logging import get_logger
+from app.utils.metrics import timed
+
+logger = get_logger(__name__)
+
+LOG_DIR = "_delta_log"
+COMMIT_RETRIES = 50
+
+
+@dataclass(frozen=True)
+class DataFile:
+    """A Parquet file that is live in a table version."""
+
+    path: str
+    partition_value: str
+    num_records: int
+
+
+class LocalDeltaTable:
+    """Append-only table of Hive-partitioned Parquet files with a Delta-style log.
+
+    Every ``append`` writes one Parquet file per partition value and then commits a
+    JSON log entry ``_delta_log/<version>.json`` listing ``add`` (and, for partition
+    replaces, deletes and compaction, ``remove``) actions. The commit file is published with an atomic hard link that
+    fails if the version exists, so concurrent writers serialise on version numbers like
+    Delta's optimistic protocol. Replaying the log up to any version gives time travel;
+    scans prune files by partition value and read only the requested columns. Compaction
+    only logically removes files, so older versions stay readable.
+
+    The partition column is encoded in the directory name (``<column>=<value>``) rather
+    than stored in the files, and is re-attached on read when projected.
+    """
+
+    def __init__(self, root: str, partition_by: str) -> None:
+        self.root = root
+        self.partition_by = partition_by
+        self.log_dir = os.path.join(root, LOG_DIR)
+        os.makedirs(self.log_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._version = -1
+        self._files: Dict[str, DataFile] = {}
+        self._schema: Optional[pa.Schema] = None
+
+    @property
+    def version(self) -> int:
+        """Latest committed version (-1 for an empty table)."""
+        with self._lock:
+            self._catch_up()
+            return self._version
+
+    @property
+    def schema(self) -> Optional[pa.Schema]:
+        with self._lock:
+            self._catch_up()
+            return self._schema
+
+    @timed("delta_write")
+    def append(self, table: pa.Table, replace_partitions: Optional[Iterable[str]] = None) -> int:
+        """Write ``table`` as one batch: one file per partition value, one commit.
+
+        Files live in ``replace_partitions`` are removed in the same commit, so those
+        partitions switch atomically to exactly the rows written (Delta's ``replaceWhere``).
+        """
+        replaced = {str(value) for value in replace_partitions or ()}
+        if table.num_rows == 0 and not replaced:
+            return self.version
+        with self._lock:
+            self._catch_up()
+            if self._schema is None:
+                self._schema = table.schema
+            else:
+                table = table.select(self._schema.names).cast(self._schema)
+            removes = [{"remove": {"path": f.path}} for f in self._files.values() if f.partition_value in replaced]
+        partition_column = table.column(self.partition_by)
+        data = table.drop_columns([self.partition_by])
+        adds = []
+        for value in pc.unique(partition_column).to_pylist():
+            part = data.filter(pc.equal(partition_column, value))
+            adds.append(self._write_file(str(value), part))
+        actions: List[Dict[str, Any]] = [{"add": add} for add in adds] + removes
+        if not actions:
+            return self.version
+        return self._commit(actions, operation="WRITE", metadata=self._schema)
+
+    def delete(self, column: str, values_by_partition: Mapping[str, Iterable[Any]]) -> Optional[int]:
+        """Drop rows whose ``column`` holds one of the values listed for their partition.
+
+        Only files of the named partitions are read; each one containing a match is
+        rewritten without it. Returns the new version, or None if nothing matched.
+        """
+        wanted = {str(partition): list(values) for partition, values in values_by_partition.items()}
+        with self._lock:
+            self._catch_up()
+            files = [f for f in self._files.values() if wanted.get(f.partition_value)]
+        actions: List[Dict[str, Any]] = []
+        for data_file in files:
+            table = pq.read_table(os.path.join(self.root, data_file.path))
+            matches = pc.is_in(table.column(column), value_set=pa.array(wanted[data_file.partition_value]))
+            if not pc.any(matches).as_py():
+                continue
+            kept = table.filter(pc.invert(matches))
+            if kept.num_rows:
+                actions.append({"add": self._write_file(data_file.partition_value, kept)})
+            actions.append({"remove": {"path": data_file.path}})
+        if not actions:
+            return None
+        return self._commit(actions, operation="DELETE")
+
+    def compact(self, target_rows: int = 100_000) -> Optional[int]:
+        """Merge small files within each partition; returns the new version or None if idle."""
+        with self._lock:
+            self._catch_up()
+            by_partition: Dict[str, List[DataFile]] = defaultdict(list)
+            for data_file in self._files.values():
+                if data_file.num_records < target_rows:
+                    by_partition[data_file.partition_value].append(data_file)
+        actions: List[Dict[str, Any]] = []
+        for partition_value, files in by_partition.items():
+            if len(files) < 2:
+                continue
+            merged = pa.concat_tables(pq.read_table(os.path.join(self.root, f.path)) for f in files)
+            actions.append({"add": self._write_file(partition_value, merged)})
+            actions.extend({"remove": {"path": f.path}} for f in files)
+        if not actions:
+            return None
+        version = self._commit(actions, operation="OPTIMIZE")
+        logger.info(
+            "Compacted local Delta table",
+            extra={"table": self.root, "version": version, "files_removed": sum("remove" in a for a in actions)},
+        )
+        return version
+
+    def files(
+        self,
+        version: Optional[int] = None,
+        partition_values: Optional[Iterable[str]] = None,
+        since_version: Optional[int] = None,
+    ) -> List[DataFile]:
+        """Live files at ``version`` (latest by default), pruned to ``partition_values``.
+
+        With ``since_version``, only files added after that version are returned (like a
+        change feed of appends; compaction re-adds rows that were already there).
+        """
+        if version is None:
+            with self._lock:
+                self._catch_up()
+                live = list(self._files.values())
+        else:
+            live = list(self._replay(version).values())
+        if since_version is not None and since_version >= 0:
+            seen = self._replay(since_version)
+            live = [f for f in live if f.path not in seen]
+        if partition_values is not None:
+            wanted = {str(value) for value in partition_values}
+            live = [f for f in live if f.partition_value in wanted]
+        return live
+
+    def removed_partitions(self, since_version: int, version: Optional[int] = None) -> Set[str]:
+        """Partition values that lost files after ``since_version`` (replaces, deletes, compaction)."""
+        live = {f.path for f in self.files(version)}
+        return {f.partition_value for path, f in self._replay(since_version).items() if path not in live}
+
+    def iter_batches(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        partition_values: Optional[Iterable[str]] = None,
+        version: Optional[int] = None,
+        batch_size: int = 65_536,
+        since_version: Optional[int] = None,
+    ) -> Iterator[pa.RecordBatch]:
+        """Stream record batches with partition pruning and column projection."""
+        schema = self.schema
+        if schema is None:
+            return
+        columns = list(columns) if columns is not None else schema.names
+        file_columns = [name for name in columns if name != self.partition_by]
+        partition_type = schema.field(self.partition_by).type
+        for data_file in self.files(version, partition_values, since_version):
+            parquet = pq.ParquetFile(os.path.join(self.root, data_file.path))
+            for batch in parquet.iter_batches(batch_size=batch_size, columns=file_columns):
+                if self.partition_by in columns:
+                    value = pa.array([data_file.partition_value] * batch.num_rows, type=partition_type)
+                    batch = pa.RecordBatch.from_arrays(
+                        [value if name == self.partition_by else batch.column(name) for name in columns],
+                        names=columns,
+                    )
+                yield batch
+
+    def scan(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        partition_values: Optional[Iterable[str]] = None,
+        version: Optional[int] = None,
+        since_version: Optional[int] = None,
+    ) -> pa.Table:
+        """Read the table (optionally as of ``version``, or only rows added after ``since_version``)."""
+        batches = list(self.iter_batches(columns, partition_values, version, since_version=since_version))
+        if batches:
+            return pa.Table.from_batches(batches)
+        schema = self.schema
+        if schema is None:
+            return pa.table({})
+        names = list(columns) if columns is not None else schema.names
+        return schema.empty_table().select(names)
+
+    def history(self) -> List[Dict[str, Any]]:
+        """Return commit info for every version, oldest first."""
+        entries = []
+        for version in range(self.version + 1):
+            for action in self._read_commit(version):
+                if "commitInfo" in action:
+                    entries.append({"version": version, **action["commitInfo"]})
+        return entries
+
+    def _write_file(self, partition_value: str, table: pa.Table) -> Dict[str, Any]:
+        relative = os.path.join(f"{self.partition_by}={partition_value}", f"part-{uuid.uuid4().hex}.parquet")
+        path = os.path.join(self.root, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pq.write_table(table, path)
+        return {"path": relative, "partitionValue": partition_value, "numRecords": table.num_rows}
+
+    def _commit(self, actions: List[Dict[str, Any]], operation: str, metadata: Optional[pa.Schema] = None) -> int:
+        header: List[Dict[str, Any]] = [{"commitInfo": {"timestamp": int(time.time() * 1000), "operation": operation}}]
+        for _ in range(COMMIT_RETRIES):
+            with self._lock:
+                self._catch_up()
+                version = self._version + 1
+                removed = {a["remove"]["path"] for a in actions if "remove" in a}
+                if removed - set(self._files):
+                    raise RuntimeError("Concurrent commit removed files this operation depends on")
+                entries = list(header)
+                if version == 0 and metadata is not None:
+                    entries.append({"metaData": {"schema": metadata.serialize().to_pybytes().hex()}})
+                tmp_path = os.path.join(self.log_dir, f".{version:020d}.{uuid.uuid4().hex}.tmp")
+                with open(tmp_path, "w", encoding="utf-8") as handle:
+                    for entry in entries + actions:
+                        handle.write(json.dumps(entry) + "\n")
+                try:
+                    os.link(tmp_path, self._commit_path(version))
+                except FileExistsError:
+                    continue  # Another writer took this version; replay it and retry.
+                finally:
+                    os.remove(tmp_path)
+                self._apply(version, entries + actions)
+                return version
+        raise RuntimeError(f"Could not commit to {self.root} after {COMMIT_RETRIES} attempts")
+
+    def _catch_up(self) -> None:
+        while os.path.exists(self._commit_path(self._version + 1)):
+            self._apply(self._version + 1, self._read_commit(self._version + 1))
+
+    def _apply(self, version: int, actions: List[Dict[str, Any]]) -> None:
+        _apply_actions(self._files, actions)
+        for action in actions:
+            if "metaData" in action and self._schema is None:
+                self._schema = pa.ipc.read_schema(pa.py_buffer(bytes.fromhex(action["metaData"]["schema"])))
+        self._version = version
+
+    def _replay(self, version: int) -> Dict[str, DataFile]:
+        files: Dict[str, DataFile] = {}
+        for v in range(version + 1):
+            _apply_actions(files, self._read_commit(v))
+        return files
+
+    def _read_commit(self, version: int) -> List[Dict[str, Any]]:
+        with open(self._commit_path(version), encoding="utf-8") as handle:
+            return [json.loads(line) for line in handle if line.strip()]
+
+    def _commit_path(self, version: int) -> str:
+        return os.path.join(self.log_dir, f"{version:020d}.json")
+
+
+def _apply_actions(files: Dict[str, DataFile], actions: List[Dict[str, Any]]) -> None:
+    for action in actions:
+        if "add" in action:
+            add = action["add"]
+            files[add["path"]] = DataFile(add["path"], add["partitionValue"], add["numRecords"])
+        elif "remove" in action:
+            files.pop(action["remove"]["path"], None)
@@ -0,0 +1,593 @@
+"""Memory-mapped local vector index backing the Vector Search fallback."""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.databricks.ann_index import IVFIndex
+from app.databricks.filter_index import FilterIndex, Filters
+from app.databricks.quantization import Quantizer
+from app.models.chunk import Chunk
+from app.utils.logging import get_logger
+
+try:  # POSIX only; other platforms fall back to the in-process lock.
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = get_logger(__name__)
+
+INITIAL_CAPACITY = 1024
+# Gathering scattered matrix rows costs several times a sequential scan per row, so a
+# filter allowing more than this share of rows scans everything and gathers scores.
+FILTER_GATHER_MAX_FRACTION = 0.25
+# Score-matrix elements materialised per block of a batch search (64 MB of float32).
+BATCH_SCORE_ELEMENTS = 1 << 24
+
+
+@dataclass
+class IndexRow:
+    """Side-table record mapping a matrix row to the chunk it embeds."""
+
+    row: int
+    chunk_id: str
+    document_id: str
+    chunk_index: int
+    content: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    start_offset: Optional[int] = None
+    end_offset: Optional[int] = None
+    # Tombstone written by ``LocalVectorIndex.delete`` or ``LexicalIndex.delete``; it no longer matches searches.
+    deleted: bool = False
+
+    def to_chunk(self) -> Chunk:
+        return Chunk(
+            id=self.chunk_id,
+            document_id=self.document_id,
+            content=self.content,
+            chunk_index=self.chunk_index,
+            metadata=dict(self.metadata),
+            start_offset=self.start_offset,
+            end_offset=self.end_offset,
+        )
+
+
+class LocalVectorIndex:
+    """Exact top-k index over a contiguous float32 matrix persisted with ``np.memmap``.
+
+    Files written next to ``path``:
+
+    - ``path``: row-major float32 matrix of ``capacity`` rows, of which the first
+      ``count`` are live.
+    - ``path.rows.jsonl``: append-only side table mapping rows to chunk ids and content;
+      the last line written for a row wins.
+    - ``path.manifest.json``: dimension, row count, capacity and a version counter that
+      every upsert bumps. The manifest is replaced atomically and acts as the commit point.
+
+    Vectors are L2-normalised on write so the matrix-vector product is cosine similarity.
+    Every process maps the same file, so uvicorn workers share one copy through the page
+    cache and pick up new rows when they observe a newer manifest version.
+
+    When an ``IVFIndex`` is attached, searches only score the rows of the probed inverted
+    lists once the IVF layer is trained; ``exact=True`` always scans the whole matrix.
+
+    A ``FilterIndex`` over ``filter_fields`` is kept in step with the side table. Search
+    filters resolve to the rows they allow before scoring, so only matching rows are
+    scored (or, with IVF, the probed lists are intersected with them).
+
+    When a trained ``Quantizer`` is attached, candidates are scored against its compact
+    codes instead of the matrix and, if its ``rerank`` factor is set, the best
+    ``rerank * k`` are re-scored exactly against their float32 rows.
+
+    ``delete`` tombstones rows: their vectors are zeroed, they leave the filter postings
+    and searches over-fetch by the tombstone count to drop them from results. Upserting
+    the chunk id again revives the row; a rebuild (``IndexGenerations``) drops them.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ivf: Optional[IVFIndex] = None,
+        filter_fields: Sequence[str] = ("document_id",),
+        quantizer: Optional[Quantizer] = None,
+    ) -> None:
+        self.path = path
+        self.rows_path = f"{path}.rows.jsonl"
+        self.manifest_path = f"{path}.manifest.json"
+        self.lock_path = f"{path}.lock"
+        self._lock = threading.RLock()
+        self._matrix: Optional[np.memmap] = None
+        self._rows: List[Optional[IndexRow]] = []
+        self._row_by_chunk: Dict[str, int] = {}
+        self._rows_offset = 0
+        self.dim = 0
+        self.count = 0
+        self.deleted = 0
+        self.capacity = 0
+        self.version = 0
+        self.ivf = ivf
+        self.quantizer = quantizer
+        self.filters = FilterIndex(filter_fields)
+        self.refresh()
+
+    def __len__(self) -> int:
+        """Live (not deleted) rows."""
+        return self.count - self.deleted
+
+    def refresh(self) -> bool:
+        """Re-read the manifest and tail the side table if another writer committed.
+
+        Returns True when the in-memory view changed.
+        """
+        with self._lock:
+            manifest = self._read_manifest()
+            if manifest is None or manifest["version"] == self.version:
+                return False
+            if manifest["capacity"] != self.capacity or manifest["dim"] != self.dim or self._matrix is None:
+                self.dim = manifest["dim"]
+                self.capacity = manifest["capacity"]
+                self._matrix = self._map(self.capacity, mode="r+")
+            self.count = manifest["count"]
+            self.version = manifest["version"]
+            self._tail_rows()
+            if self.ivf is not None:
+                self.ivf.sync(self._matrix[: self.count], self.version)
+            if self.quantizer is not None:
+                self.quantizer.sync(self._matrix[: self.count], self.version)
+            return True
+
+    def upsert(self, records: Sequence[IndexRow], vectors: np.ndarray) -> int:
+        """Append new rows or overwrite rows whose chunk id is already indexed.
+
+        ``records[i].row`` is ignored on input and assigned here. Returns the new index
+        version.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != len(records):
+            raise ValueError("vectors must be a 2-D array with one row per record")
+        if not records:
+            return self.version
+        with self._lock, self._writer_lock():
+            self.refresh()
+            if self.dim == 0:
+                self.dim = vectors.shape[1]
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+            if self.quantizer is not None:
+                self.quantizer.validate(self.dim)
+
+            rows = np.empty(len(records), dtype=np.int64)
+            next_row = self.count
+            pending: Dict[str, int] = {}
+            for i, record in enumerate(records):
+                row = self._row_by_chunk.get(record.chunk_id)
+                if row is None or row >= self.count:
+                    # Rows past the committed count belong to an interrupted write.
+                    row = pending.get(record.chunk_id)
+                if row is None:
+                    row = next_row
+                    next_row += 1
+                    pending[record.chunk_id] = row
+                rows[i] = row
+                record.row = row
+
+            self._ensure_capacity(next_row)
+            normalized = normalize_rows(vectors)
+            self._matrix[rows] = normalized
+            self._matrix.flush()
+            self._append_rows(records)
+            self.count = next_row
+            self.version += 1
+            if self.ivf is not None:
+                self.ivf.add(rows, normalized, self._matrix[: self.count], self.version)
+            if self.quantizer is not None:
+                self.quantizer.add(rows, normalized, self._matrix[: self.count], self.version)
+            self._write_manifest()
+            logger.info(
+                "Upserted rows into local vector index",
+                extra={"path": self.path, "rows": len(records), "count": self.count, "version": self.version},
+            )
+            return self.version
+
+    def delete(self, chunk_ids: Iterable[str]) -> int:
+        """Tombstone the rows of ``chunk_ids``; unknown or already deleted ids are ignored.
+
+        Returns the new index version (unchanged when nothing was deleted).
+        """
+        with self._lock, self._writer_lock():
+            self.refresh()
+            tombstones = []
+            for chunk_id in dict.fromkeys(chunk_ids):
+                row = self._row_by_chunk.get(chunk_id)
+                if row is None or row >= self.count or self._rows[row].deleted:
+                    continue
+                previous = self._rows[row]
+                tombstones.append(
+                    IndexRow(row, chunk_id, previous.document_id, previous.chunk_index, content="", deleted=True)
+                )
+            if not tombstones:
+                return self.version
+            rows = np.asarray([record.row for record in tombstones], dtype=np.int64)
+            zeros = np.zeros((rows.size, self.dim), dtype=np.float32)
+            self._matrix[rows] = zeros
+            self._matrix.flush()
+            self._append_rows(tombstones)
+            self.version += 1
+            # Keep IVF assignments and quantized codes in step with the zeroed rows.
+            if self.ivf is not None:
+                self.ivf.add(rows, zeros, self._matrix[: self.count], self.version)
+            if self.quantizer is not None:
+                self.quantizer.add(rows, zeros, self._matrix[: self.count], self.version)
+            self._write_manifest()
+            logger.info(
+                "Deleted rows from local vector index",
+                extra={"path": self.path, "rows": len(tombstones), "deleted": self.deleted, "version": self.version},
+            )
+            return self.version
+
+    def flush(self) -> None:
+        """Save IVF assignments that ``upsert`` batches up (before a swap or shutdown)."""
+        if self.ivf is not None:
+            self.ivf.flush()
+
+    def document_chunk_ids(self, document_id: str) -> List[str]:
+        """Chunk ids of the live rows of ``document_id``."""
+        self.refresh()
+        with self._lock:
+            if "document_id" in self.filters.fields:
+                rows = self.filters.rows({"document_id": document_id}).tolist()
+            else:
+                rows = [i for i, row in enumerate(self._rows) if row is not None and row.document_id == document_id]
+            return [self._rows[row].chunk_id for row in rows if not self._rows[row].deleted]
+
+    def search(
+        self,
+        vector: Sequence[float],
+        k: int,
+        nprobe: Optional[int] = None,
+        exact: bool = False,
+        filters: Optional[Filters] = None,
+    ) -> List[Tuple[IndexRow, float]]:
+        """Return the ``k`` rows matching ``filters`` with the highest cosine similarity to ``vector``."""
+        self.refresh()
+        query = normalize_rows(np.asarray(vector, dtype=np.float32)[None, :])[0]
+        rows, scores = self._search_rows(query, k + self.deleted, nprobe=nprobe, exact=exact, filters=filters)
+        return self._live_hits(rows, scores, k)
+
+    def search_batch(
+        self,
+        vectors: np.ndarray,
+        k: int,
+        nprobe: Optional[int] = None,
+        exact: bool = False,
+        filters: Optional[Filters] = None,
+    ) -> List[List[Tuple[IndexRow, float]]]:
+        """Search many queries at once; one result list per row of ``vectors``.
+
+        Exact search scores each block of queries against the index with a single
+        matrix-matrix product and selects every query's top-k in one batched partition.
+        Filtered rows are gathered once for the whole batch, and quantized codes are scored
+        for a block of queries at a time. Trained IVF search probes different lists per
+        query, so it runs query by query.
+        """
+        self.refresh()
+        queries = normalize_rows(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        fetch = k + self.deleted
+        if not exact and self.ivf is not None and self.ivf.trained:
+            results = [self._search_rows(query, fetch, nprobe=nprobe, filters=filters) for query in queries]
+        else:
+            results = self._search_rows_batch(queries, fetch, filters, exact=exact)
+        return [self._live_hits(rows, scores, k) for rows, scores in results]
+
+    def recall_report(self, queries: np.ndarray, k: int, nprobes: Sequence[int]) -> List[Dict[str, float]]:
+        """Measure IVF recall@k and latency against exact search for each ``nprobe``.
+
+        Returns one entry per probe setting (plus an exact baseline with ``nprobe`` 0) so
+        the latency/recall trade-off can be chosen from data.
+        """
+        self.refresh()
+        queries = normalize_rows(np.asarray(queries, dtype=np.float32))
+        start = time.perf_counter()
+        exact = [set(self._search_rows(query, k, exact=True)[0].tolist()) for query in queries]
+        exact_ms = (time.perf_counter() - start) * 1000 / max(len(queries), 1)
+        report = [{"nprobe": 0, "recall": 1.0, "latency_ms": exact_ms}]
+        for nprobe in nprobes:
+            start = time.perf_counter()
+            approx = [self._search_rows(query, k, nprobe=nprobe)[0] for query in queries]
+            latency_ms = (time.perf_counter() - start) * 1000 / max(len(queries), 1)
+            hits = [len(truth.intersection(found.tolist())) / max(len(truth), 1) for truth, found in zip(exact, approx)]
+            report.append({"nprobe": nprobe, "recall": float(np.mean(hits)) if hits else 0.0, "latency_ms": latency_ms})
+        return report
+
+    def quantization_report(self, queries: np.ndarray, k: int) -> Dict[str, Any]:
+        """Compare quantized scans with and without float re-ranking against exact float32 search.
+
+        Reports bytes per row for float32 and for the codes, the compression ratio, and
+        recall@k plus per-query latency of each variant over every row (no IVF, no filters).
+        """
+        self.refresh()
+        quantizer = self.quantizer
+        if quantizer is None or not quantizer.trained:
+            return {"mode": getattr(quantizer, "kind", "none"), "trained": False, "rows": self.count}
+        queries = normalize_rows(np.asarray(queries, dtype=np.float32))
+        n, matrix = self.count, self._matrix
+        float_bytes = self.dim * np.dtype(np.float32).itemsize
+        sizes = quantizer.compressed_bytes()
+        report: Dict[str, Any] = {
+            "mode": quantizer.kind,
+            "trained": True,
+            "rows": n,
+            "float32_bytes_per_row": float_bytes,
+            "code_bytes_per_row": sizes["code_bytes"],
+            "params_bytes": sizes["params_bytes"],
+            "compression_ratio": float_bytes / sizes["code_bytes"],
+            "rerank": quantizer.rerank,
+        }
+        start = time.perf_counter()
+        exact = [set(self._search_rows(query, k, exact=True)[0].tolist()) for query in queries]
+        report["float32_latency_ms"] = (time.perf_counter() - start) * 1000 / max(len(queries), 1)
+        for name, rerank in (("adc", 0), ("reranked", max(quantizer.rerank, 1))):
+            start = time.perf_counter()
+            found = [
+                self._quantized_top_k(quantizer, matrix, query[None, :], k, n, None, rerank)[0][0] for query in queries
+            ]
+            report[f"{name}_latency_ms"] = (time.perf_counter() - start) * 1000 / max(len(queries), 1)
+            hits = [len(truth.intersection(rows.tolist())) / max(len(truth), 1) for truth, rows in zip(exact, found)]
+            report[f"{name}_recall"] = float(np.mean(hits)) if hits else 0.0
+        return report
+
+    def _search_rows(
+        self,
+        query: np.ndarray,
+        k: int,
+        nprobe: Optional[int] = None,
+        exact: bool = False,
+        filters: Optional[Filters] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            n, matrix = self.count, self._matrix
+            allowed = self.filters.rows(filters)
+        if allowed is not None:
+            allowed = allowed[: np.searchsorted(allowed, n)]
+        if n == 0 or k <= 0 or (allowed is not None and allowed.size == 0):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        quantizer = None if exact else self._trained_quantizer()
+        if exact or self.ivf is None or not self.ivf.trained:
+            if quantizer is not None:
+                return self._quantized_top_k(quantizer, matrix, query[None, :], k, n, allowed)[0]
+            if allowed is None:
+                scores = matrix[:n] @ query
+                top = top_k_indices(scores, k)
+                return top, scores[top]
+            if allowed.size > FILTER_GATHER_MAX_FRACTION * n:
+                scores = (matrix[:n] @ query)[allowed]
+                top = top_k_indices(scores, k)
+                return allowed[top], scores[top]
+            rows = allowed
+        else:
+            rows = self.ivf.candidates(query, nprobe)
+            rows = np.sort(rows[rows < n])  # Sorted rows keep the gather sequential in the mapping.
+            if allowed is not None:
+                if allowed.size <= rows.size:
+                    rows = allowed  # Scoring every match exactly is cheaper than probing.
+                else:
+                    rows = np.intersect1d(rows, allowed, assume_unique=True)
+                    if rows.size < k:
+                        rows = allowed  # The probed lists held too few matches.
+            if quantizer is not None:
+                return self._quantized_top_k(quantizer, matrix, query[None, :], k, n, rows)[0]
+        scores = matrix[rows] @ query
+        top = top_k_indices(scores, k)
+        return rows[top], scores[top]
+
+    def _search_rows_batch(
+        self, queries: np.ndarray, k: int, filters: Optional[Filters] = None, exact: bool = False
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        with self._lock:
+            n, matrix = self.count, self._matrix
+            allowed = self.filters.rows(filters)
+        if allowed is not None:
+            allowed = allowed[: np.searchsorted(allowed, n)]
+        if n == 0 or k <= 0 or (allowed is not None and allowed.size == 0):
+            empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+            return [empty] * len(queries)
+        quantizer = None if exact else self._trained_quantizer()
+        if quantizer is not None:
+            block = max(1, BATCH_SCORE_ELEMENTS // (n if allowed is None else allowed.size))
+            return [
+                result
+                for start in range(0, len(queries), block)
+                for result in self._quantized_top_k(quantizer, matrix, queries[start : start + block], k, n, allowed)
+            ]
+        if allowed is None or allowed.size > FILTER_GATHER_MAX_FRACTION * n:
+            candidates, columns = matrix[:n], allowed
+        else:
+            candidates, columns = matrix[allowed], None
+        results: List[Tuple[np.ndarray, np.ndarray]] = []
+        block = max(1, BATCH_SCORE_ELEMENTS // candidates.shape[0])
+        for start in range(0, len(queries), block):
+            scores = queries[start : start + block] @ candidates.T
+            if columns is not None:
+                scores = scores[:, columns]
+            top = top_k_indices_batch(scores, k)
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            results.extend(zip(top if allowed is None else allowed[top], top_scores))
+        return results
+
+    def _live_hits(self, rows: np.ndarray, scores: np.ndarray, k: int) -> List[Tuple[IndexRow, float]]:
+        hits = [(self._rows[row], float(score)) for row, score in zip(rows, scores)]
+        if self.deleted:
+            hits = [hit for hit in hits if not hit[0].deleted][:k]
+        return hits
+
+    def _trained_quantizer(self) -> Optional[Quantizer]:
+        return self.quantizer if self.quantizer is not None and self.quantizer.trained else None
+
+    def _quantized_top_k(
+        self,
+        quantizer: Quantizer,
+        matrix: np.ndarray,
+        queries: np.ndarray,
+        k: int,
+        n: int,
+        rows: Optional[np.ndarray],
+        rerank: Optional[int] = None,
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Rank ``rows`` (or the first ``n``) by their codes, then re-rank the leaders in float32."""
+        rerank = quantizer.rerank if rerank is None else rerank
+        scores = quantizer.scores(queries, rows, n)
+        top = top_k_indices_batch(scores, k * max(rerank, 1))
+        results: List[Tuple[np.ndarray, np.ndarray]] = []
+        for query, query_top, query_scores in zip(queries, top, scores):
+            candidates = query_top if rows is None else rows[query_top]
+            if not rerank:
+                results.append((candidates, query_scores[query_top]))
+                continue
+            candidates = np.sort(candidates)  # Sorted rows keep the gather sequential in the mapping.
+            exact_scores = matrix[candidates] @ query
+            best = top_k_indices(exact_scores, k)
+            results.append((candidates[best], exact_scores[best]))
+        return results
+
+    def get(self, chunk_id: str) -> Optional[IndexRow]:
+        """Look up the side-table record for a chunk id; None if it is not indexed or was deleted."""
+        row = self._row_by_chunk.get(chunk_id)
+        record = None if row is None else self._rows[row]
+        return None if record is None or record.deleted else record
+
+    def vectors(self) -> np.ndarray:
+        """Return a read-only view over the live rows of the matrix."""
+        if self._matrix is None:
+            return np.empty((0, self.dim), dtype=np.float32)
+        view = self._matrix[: self.count].view(np.ndarray)
+        view.flags.writeable = False
+        return view
+
+    def paths(self) -> List[str]:
+        """Files backing this index, including IVF and quantizer state."""
+        paths = [self.path, self.rows_path, self.manifest_path, self.lock_path]
+        if self.ivf is not None:
+            paths.append(self.ivf.path)
+        if self.quantizer is not None:
+            paths += [self.quantizer.path, self.quantizer.codes_path]
+        return paths
+
+    def _map(self, capacity: int, mode: str) -> np.memmap:
+        return np.memmap(self.path, dtype=np.float32, mode=mode, shape=(capacity, self.dim))
+
+    def _ensure_capacity(self, rows_needed: int) -> None:
+        if self._matrix is not None and rows_needed <= self.capacity:
+            return
+        capacity = max(self.capacity, INITIAL_CAPACITY)
+        while capacity < rows_needed:
+            capacity *= 2
+        if self._matrix is None and not os.path.exists(self.path):
+            self._matrix = self._map(capacity, mode="w+")
+        else:
+            if self._matrix is not None:
+                self._matrix.flush()
+                self._matrix = None
+            with open(self.path, "r+b") as handle:
+                handle.truncate(capacity * self.dim * np.dtype(np.float32).itemsize)
+            self._matrix = self._map(capacity, mode="r+")
+        self.capacity = capacity
+
+    def _append_rows(self, records: Sequence[IndexRow]) -> None:
+        with open(self.rows_path, "ab") as handle:
+            for record in records:
+                handle.write((json.dumps(asdict(record), default=str) + "\n").encode("utf-8"))
+            self._rows_offset = handle.tell()
+        for record in records:
+            self._set_row(record)
+
+    def _tail_rows(self) -> None:
+        if not os.path.exists(self.rows_path):
+            return
+        with open(self.rows_path, "rb") as handle:
+            handle.seek(self._rows_offset)
+            for line in handle:
+                if not line.endswith(b"\n"):
+                    break  # A writer is mid-append; pick the line up on the next refresh.
+                self._rows_offset += len(line)
+                self._set_row(IndexRow(**json.loads(line)))
+
+    def _set_row(self, record: IndexRow) -> None:
+        if record.row >= len(self._rows):
+            self._rows.extend([None] * (record.row + 1 - len(self._rows)))
+        previous = self._rows[record.row]
+        if previous is not None and previous.chunk_id != record.chunk_id:
+            self._row_by_chunk.pop(previous.chunk_id, None)
+        live = previous is not None and not previous.deleted
+        if live and record.deleted:
+            self.filters.remove(record.row, previous)
+        elif live:
+            self.filters.replace(record.row, previous, record)
+        elif not record.deleted:
+            self.filters.add(record.row, record)
+        self.deleted += int(record.deleted) - int(previous is not None and previous.deleted)
+        self._rows[record.row] = record
+        self._row_by_chunk[record.chunk_id] = record.row
+
+    def _read_manifest(self) -> Optional[Dict[str, int]]:
+        try:
+            with open(self.manifest_path, encoding="utf-8") as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self) -> None:
+        manifest = {"dim": self.dim, "count": self.count, "capacity": self.capacity, "version": self.version}
+        tmp_path = f"{self.manifest_path}.tmp.{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(manifest, handle)
+        os.replace(tmp_path, self.manifest_path)
+
+    @contextmanager
+    def _writer_lock(self) -> Iterator[None]:
+        """Serialise writers across processes sharing the same files."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalise each row, leaving all-zero rows untouched."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Select the indices of the ``k`` largest scores, highest first.
+
+    ``argpartition`` keeps selection linear in the number of scores; only the ``k``
+    winners are sorted.
+    """
+    k = min(k, scores.shape[0])
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def top_k_indices_batch(scores: np.ndarray, k: int) -> np.ndarray:
+    """Row-wise ``top_k_indices`` for a ``(queries, candidates)`` score matrix."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1)
@@ -1,7 +1,15 @@
-"""Utilities for MLflow tracking aligned with Databricks experiments."""
+"""Utilities for MLflow tracking aligned with Databricks experiments.
+
+``mlflow`` is imported and the experiment configured on first use, once per process, so
+importing the app or constructing services neither pays for the (multi-second) import
+nor fails when the tracking server is unreachable.
+"""
 from __future__ import annotations
 
-import mlflow
+import threading
+from contextlib import contextmanager
+from types import ModuleType
+from typing import Iterator
 
 from app.config import get_settings
 from app.utils.logging import get_logger
@@ -9,17 +17,44 @@ from app.utils.logging import get_logger
 logger = get_logger(__name__)
 settings = get_settings()
 
+_lock = threading.Lock()
+_configured = False
+
+
+def configure_experiment() -> ModuleType:
+    """Ensure MLflow is configured for Databricks or local execution; return ``mlflow``.
+
+    Only the first successful call talks to the tracking server. A failure propagates
+    and the next call tries again.
+    """
+    global _configured
+    import mlflow
+
+    if not _configured:
+        with _lock:
+            if not _configured:
+                mlflow.set_tracking_uri(settings.databricks_host)
+                mlflow.set_experiment(settings.experiment_name)
+                _configured = True
+                logger.info(
+                    "Configured MLflow tracking",
+                    extra={"tracking_uri": settings.databricks_host, "experiment": settings.experiment_name},
+                )
+    return mlflow
+
+
+@contextmanager
+def start_run(run_name: str) -> Iterator[ModuleType]:
+    """``mlflow.start_run`` after configuring on first use; yields the ``mlflow`` module.
 
-def configure_experiment() -> None:
-    """Ensure MLflow is configured for Databricks or local execution."""
-    mlflow.set_tracking_uri(settings.databricks_host)
-    mlflow.set_experiment(settings.experiment_name)
-    logger.info(
-        "Configured MLflow tracking",
-        extra={"tracking_uri": settings.databricks_host, "experiment": settings.experiment_name},
-    )
+    A run already open on this thread (e.g. bulk ingestion embedding each group) becomes
+    the parent instead of making MLflow reject the second run.
+    """
+    mlflow = configure_experiment()
+    with mlflow.start_run(run_name=run_name, nested=mlflow.active_run() is not None):
+        yield mlflow
 
 
 def log_prompt_version(prompt_name: str, version: str) -> None:
     """Capture prompt lineage alongside model metadata."""
-    mlflow.log_param(f"prompt_{prompt_name}_version", version)
+    configure_experiment().log_param(f"prompt_{prompt_name}_version", version)
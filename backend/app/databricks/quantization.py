@@ -0,0 +1,352 @@
+"""Compressed vector codes for the local index: 8-bit scalar and product quantization."""
+from __future__ import annotations
+
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.databricks.ann_index import KMEANS_ITERATIONS, RETRAIN_GROWTH, TRAIN_SAMPLES_PER_LIST
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+INITIAL_CODE_CAPACITY = 1024
+SCALAR_TRAIN_SAMPLE = 65536
+# Float32 elements decoded or looked up per scoring block (16 MB).
+SCORE_BLOCK_ELEMENTS = 1 << 22
+
+
+class Quantizer(ABC):
+    """Per-row uint8 codes for the local matrix, scored by asymmetric distance computation.
+
+    Queries stay in float32 and are compared with the codes directly, so scoring only
+    reads ``code_size`` bytes per row instead of ``4 * dim``. The float32 matrix stays on
+    disk: ``LocalVectorIndex`` re-ranks the best ``rerank * k`` candidates against it, which
+    only faults in those rows.
+
+    Files written next to the index (``path`` is a prefix):
+
+    - ``path.npz``: trained parameters, the number of encoded rows and the index version.
+    - ``path.codes``: row-major uint8 memmap of codes, shared between workers like the matrix.
+
+    Training, retraining on ``RETRAIN_GROWTH`` times more rows and the untrained fallback to
+    float32 search follow ``IVFIndex``.
+    """
+
+    kind = ""
+
+    def __init__(self, path: str, min_train_rows: int, rerank: int, train_sample: int, seed: int = 0) -> None:
+        self.path = f"{path}.npz"
+        self.codes_path = f"{path}.codes"
+        self.min_train_rows = min_train_rows
+        self.rerank = rerank
+        self.train_sample = train_sample
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.RLock()
+        self.codes: Optional[np.memmap] = None
+        self.encoded = 0
+        self.trained_rows = 0
+        self.version = 0
+        self.load()
+
+    @property
+    def trained(self) -> bool:
+        return self.codes is not None
+
+    @property
+    @abstractmethod
+    def code_size(self) -> int:
+        """Bytes stored per row."""
+
+    def validate(self, dim: int) -> None:
+        """Reject vector widths this quantizer cannot encode, before any row is written."""
+
+    def load(self) -> None:
+        """Load persisted parameters and map the codes file if present."""
+        if not os.path.exists(self.path) or not os.path.exists(self.codes_path):
+            return
+        with self._lock, np.load(self.path) as data:
+            self._set_params(data)
+            self.encoded = int(data["encoded"])
+            self.trained_rows = int(data["trained_rows"])
+            self.version = int(data["version"])
+            self.codes = self._map(mode="r+")
+
+    def sync(self, matrix: np.ndarray, version: int) -> None:
+        """Bring the codes up to date with ``matrix`` at index ``version``.
+
+        Like ``add``, anything written to the shared codes file here is saved together
+        with the parameters, so other processes never load codes their parameters do not
+        describe.
+        """
+        with self._lock:
+            if version == self.version:
+                return
+            if os.path.exists(self.path) and self._stored_version() > self.version:
+                self.load()
+            count = matrix.shape[0]
+            changed = False
+            if not self.trained or count >= self.trained_rows * RETRAIN_GROWTH:
+                if count >= self.min_train_rows:
+                    self.train(matrix)
+                    changed = True
+            else:
+                if self.codes.shape[0] < count:
+                    self.codes = self._map(mode="r+")  # Another writer grew the file.
+                if self.encoded < count:
+                    self.encode_rows(np.arange(self.encoded, count), matrix[self.encoded : count])
+                    changed = True
+            self.version = version
+            if changed:
+                self.save()
+
+    def add(self, rows: np.ndarray, vectors: np.ndarray, matrix: np.ndarray, version: int) -> None:
+        """Encode upserted rows, training first if the corpus is large enough."""
+        with self._lock:
+            if self.trained and matrix.shape[0] < self.trained_rows * RETRAIN_GROWTH:
+                self.encode_rows(rows, vectors)
+            elif matrix.shape[0] >= self.min_train_rows:
+                self.train(matrix)
+            self.version = version
+            if self.trained:
+                self.save()
+
+    def encode_rows(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        """Write codes for ``rows``, growing the codes file as needed."""
+        needed = int(rows.max()) + 1 if rows.size else 0
+        if needed > self.codes.shape[0]:
+            capacity = max(self.codes.shape[0], INITIAL_CODE_CAPACITY)
+            while capacity < needed:
+                capacity *= 2
+            self.codes.flush()
+            with open(self.codes_path, "r+b") as handle:
+                handle.truncate(capacity * self.code_size)
+            self.codes = self._map(mode="r+")
+        self.codes[rows] = self.encode(vectors)
+        self.codes.flush()
+        self.encoded = max(self.encoded, needed)
+
+    def train(self, matrix: np.ndarray) -> None:
+        """Fit parameters on a sample of ``matrix`` and re-encode every row into a new codes file.
+
+        The codes file is swapped in before callers ``save`` the parameters, and readers
+        only reload on a newer saved version, so a reload always finds matching codes.
+        """
+        count = matrix.shape[0]
+        sample_size = min(count, self.train_sample)
+        sample_rows = np.sort(self._rng.choice(count, size=sample_size, replace=False))
+        self._fit(np.asarray(matrix[sample_rows], dtype=np.float32))
+        capacity = INITIAL_CODE_CAPACITY
+        while capacity < count:
+            capacity *= 2
+        # Readers keep the old file mapped until they load the new parameters.
+        tmp_path = f"{self.codes_path}.tmp.{os.getpid()}"
+        codes = np.memmap(tmp_path, dtype=np.uint8, mode="w+", shape=(capacity, self.code_size))
+        block = max(1, SCORE_BLOCK_ELEMENTS // matrix.shape[1])
+        for start in range(0, count, block):
+            stop = min(start + block, count)
+            codes[start:stop] = self.encode(np.asarray(matrix[start:stop], dtype=np.float32))
+        codes.flush()
+        del codes
+        os.replace(tmp_path, self.codes_path)
+        self.codes = self._map(mode="r+")
+        self.encoded = count
+        self.trained_rows = count
+        logger.info(
+            "Trained vector quantizer",
+            extra={"kind": self.kind, "rows": count, "sample": sample_size, "code_bytes": self.code_size},
+        )
+
+    def scores(self, queries: np.ndarray, rows: Optional[np.ndarray], count: int) -> np.ndarray:
+        """Approximate inner products of ``queries`` with the codes of ``rows`` (or the first ``count`` rows)."""
+        with self._lock:
+            state = self._prepare(queries)
+            codes = self.codes
+        total = count if rows is None else rows.shape[0]
+        out = np.empty((queries.shape[0], total), dtype=np.float32)
+        block = max(1, SCORE_BLOCK_ELEMENTS // (self.code_size * queries.shape[0]))
+        for start in range(0, total, block):
+            stop = min(start + block, total)
+            block_codes = codes[start:stop] if rows is None else codes[rows[start:stop]]
+            out[:, start:stop] = self._score_codes(state, np.asarray(block_codes))
+        return out
+
+    def compressed_bytes(self) -> Dict[str, int]:
+        """Sizes of the codes (per row) and of the trained parameters."""
+        params = self._params() if self.trained else {}
+        return {"code_bytes": self.code_size, "params_bytes": int(sum(value.nbytes for value in params.values()))}
+
+    def save(self) -> None:
+        """Persist parameters and the encoded row count atomically."""
+        tmp_path = f"{self.path}.tmp.{os.getpid()}.npz"
+        np.savez(
+            tmp_path,
+            encoded=self.encoded,
+            trained_rows=self.trained_rows,
+            version=self.version,
+            **self._params(),
+        )
+        os.replace(tmp_path, self.path)
+
+    @abstractmethod
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Return the ``(rows, code_size)`` uint8 codes of float32 ``vectors``."""
+
+    @abstractmethod
+    def _fit(self, sample: np.ndarray) -> None:
+        """Learn the parameters from a float32 training sample."""
+
+    @abstractmethod
+    def _prepare(self, queries: np.ndarray) -> Any:
+        """Per-batch query state consumed by ``_score_codes``."""
+
+    @abstractmethod
+    def _score_codes(self, state: Any, codes: np.ndarray) -> np.ndarray:
+        """Approximate inner products of the prepared queries with ``codes``."""
+
+    @abstractmethod
+    def _params(self) -> Dict[str, np.ndarray]:
+        """Trained parameters as arrays for ``save``."""
+
+    @abstractmethod
+    def _set_params(self, data: Any) -> None:
+        """Restore parameters saved by ``_params``."""
+
+    def _map(self, mode: str) -> np.memmap:
+        rows = os.path.getsize(self.codes_path) // self.code_size
+        return np.memmap(self.codes_path, dtype=np.uint8, mode=mode, shape=(rows, self.code_size))
+
+    def _stored_version(self) -> int:
+        with np.load(self.path) as data:
+            return int(data["version"])
+
+
+class ScalarQuantizer(Quantizer):
+    """One byte per dimension: each coordinate is mapped onto 256 levels of its trained range.
+
+    With ``x ~= low + code * step`` the inner product is ``q . low + (q * step) . code``, so a
+    query is folded into the per-dimension scale once and the codes are scored in a single
+    matrix product (4x smaller than float32).
+    """
+
+    kind = "int8"
+
+    def __init__(self, path: str, min_train_rows: int, rerank: int, seed: int = 0) -> None:
+        self.low: Optional[np.ndarray] = None
+        self.step: Optional[np.ndarray] = None
+        super().__init__(path, min_train_rows, rerank, SCALAR_TRAIN_SAMPLE, seed)
+
+    @property
+    def code_size(self) -> int:
+        return 0 if self.low is None else self.low.shape[0]
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        levels = np.rint((vectors - self.low) / self.step)
+        return np.clip(levels, 0, 255).astype(np.uint8)
+
+    def _fit(self, sample: np.ndarray) -> None:
+        low, high = sample.min(axis=0), sample.max(axis=0)
+        step = (high - low) / 255
+        step[step == 0] = 1.0
+        self.low, self.step = low.astype(np.float32), step.astype(np.float32)
+
+    def _prepare(self, queries: np.ndarray) -> Any:
+        return queries * self.step, queries @ self.low
+
+    def _score_codes(self, state: Any, codes: np.ndarray) -> np.ndarray:
+        scaled, offset = state
+        return scaled @ codes.T.astype(np.float32) + offset[:, None]
+
+    def _params(self) -> Dict[str, np.ndarray]:
+        return {"low": self.low, "step": self.step}
+
+    def _set_params(self, data: Any) -> None:
+        self.low, self.step = data["low"], data["step"]
+
+
+class ProductQuantizer(Quantizer):
+    """``subvectors`` bytes per row: each slice of the vector is replaced by its nearest codeword.
+
+    Every sub-space gets its own k-means codebook of ``centroids`` (at most 256) codewords.
+    A query builds one ``(subvectors, centroids)`` table of inner products with the
+    codewords, and a row's score is the sum of its codes' table entries.
+    """
+
+    kind = "pq"
+
+    def __init__(
+        self, path: str, subvectors: int, centroids: int, min_train_rows: int, rerank: int, seed: int = 0
+    ) -> None:
+        if not 1 <= centroids <= 256:
+            raise ValueError(f"pq_centroids must be between 1 and 256, got {centroids}")
+        self.subvectors = subvectors
+        self.centroids = centroids
+        self.codebooks: Optional[np.ndarray] = None
+        super().__init__(path, max(min_train_rows, centroids), rerank, centroids * TRAIN_SAMPLES_PER_LIST, seed)
+
+    @property
+    def code_size(self) -> int:
+        return self.subvectors
+
+    def validate(self, dim: int) -> None:
+        if dim % self.subvectors:
+            raise ValueError(f"pq_subvectors ({self.subvectors}) must divide the vector dimension ({dim})")
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.empty((vectors.shape[0], self.subvectors), dtype=np.uint8)
+        for part, sub in enumerate(self._split(vectors)):
+            codes[:, part] = nearest_codewords(sub, self.codebooks[part])
+        return codes
+
+    def _fit(self, sample: np.ndarray) -> None:
+        self.validate(sample.shape[1])
+        self.codebooks = np.stack([kmeans(sub, self.centroids, self._rng) for sub in self._split(sample)])
+
+    def _prepare(self, queries: np.ndarray) -> Any:
+        # (queries, subvectors, centroids): inner product of every query slice with every codeword.
+        return np.einsum("qsd,scd->qsc", queries.reshape(queries.shape[0], self.subvectors, -1), self.codebooks)
+
+    def _score_codes(self, state: Any, codes: np.ndarray) -> np.ndarray:
+        scores = np.zeros((state.shape[0], codes.shape[0]), dtype=np.float32)
+        for part in range(self.subvectors):
+            scores += np.take(state[:, part], codes[:, part], axis=1)
+        return scores
+
+    def _params(self) -> Dict[str, np.ndarray]:
+        return {"codebooks": self.codebooks}
+
+    def _set_params(self, data: Any) -> None:
+        self.codebooks = data["codebooks"]
+        self.subvectors, self.centroids = self.codebooks.shape[0], self.codebooks.shape[1]
+
+    def _split(self, vectors: np.ndarray) -> List[np.ndarray]:
+        return np.split(vectors, self.subvectors, axis=1)
+
+
+def kmeans(sample: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """Euclidean Lloyd iterations; empty clusters are re-seeded from random sample points."""
+    k = min(k, sample.shape[0])
+    centroids = sample[rng.choice(sample.shape[0], size=k, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        labels = nearest_codewords(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        sizes = np.bincount(labels, minlength=k)
+        empty = sizes == 0
+        centroids = sums / np.maximum(sizes, 1)[:, None]
+        if empty.any():
+            centroids[empty] = sample[rng.choice(sample.shape[0], size=int(empty.sum()), replace=False)]
+    return centroids.astype(np.float32)
+
+
+def nearest_codewords(vectors: np.ndarray, codewords: np.ndarray, batch_size: int = 8192) -> np.ndarray:
+    """Index of the closest codeword (L2) for each vector."""
+    half_norms = 0.5 * np.einsum("cd,cd->c", codewords, codewords)
+    labels = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], batch_size):
+        block = vectors[start : start + batch_size]
+        labels[start : start + block.shape[0]] = np.argmax(block @ codewords.T - half_norms, axis=1)
+    return labels
@@ -0,0 +1,356 @@
+"""Pooled async HTTP client for the embedding, Vector Search and LLM serving endpoints."""
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import threading
+import time
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, Coroutine, Dict, Hashable, List, Optional, Sequence, TypeVar
+
+import httpx
+import numpy as np
+
+from app.config import get_settings
+from app.utils.logging import get_logger
+from app.utils.metrics import get_metrics, record
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+T = TypeVar("T")
+
+EMBEDDINGS = "embeddings"
+VECTOR_SEARCH = "vector_search"
+LLM = "llm"
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_BACKOFF_SECONDS = 10.0
+JSON_HEADERS = {"Content-Type": "application/json"}
+SEARCH_COLUMNS = ["chunk_id", "document_id", "chunk_index", "content"]
+SERVING_RETRIES = "rag_serving_retries_total"
+SERVING_COALESCED = "rag_serving_coalesced_total"
+SERVING_ERRORS = "rag_serving_errors_total"
+# Marks the end of a relayed stream on the caller's queue.
+_STREAM_END = object()
+
+
+class ServingError(RuntimeError):
+    """A serving call returned a non-retryable error or kept failing after every retry."""
+
+
+class ServingClient:
+    """One keep-alive ``httpx.AsyncClient`` shared by every embedding, search and LLM call.
+
+    The client runs on its own event-loop thread, so the FastAPI loop, threadpool workers
+    (retrieval and embedding are synchronous) and offline scripts all draw on the same
+    connection pool: ``call`` is awaitable from any loop and ``call_sync`` blocks any
+    other thread. On top of the pool:
+
+    - each endpoint has its own concurrency limit, so a burst of LLM calls cannot take
+      every connection away from embeddings;
+    - timeouts, connection errors, 429 and 5xx responses are retried with exponential
+      backoff and jitter, honouring ``Retry-After``;
+    - identical in-flight requests (same path and body) share one call.
+
+    ``chat_stream`` relays server-sent completion deltas as they arrive; it is retried
+    only until the first delta, and never coalesced.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        token: str,
+        concurrency: Dict[str, int],
+        max_connections: int = 64,
+        keepalive_seconds: float = 30.0,
+        timeout_seconds: float = 30.0,
+        connect_timeout_seconds: float = 5.0,
+        max_retries: int = 3,
+        backoff_ms: float = 100.0,
+        coalesce: bool = True,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.concurrency = dict(concurrency)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            # A non-positive keep-alive opens a fresh connection per call (for comparison runs).
+            max_keepalive_connections=max_connections if keepalive_seconds > 0 else 0,
+            keepalive_expiry=keepalive_seconds,
+        )
+        self.timeout = httpx.Timeout(timeout_seconds, connect=connect_timeout_seconds)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_ms / 1000
+        self.coalesce = coalesce
+        self.stats = {"requests": 0, "retries": 0, "coalesced": 0, "errors": 0}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._inflight: Dict[Hashable, "asyncio.Task[Any]"] = {}
+        registry = get_metrics()
+        registry.describe(SERVING_RETRIES, "Serving calls retried after a timeout, connection error, 429 or 5xx.")
+        registry.describe(SERVING_COALESCED, "Serving calls answered by an identical in-flight request.")
+        registry.describe(SERVING_ERRORS, "Serving calls that failed after retries.")
+
+    async def call(self, endpoint: str, path: str, payload: Any) -> Any:
+        """POST ``payload`` as JSON and return the decoded response; awaitable from any event loop."""
+        return await asyncio.wrap_future(self._submit(self._post(endpoint, path, payload)))
+
+    def call_sync(self, endpoint: str, path: str, payload: Any) -> Any:
+        """Blocking ``call`` for worker threads and scripts."""
+        return self._submit(self._post(endpoint, path, payload)).result()
+
+    def call_many_sync(self, endpoint: str, path: str, payloads: Sequence[Any]) -> List[Any]:
+        """Issue ``payloads`` concurrently (within the endpoint's limit) and block for every response."""
+
+        async def gather() -> List[Any]:
+            return list(await asyncio.gather(*(self._post(endpoint, path, payload) for payload in payloads)))
+
+        return self._submit(gather()).result()
+
+    def embed(self, texts: Sequence[str], model: str) -> np.ndarray:
+        """Embed ``texts`` with one call to the ``model`` serving endpoint (OpenAI-style ``input``/``data``)."""
+        response = self.call_sync(EMBEDDINGS, f"/serving-endpoints/{model}/invocations", {"input": list(texts)})
+        data = sorted(response["data"], key=lambda item: item.get("index", 0))
+        return np.asarray([item["embedding"] for item in data], dtype=np.float32)
+
+    def query_index(
+        self,
+        index_name: str,
+        vectors: np.ndarray,
+        k: int,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Run one Vector Search query per row of ``vectors``; rows come back as column dicts with ``score``."""
+        payloads = []
+        for vector in np.atleast_2d(vectors):
+            payload: Dict[str, Any] = {
+                "query_vector": [float(value) for value in vector],
+                "num_results": k,
+                "columns": SEARCH_COLUMNS,
+            }
+            if filters:
+                payload["filters_json"] = json.dumps(filters, sort_keys=True)
+            payloads.append(payload)
+        path = f"/api/2.0/vector-search/indexes/{index_name}/query"
+        return [_result_rows(response) for response in self.call_many_sync(VECTOR_SEARCH, path, payloads)]
+
+    async def chat(self, prompt: str, model: str, max_tokens: int) -> str:
+        """Return the completion of a single-turn chat request to the ``model`` serving endpoint."""
+        payload = {"messages": [{"role": "user", "content": prompt}], "max_tokens": max_tokens}
+        response = await self.call(LLM, f"/serving-endpoints/{model}/invocations", payload)
+        return response["choices"][0]["message"]["content"]
+
+    async def chat_stream(self, prompt: str, model: str, max_tokens: int) -> AsyncIterator[str]:
+        """Yield completion deltas of a ``stream=True`` chat request as the ``model`` endpoint sends them.
+
+        Deltas are read on the client's loop and handed to the caller's loop through a
+        queue; closing the iterator early cancels the request.
+        """
+        payload = {"messages": [{"role": "user", "content": prompt}], "max_tokens": max_tokens, "stream": True}
+        body = json.dumps(payload).encode("utf-8")
+        loop = asyncio.get_running_loop()
+        queue: "asyncio.Queue[Any]" = asyncio.Queue()
+
+        def emit(item: Any) -> None:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+
+        future = self._submit(self._stream(LLM, f"/serving-endpoints/{model}/invocations", body, emit))
+        future.add_done_callback(lambda _: emit(_STREAM_END))
+        try:
+            while (delta := await queue.get()) is not _STREAM_END:
+                yield delta
+            future.result()  # Re-raise a failed call once its deltas are delivered.
+        finally:
+            future.cancel()
+
+    def close(self) -> None:
+        """Close pooled connections and stop the client's event-loop thread."""
+        with self._lock:
+            loop, thread, self._loop, self._thread = self._loop, self._thread, None, None
+        if loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), loop).result()
+            self._client = None
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+        self._semaphores.clear()
+
+    def _submit(self, coroutine: Coroutine[Any, Any, T]) -> "asyncio.Future[T]":
+        return asyncio.run_coroutine_threadsafe(coroutine, self._start())
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=loop.run_forever, name="serving-client", daemon=True)
+                self._thread.start()
+                self._loop = loop
+            return self._loop
+
+    async def _post(self, endpoint: str, path: str, payload: Any) -> Any:
+        body = json.dumps(payload).encode("utf-8")
+        if not self.coalesce:
+            return await self._send(endpoint, path, body)
+        key = (path, body)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._send(endpoint, path, body))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+            get_metrics().increment(SERVING_COALESCED, endpoint=endpoint)
+        # Shielded so one cancelled caller does not cancel the call for the others.
+        return await asyncio.shield(task)
+
+    async def _send(self, endpoint: str, path: str, body: bytes) -> Any:
+        client, semaphore = self._http(), self._semaphore(endpoint)
+        for attempt in range(self.max_retries + 1):
+            self.stats["requests"] += 1
+            retry_after: Optional[float] = None
+            start = time.perf_counter()
+            try:
+                async with semaphore:
+                    response = await client.post(path, content=body, headers=JSON_HEADERS)
+            except httpx.TransportError as exc:  # Timeouts and connection failures.
+                error = f"{type(exc).__name__}: {exc}"
+            else:
+                record(f"serving_{endpoint}", time.perf_counter() - start)
+                if response.status_code not in RETRY_STATUSES:
+                    if response.is_error:
+                        self._failed(endpoint)
+                        raise ServingError(f"{endpoint} returned {response.status_code}: {response.text[:200]}")
+                    return response.json()
+                error = f"HTTP {response.status_code}"
+                retry_after = _retry_after(response)
+            await self._backoff(endpoint, attempt, error, retry_after)
+        raise AssertionError("unreachable")
+
+    async def _stream(self, endpoint: str, path: str, body: bytes, emit: Callable[[str], None]) -> None:
+        """POST ``body`` and pass each server-sent delta to ``emit``; retries stop at the first delta."""
+        client, semaphore = self._http(), self._semaphore(endpoint)
+        for attempt in range(self.max_retries + 1):
+            self.stats["requests"] += 1
+            retry_after: Optional[float] = None
+            start = time.perf_counter()
+            relayed = False
+            try:
+                async with semaphore, client.stream("POST", path, content=body, headers=JSON_HEADERS) as response:
+                    if response.status_code not in RETRY_STATUSES:
+                        if response.is_error:
+                            await response.aread()
+                            self._failed(endpoint)
+                            raise ServingError(f"{endpoint} returned {response.status_code}: {response.text[:200]}")
+                        async for delta in _sse_deltas(response):
+                            relayed = True
+                            emit(delta)
+                        record(f"serving_{endpoint}", time.perf_counter() - start)
+                        return
+                    error = f"HTTP {response.status_code}"
+                    retry_after = _retry_after(response)
+            except httpx.TransportError as exc:
+                error = f"{type(exc).__name__}: {exc}"
+                if relayed:
+                    self._failed(endpoint)
+                    raise ServingError(f"{endpoint} stream broke after the first delta: {error}") from exc
+            await self._backoff(endpoint, attempt, error, retry_after)
+
+    async def _backoff(self, endpoint: str, attempt: int, error: str, retry_after: Optional[float]) -> None:
+        """Sleep before retry ``attempt + 1``, or raise once ``max_retries`` is spent."""
+        if attempt == self.max_retries:
+            self._failed(endpoint)
+            raise ServingError(f"{endpoint} failed after {attempt + 1} attempts: {error}")
+        self.stats["retries"] += 1
+        get_metrics().increment(SERVING_RETRIES, endpoint=endpoint)
+        if retry_after is None:
+            retry_after = self.backoff_seconds * 2**attempt * random.uniform(0.5, 1.5)
+        logger.warning("Retrying serving call", extra={"endpoint": endpoint, "attempt": attempt + 1, "error": error})
+        await asyncio.sleep(min(retry_after, MAX_BACKOFF_SECONDS))
+
+    def _semaphore(self, endpoint: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(endpoint)
+        if semaphore is None:
+            semaphore = self._semaphores[endpoint] = asyncio.Semaphore(self.concurrency.get(endpoint, 16))
+        return semaphore
+
+    def _failed(self, endpoint: str) -> None:
+        self.stats["errors"] += 1
+        get_metrics().increment(SERVING_ERRORS, endpoint=endpoint)
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.token}"},
+                limits=self.limits,
+                timeout=self.timeout,
+            )
+        return self._client
+
+
+@lru_cache()
+def get_serving_client() -> ServingClient:
+    """Return the process-wide client for ``serving_url`` (default ``databricks_host``)."""
+    return ServingClient(
+        settings.serving_url or settings.databricks_host,
+        settings.databricks_token,
+        concurrency={
+            EMBEDDINGS: settings.serving_embedding_concurrency,
+            VECTOR_SEARCH: settings.serving_vector_search_concurrency,
+            LLM: settings.serving_llm_concurrency,
+        },
+        max_connections=settings.serving_max_connections,
+        keepalive_seconds=settings.serving_keepalive_seconds,
+        timeout_seconds=settings.serving_timeout_seconds,
+        connect_timeout_seconds=settings.serving_connect_timeout_seconds,
+        max_retries=settings.serving_max_retries,
+        backoff_ms=settings.serving_retry_backoff_ms,
+        coalesce=settings.serving_coalesce,
+    )
+
+
+def remote_serving() -> bool:
+    """True when embedding, search and LLM calls go to HTTP endpoints instead of in-process mocks."""
+    if settings.serving_backend not in ("mock", "http"):
+        raise ValueError(f"Unknown serving_backend: {settings.serving_backend}")
+    return settings.serving_backend == "http"
+
+
+def close_serving_client() -> None:
+    """Close the shared client if it was ever created."""
+    if get_serving_client.cache_info().currsize:
+        get_serving_client().close()
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    try:
+        return None if value is None else max(float(value), 0.0)
+    except ValueError:
+        return None  # HTTP-date form; fall back to exponential backoff.
+
+
+async def _sse_deltas(response: httpx.Response) -> AsyncIterator[str]:
+    """Content deltas of an OpenAI-style chat completion event stream, up to ``[DONE]``."""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:") :].strip()
+        if data == "[DONE]":
+            return
+        for choice in json.loads(data).get("choices", []):
+            content = (choice.get("delta") or {}).get("content")
+            if content:
+                yield content
+
+
+def _result_rows(response: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Turn a Vector Search ``manifest``/``result.data_array`` response into column dicts."""
+    columns = [column["name"] for column in response["manifest"]["columns"]]
+    return [dict(zip(columns, row)) for row in response.get("result", {}).get("data_array") or []]
@@ -0,0 +1,193 @@
+"""Local stand-in for the Model Serving and Vector Search endpoints, with configurable latency.
+
+Serves the request and response shapes ``serving_client`` speaks:
+
+- ``POST /serving-endpoints/{name}/invocations`` with ``{"input": [...]}`` returns hash
+  embeddings (the same vectors as the in-process mock);
+- the same route with ``{"messages": [...]}`` returns a canned chat completion, paying
+  ``token_delay_ms`` per generated token; with ``"stream": true`` the tokens are sent as
+  server-sent ``chat.completion.chunk`` events as they are "decoded", ending in ``[DONE]``;
+- ``POST /api/2.0/vector-search/indexes/{name}/query`` searches the local memory-mapped
+  index at ``local_vector_store_path``.
+
+Every call sleeps ``latency_ms`` plus up to ``jitter_ms``, at most ``concurrency`` calls
+are served at once (the rest queue, like a saturated endpoint) and ``error_rate`` of calls
+answer 503, so pool sizing, retries and throughput can be measured offline::
+
+    PYTHONPATH=backend python -m app.databricks.standin_server --latency-ms 20 --concurrency 64
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import re
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.databricks.vector_search import EMBEDDING_DIM, acquire_index, hash_embeddings
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_PORT = 18080
+
+
+@dataclass
+class StandinConfig:
+    """Simulated endpoint behaviour."""
+
+    latency_ms: float = 10.0
+    jitter_ms: float = 0.0
+    token_delay_ms: float = 0.0
+    # Calls served at once; 0 means unlimited.
+    concurrency: int = 0
+    error_rate: float = 0.0
+    # Width of the returned embeddings.
+    dim: int = EMBEDDING_DIM
+
+
+def create_standin_app(config: Optional[StandinConfig] = None) -> FastAPI:
+    """Build the stand-in app."""
+    config = config or StandinConfig()
+    app = FastAPI(title="Serving stand-in")
+    app.state.config = config
+    limit = asyncio.Semaphore(config.concurrency) if config.concurrency > 0 else None
+
+    async def serve(extra_seconds: float = 0.0) -> None:
+        if limit is not None:
+            await limit.acquire()
+        try:
+            delay = config.latency_ms + random.uniform(0.0, config.jitter_ms)
+            await asyncio.sleep(delay / 1000 + extra_seconds)
+        finally:
+            if limit is not None:
+                limit.release()
+        if config.error_rate and random.random() < config.error_rate:
+            raise HTTPException(status_code=503, detail="Simulated overload", headers={"Retry-After": "0"})
+
+    async def stream_chat(name: str, tokens: List[str]) -> AsyncIterator[str]:
+        # Holds a concurrency slot for the whole stream, like a decoding replica.
+        if limit is not None:
+            await limit.acquire()
+        try:
+            await asyncio.sleep((config.latency_ms + random.uniform(0.0, config.jitter_ms)) / 1000)
+            for token in tokens:
+                await asyncio.sleep(config.token_delay_ms / 1000)
+                yield _sse(_chat_chunk(name, {"content": token}))
+            yield _sse(_chat_chunk(name, {}, finish_reason="stop"))
+            yield "data: [DONE]\n\n"
+        finally:
+            if limit is not None:
+                limit.release()
+
+    @app.post("/serving-endpoints/{name}/invocations", response_model=None)
+    async def invocations(name: str, payload: Dict[str, Any]) -> Union[Dict[str, Any], StreamingResponse]:
+        if "input" in payload:
+            await serve()
+            return _embeddings_response(name, payload["input"], config.dim)
+        if "messages" in payload:
+            answer = _answer(payload["messages"])
+            tokens = min(len(re.findall(r"\S+", answer)), int(payload.get("max_tokens") or 1 << 30))
+            if payload.get("stream"):
+                if config.error_rate and random.random() < config.error_rate:
+                    raise HTTPException(status_code=503, detail="Simulated overload", headers={"Retry-After": "0"})
+                pieces = re.findall(r"\S+\s*", answer)[:tokens]
+                return StreamingResponse(stream_chat(name, pieces), media_type="text/event-stream")
+            await serve(tokens * config.token_delay_ms / 1000)
+            return _chat_response(name, answer, tokens)
+        raise HTTPException(status_code=400, detail="Expected 'input' (embeddings) or 'messages' (chat)")
+
+    @app.post("/api/2.0/vector-search/indexes/{name}/query")
+    async def query_index(name: str, payload: Dict[str, Any]) -> JSONResponse:
+        await serve()
+        if "query_vector" not in payload:
+            raise HTTPException(status_code=400, detail="Only query_vector queries are supported")
+        filters = json.loads(payload["filters_json"]) if payload.get("filters_json") else None
+        response = await run_in_threadpool(
+            _search_response, payload["query_vector"], int(payload.get("num_results", 10)), payload["columns"], filters
+        )
+        return JSONResponse(response)
+
+    return app
+
+
+def _embeddings_response(model: str, texts: Any, dim: int) -> Dict[str, Any]:
+    texts = [texts] if isinstance(texts, str) else list(texts)
+    vectors = hash_embeddings(texts, dim)
+    return {
+        "object": "list",
+        "model": model,
+        "data": [{"object": "embedding", "index": i, "embedding": vector.tolist()} for i, vector in enumerate(vectors)],
+    }
+
+
+def _answer(messages: List[Dict[str, Any]]) -> str:
+    prompt = str(messages[-1].get("content", "")) if messages else ""
+    return f"Simulated answer grounded on a {len(prompt.split())}-word prompt."
+
+
+def _chat_response(model: str, answer: str, tokens: int) -> Dict[str, Any]:
+    return {
+        "object": "chat.completion",
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+        "usage": {"completion_tokens": tokens},
+    }
+
+
+def _chat_chunk(model: str, delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "object": "chat.completion.chunk",
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def _sse(event: Dict[str, Any]) -> str:
+    return f"data: {json.dumps(event)}\n\n"
+
+
+def _search_response(
+    vector: List[float], k: int, columns: List[str], filters: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    rows = []
+    with acquire_index() as generation:
+        hits = generation.index.search(vector, k, filters=filters)
+    for row, score in hits:
+        values = {**row.metadata, **asdict(row)}
+        rows.append([values.get(column) for column in columns] + [score])
+    return {
+        "manifest": {"column_count": len(columns) + 1, "columns": [{"name": name} for name in [*columns, "score"]]},
+        "result": {"row_count": len(rows), "data_array": rows},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="Base latency of every call")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform extra latency per call")
+    parser.add_argument("--token-delay-ms", type=float, default=0.0, help="Per-token decode time of chat calls")
+    parser.add_argument("--concurrency", type=int, default=0, help="Calls served at once; 0 is unlimited")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with 503")
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM, help="Width of the returned embeddings")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = StandinConfig(
+        args.latency_ms, args.jitter_ms, args.token_delay_ms, args.concurrency, args.error_rate, args.dim
+    )
+    logger.info("Starting serving stand-in", extra={"port": args.port, "config": vars(args)})
+    uvicorn.run(create_standin_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
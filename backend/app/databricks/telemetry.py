@@ -0,0 +1,190 @@
+"""Non-blocking MLflow telemetry for the serving path."""
+from __future__ import annotations
+
+import queue
+import random
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from app.config import get_settings
+from app.databricks import mlflow_tracking
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+# MLflow rejects log_batch calls with more than 1000 metrics.
+MAX_METRICS_PER_BATCH = 1000
+
+
+@dataclass
+class TelemetryEvent:
+    """One request's worth of MLflow params and metrics."""
+
+    run_name: str
+    params: Dict[str, str] = field(default_factory=dict)
+    metrics: Dict[str, float] = field(default_factory=dict)
+    timestamp_ms: int = field(default_factory=lambda: int(time.time() * 1000))
+
+
+class TelemetryQueue:
+    """Bounded in-process queue drained to MLflow by a background thread.
+
+    ``emit`` never blocks: when the queue is full the event is dropped and counted, and
+    ``sample_rate`` lets busy workers keep only a fraction of events up front. The
+    drainer groups events that share a run name and params into one MLflow run and
+    writes their metrics with ``log_batch`` (one metric step per event), so
+    tracking-server latency or outages never reach request handlers.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        batch_size: int,
+        flush_interval_seconds: float,
+        sample_rate: float = 1.0,
+    ) -> None:
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.sample_rate = sample_rate
+        self._queue: "queue.Queue[TelemetryEvent]" = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self.emitted = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.flushed = 0
+        self.flush_failures = 0
+
+    def emit(self, run_name: str, params: Dict[str, object], metrics: Dict[str, float]) -> bool:
+        """Enqueue an event without blocking; returns False if it was sampled out or dropped."""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.sampled_out += 1
+            return False
+        self._ensure_started()
+        event = TelemetryEvent(
+            run_name=run_name,
+            params={key: str(value) for key, value in params.items()},
+            metrics={key: float(value) for key, value in metrics.items()},
+        )
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.emitted += 1
+        return True
+
+    def flush(self) -> None:
+        """Drain everything currently queued; called by the drainer and on shutdown."""
+        while True:
+            batch = self._take(self.batch_size, timeout=0)
+            if not batch:
+                return
+            self._write(batch)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the drainer thread after a final flush."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        """Return queue depth and emit/drop/flush counters."""
+        return {
+            "queue_depth": self._queue.qsize(),
+            "emitted": self.emitted,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "flushed": self.flushed,
+            "flush_failures": self.flush_failures,
+        }
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name="mlflow-telemetry", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            batch = self._take(self.batch_size, timeout=self.flush_interval_seconds)
+            if batch:
+                self._write(batch)
+
+    def _take(self, limit: int, timeout: float) -> List[TelemetryEvent]:
+        """Collect up to ``limit`` events, waiting at most ``timeout`` for the first one."""
+        batch: List[TelemetryEvent] = []
+        try:
+            batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+        except queue.Empty:
+            return batch
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[TelemetryEvent]) -> None:
+        groups: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], List[TelemetryEvent]] = defaultdict(list)
+        for event in batch:
+            groups[(event.run_name, tuple(sorted(event.params.items())))].append(event)
+        try:
+            mlflow = mlflow_tracking.configure_experiment()
+        except Exception:  # noqa: BLE001 - batch is dropped; only the connection is retried next flush.
+            self.flush_failures += 1
+            logger.warning(
+                "Dropping telemetry batch: MLflow tracking is unavailable", extra={"events": len(batch)}, exc_info=True
+            )
+            return
+        from mlflow.entities import Metric, Param
+
+        client = mlflow.MlflowClient()
+        for (run_name, params), events in groups.items():
+            try:
+                experiment = mlflow.get_experiment_by_name(settings.experiment_name)
+                run = client.create_run(
+                    experiment.experiment_id if experiment else "0", run_name=f"{run_name}-batch"
+                )
+                metrics = [
+                    Metric(key, value, event.timestamp_ms, step)
+                    for step, event in enumerate(events)
+                    for key, value in event.metrics.items()
+                ]
+                client.log_batch(
+                    run.info.run_id,
+                    params=[Param(key, value) for key, value in params] + [Param("events", str(len(events)))],
+                )
+                for start in range(0, len(metrics), MAX_METRICS_PER_BATCH):
+                    client.log_batch(run.info.run_id, metrics=metrics[start : start + MAX_METRICS_PER_BATCH])
+                client.set_terminated(run.info.run_id)
+                self.flushed += len(events)
+            except Exception:  # noqa: BLE001 - telemetry must never take the worker down.
+                self.flush_failures += 1
+                logger.warning(
+                    "Dropping telemetry batch after MLflow flush failure",
+                    extra={"run_name": run_name, "events": len(events)},
+                    exc_info=True,
+                )
+
+
+@lru_cache()
+def get_telemetry() -> TelemetryQueue:
+    """Return the process-wide telemetry queue."""
+    return TelemetryQueue(
+        max_size=settings.telemetry_queue_size,
+        batch_size=settings.telemetry_batch_size,
+        flush_interval_seconds=settings.telemetry_flush_interval_seconds,
+        sample_rate=settings.telemetry_sample_rate,
+    )
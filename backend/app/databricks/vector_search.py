@@ -2,16 +2,30 @@
 from __future__ import annotations
 
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from dataclasses import dataclass
-from typing import List
+from functools import lru_cache
+from typing import Any, ContextManager, Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
 
 from app.config import get_settings
+from app.databricks.ann_index import IVFIndex
+from app.databricks.filter_index import Filters, parse_fields
+from app.databricks.index_generations import IndexGeneration, IndexGenerations
+from app.databricks.local_index import IndexRow, LocalVectorIndex
+from app.databricks.quantization import ProductQuantizer, Quantizer, ScalarQuantizer
+from app.databricks.serving_client import get_serving_client, remote_serving
 from app.models.chunk import Chunk
 from app.utils.logging import get_logger
+from app.utils.metrics import timed
 
 logger = get_logger(__name__)
 settings = get_settings()
 
+EMBEDDING_DIM = hashlib.sha256().digest_size
+
 
 @dataclass
 class VectorHit:
@@ -21,49 +35,374 @@ class VectorHit:
     score: float
 
 
+@lru_cache()
+def get_index_generations() -> IndexGenerations:
+    """Return the process-wide generations of the index at ``local_vector_store_path``."""
+    return IndexGenerations(
+        settings.local_vector_store_path,
+        lambda path: open_local_index(path=path),
+        settings.embedding_model,
+        keep=settings.index_keep_generations,
+        batch_rows=settings.index_rebuild_batch_size,
+    )
+
+
+def get_local_index() -> LocalVectorIndex:
+    """Return the live generation of the local index (unpinned; queries use ``acquire_index``)."""
+    return get_index_generations().current().index
+
+
+def flush_local_index() -> None:
+    """Persist batched IVF state of the live generation, if it was ever opened."""
+    if get_index_generations.cache_info().currsize:
+        get_local_index().flush()
+
+
+def acquire_index() -> ContextManager[IndexGeneration]:
+    """Pin the live index generation so a concurrent swap cannot retire it mid-query."""
+    return get_index_generations().acquire()
+
+
+def open_local_index(
+    quantization: Optional[str] = None, rerank: Optional[int] = None, path: Optional[str] = None
+) -> LocalVectorIndex:
+    """Map a new view of the local index configured from settings.
+
+    ``quantization`` and ``rerank`` override ``Settings.vector_quantization`` and
+    ``Settings.quantization_rerank``, so offline sweeps can compare storage modes over the
+    same rows; serving code uses the shared ``get_local_index()``. ``path`` defaults to
+    the live generation.
+    """
+    path = path or get_local_index().path
+    ivf: Optional[IVFIndex] = None
+    if settings.vector_index_mode == "ivf":
+        ivf = IVFIndex(
+            f"{path}.ivf.npz",
+            nlist=settings.ivf_nlist,
+            nprobe=settings.ivf_nprobe,
+            min_train_rows=settings.ivf_min_train_rows,
+            save_every=settings.ivf_save_every,
+        )
+    elif settings.vector_index_mode != "flat":
+        raise ValueError(f"Unknown vector_index_mode: {settings.vector_index_mode}")
+    return LocalVectorIndex(
+        path,
+        ivf=ivf,
+        filter_fields=parse_fields(settings.filter_fields),
+        quantizer=build_quantizer(path, quantization, rerank),
+    )
+
+
+def build_quantizer(path: str, mode: Optional[str] = None, rerank: Optional[int] = None) -> Optional[Quantizer]:
+    """Return the quantizer for the index at ``path``; ``mode`` defaults to ``Settings.vector_quantization``."""
+    mode = mode or settings.vector_quantization
+    rerank = settings.quantization_rerank if rerank is None else rerank
+    if mode == "none":
+        return None
+    if mode == "int8":
+        return ScalarQuantizer(f"{path}.int8", min_train_rows=settings.quantization_min_train_rows, rerank=rerank)
+    if mode == "pq":
+        return ProductQuantizer(
+            f"{path}.pq",
+            subvectors=settings.pq_subvectors,
+            centroids=settings.pq_centroids,
+            min_train_rows=settings.quantization_min_train_rows,
+            rerank=rerank,
+        )
+    raise ValueError(f"Unknown vector_quantization: {mode}")
+
+
 def ensure_vector_index() -> None:
     """Create vector index if missing.
 
     On Databricks this would call the Vector Search API to create or sync an index.
-    Locally we only log the intent so the call graph remains explicit for reviewers.
+    Locally we open (or lazily create) the memory-mapped index so the first query does
+    not pay for mapping the file.
     """
+    generation = get_index_generations().current()
+    index = generation.index
     logger.info(
         "Ensuring vector search index exists",
-        extra={"index_name": settings.vector_index_name, "backing_table": "embedded_chunks"},
+        extra={
+            "index_name": settings.vector_index_name,
+            "backing_table": "embedded_chunks",
+            "local_path": index.path,
+            "generation": generation.number,
+            "delta_version": generation.delta_version,
+            "mode": settings.vector_index_mode,
+            "quantization": settings.vector_quantization,
+            "rows": len(index),
+        },
     )
 
 
+@timed("embed")
 def embed_text(text: str, model: str) -> list[float]:
-    """Mock embedding function using deterministic hashing for parity tests."""
+    """Embed one text; the mock hashes it deterministically for parity tests."""
+    if remote_serving():
+        return get_serving_client().embed([text], model)[0].tolist()
     digest = hashlib.sha256(text.encode("utf-8")).digest()
     return [float(b) / 255.0 for b in digest[:64]]
 
 
-def upsert_embeddings(chunks: List[Chunk]) -> None:
-    """Simulate upserting embeddings into Databricks Vector Search or FAISS."""
+@timed("embed")
+def embed_batch(
+    texts: Sequence[str],
+    model: str,
+    batch_size: Optional[int] = None,
+    max_workers: Optional[int] = None,
+) -> np.ndarray:
+    """Embed ``texts`` into one contiguous float32 matrix of shape ``(len(texts), dim)``.
+
+    Texts are split into requests of ``batch_size``; with ``max_workers > 1`` requests
+    are issued concurrently, which is what pays off against a model-serving endpoint.
+    ``dim`` is the width of the first returned block; a width that differs from the
+    local index raises ``ValueError`` before anything is written.
+    """
+    batch_size = batch_size or settings.embedding_batch_size
+    max_workers = settings.embedding_max_workers if max_workers is None else max_workers
+    index_dim = get_local_index().dim
+    output: Optional[np.ndarray] = None
+    starts = range(0, len(texts), batch_size)
+    batches = [texts[start : start + batch_size] for start in starts]
+    if max_workers > 1 and len(batches) > 1:
+        blocks = _embedding_executor(max_workers).map(lambda batch: _embed_request(batch, model), batches)
+    else:
+        blocks = (_embed_request(batch, model) for batch in batches)
+    for start, block in zip(starts, blocks):
+        if output is None:
+            if index_dim and block.shape[1] != index_dim:
+                raise ValueError(
+                    f"Embedding model {model!r} returned {block.shape[1]}-dimensional vectors but the "
+                    f"local vector index holds {index_dim}-dimensional ones; rebuild the index for this model"
+                )
+            output = np.empty((len(texts), block.shape[1]), dtype=np.float32)
+        elif block.shape[1] != output.shape[1]:
+            raise ValueError(
+                f"Embedding model {model!r} returned blocks of {output.shape[1]} and {block.shape[1]} dimensions"
+            )
+        output[start : start + block.shape[0]] = block
+    if output is None:
+        return np.empty((0, index_dim or EMBEDDING_DIM), dtype=np.float32)
+    return output
+
+
+@timed("vector_upsert")
+def upsert_embeddings(chunks: List[Chunk], embeddings: Optional[np.ndarray] = None) -> int:
+    """Upsert embedded chunks into the local index (Databricks syncs from Delta).
+
+    ``embeddings`` is the batch matrix aligned with ``chunks``; when omitted it is
+    stacked from each chunk's ``embedding``. Chunk ids are content-addressed per
+    document, so chunks whose id is already indexed are skipped. Returns the number of
+    rows upserted.
+    """
+    if not chunks:
+        return 0
+    if embeddings is None:
+        missing = [chunk.id for chunk in chunks if chunk.embedding is None]
+        if missing:
+            raise ValueError(f"Chunks without embeddings cannot be indexed: {missing[:5]}")
+        embeddings = np.asarray([chunk.embedding for chunk in chunks], dtype=np.float32)
+    with acquire_index() as generation:
+        index = generation.index
+        index.refresh()
+        seen = set()
+        keep: List[int] = []
+        for i, chunk in enumerate(chunks):
+            if chunk.id not in seen and index.get(chunk.id) is None:
+                seen.add(chunk.id)
+                keep.append(i)
+        if not keep:
+            return 0
+        if len(keep) < len(chunks):
+            chunks = [chunks[i] for i in keep]
+            embeddings = embeddings[keep]
+        records = [
+            IndexRow(
+                row=-1,
+                chunk_id=chunk.id,
+                document_id=chunk.document_id,
+                chunk_index=chunk.chunk_index,
+                content=chunk.content,
+                metadata=chunk.metadata,
+                start_offset=chunk.start_offset,
+                end_offset=chunk.end_offset,
+            )
+            for chunk in chunks
+        ]
+        version = index.upsert(records, embeddings)
     logger.info(
         "Upserting embeddings into vector index",
-        extra={"index": settings.vector_index_name, "count": len(chunks)},
+        extra={"index": settings.vector_index_name, "count": len(chunks), "version": version},
     )
+    return len(chunks)
+
+
+def indexed_chunk_ids(chunk_ids: Iterable[str]) -> Set[str]:
+    """The subset of ``chunk_ids`` already in the live index."""
+    index = get_local_index()
+    index.refresh()
+    return {chunk_id for chunk_id in chunk_ids if index.get(chunk_id) is not None}
+
+
+def delete_chunks(chunk_ids: Iterable[str]) -> int:
+    """Remove chunks from the live index (Databricks drops them when Delta sync deletes their rows).
+
+    Returns the new index version.
+    """
+    with acquire_index() as generation:
+        return generation.index.delete(chunk_ids)
+
+
+def index_version(generation: Optional[IndexGeneration] = None) -> str:
+    """Return ``<generation>.<version>`` of the live (or given) index; upserts and swaps change it."""
+    generation = generation or get_index_generations().current()
+    generation.index.refresh()
+    return generation.label
 
 
-def search(query: str, k: int = 5) -> List[Chunk]:
+def rebuild_index(delta_version: Optional[int] = None, background: bool = False) -> Dict[str, Any]:
+    """Rebuild the local index from ``embedded_chunks`` as a new generation and swap it in.
+
+    With ``background=True`` the build runs on a thread while queries keep using the live
+    generation. Returns the generations status; raises ``RuntimeError`` if a rebuild is
+    already running.
+    """
+    generations = get_index_generations()
+    if background:
+        if not generations.start_rebuild(delta_version):
+            raise RuntimeError("An index rebuild is already running")
+    else:
+        generations.rebuild(delta_version)
+    return generations.status()
+
+
+def sync_index() -> int:
+    """Apply ``embedded_chunks`` appends since the live generation's Delta version; returns rows applied."""
+    return get_index_generations().apply_changes()
+
+
+@timed("vector_search")
+def search_by_vector(
+    embedding: Sequence[float],
+    k: int = 5,
+    nprobe: Optional[int] = None,
+    filters: Optional[Filters] = None,
+    generation: Optional[IndexGeneration] = None,
+) -> List[VectorHit]:
+    """Return the top-k hits for an already embedded query.
+
+    ``nprobe`` overrides ``Settings.ivf_nprobe`` for a single call in IVF mode.
+    ``filters`` (``{field: value or [values]}`` over ``Settings.filter_fields``) restrict
+    the rows that are scored. With ``serving_backend="http"`` the query goes to the
+    Vector Search query API instead, where ``nprobe`` does not apply. ``generation``
+    is an index generation pinned by the caller; otherwise one is pinned for the call.
+    """
+    if remote_serving():
+        return _remote_hits(np.asarray([embedding], dtype=np.float32), k, filters)[0]
+    with _pinned(generation) as pinned:
+        hits = pinned.index.search(embedding, k, nprobe=nprobe, filters=filters)
+    return [VectorHit(chunk=row.to_chunk(), score=score) for row, score in hits]
+
+
+@timed("vector_search")
+def search_batch_by_vector(
+    embeddings: np.ndarray,
+    k: int = 5,
+    nprobe: Optional[int] = None,
+    filters: Optional[Filters] = None,
+    generation: Optional[IndexGeneration] = None,
+) -> List[List[VectorHit]]:
+    """Return the top-k hits for each row of an ``(queries, dim)`` embedding matrix.
+
+    Remote queries are issued concurrently over the pooled serving client.
+    """
+    if remote_serving():
+        return _remote_hits(embeddings, k, filters)
+    with _pinned(generation) as pinned:
+        results = pinned.index.search_batch(embeddings, k, nprobe=nprobe, filters=filters)
+    return [[VectorHit(chunk=row.to_chunk(), score=score) for row, score in hits] for hits in results]
+
+
+def search_hits(
+    query: str, k: int = 5, nprobe: Optional[int] = None, filters: Optional[Filters] = None
+) -> List[VectorHit]:
+    """Embed the query and return the top-k hits with their cosine scores."""
+    return search_by_vector(embed_text(query, settings.embedding_model), k, nprobe=nprobe, filters=filters)
+
+
+def search(query: str, k: int = 5, filters: Optional[Filters] = None) -> List[Chunk]:
     """Perform vector similarity search.
 
-    This mock implementation returns synthetic chunks while preserving the API shape
-    expected from Databricks Vector Search. When running on Databricks, swap this
-    logic for calls to the native client.
+    Locally this scores the memory-mapped index built by ``upsert_embeddings``. When
+    running on Databricks, swap this logic for calls to the native client (``filters``
+    maps onto its ``filters`` argument).
     """
-    embedding = embed_text(query, settings.embedding_model)
-    hits: List[Chunk] = []
-    for idx in range(k):
-        chunk = Chunk(
-            id=f"synthetic-{idx}",
-            document_id="synthetic",
-            content=f"Relevant passage {idx} for query: {query}",
-            chunk_index=idx,
-            metadata={"synthetic": True},
-            embedding=embedding,
-        )
-        hits.append(chunk)
-    return hits
+    return [hit.chunk for hit in search_hits(query, k, filters=filters)]
+
+
+def measure_recall(
+    queries: Sequence[str], k: int = 10, nprobes: Sequence[int] = (1, 2, 4, 8, 16, 32, 64)
+) -> List[Dict[str, float]]:
+    """Report IVF recall@k and per-query latency against exact search for each nprobe."""
+    report = get_local_index().recall_report(embed_batch(list(queries), settings.embedding_model), k, nprobes)
+    logger.info("Measured ANN recall against exact search", extra={"k": k, "report": report})
+    return report
+
+
+def measure_quantization(queries: Sequence[str], k: int = 10) -> Dict[str, Any]:
+    """Report compression ratio and recall@k of quantized search, with and without re-ranking, against float32."""
+    report = get_local_index().quantization_report(embed_batch(list(queries), settings.embedding_model), k)
+    logger.info("Measured quantized search against float32", extra={"k": k, "report": report})
+    return report
+
+
+def hash_embeddings(texts: Sequence[str], dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Deterministic mock embeddings: each text's sha256 digest (shake_256 for other widths) scaled to [0, 1]."""
+    if dim == EMBEDDING_DIM:
+        digests = b"".join(hashlib.sha256(text.encode("utf-8")).digest() for text in texts)
+    else:
+        digests = b"".join(hashlib.shake_256(text.encode("utf-8")).digest(dim) for text in texts)
+    block = np.frombuffer(digests, dtype=np.uint8).reshape(len(texts), dim)
+    return block.astype(np.float32) / np.float32(255.0)
+
+
+def _embed_request(texts: Sequence[str], model: str) -> np.ndarray:
+    """Embed one request's worth of texts.
+
+    With ``serving_backend="http"`` this is a single Model Serving call per batch; the
+    mock hashes each text and converts all digests with one vectorized cast.
+    """
+    if remote_serving():
+        return get_serving_client().embed(texts, model)
+    return hash_embeddings(texts)
+
+
+def _pinned(generation: Optional[IndexGeneration]) -> ContextManager[IndexGeneration]:
+    return nullcontext(generation) if generation is not None else acquire_index()
+
+
+def _remote_hits(embeddings: np.ndarray, k: int, filters: Optional[Filters]) -> List[List[VectorHit]]:
+    """Query the Vector Search index over HTTP, one concurrent call per embedding."""
+    results = get_serving_client().query_index(settings.vector_index_name, embeddings, k, filters)
+    return [
+        [
+            VectorHit(
+                chunk=Chunk(
+                    id=row["chunk_id"],
+                    document_id=row["document_id"],
+                    content=row["content"],
+                    chunk_index=int(row["chunk_index"]),
+                ),
+                score=float(row["score"]),
+            )
+            for row in rows
+        ]
+        for rows in results
+    ]
+
+
+@lru_cache()
+def _embedding_executor(max_workers: int) -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embedding")
+
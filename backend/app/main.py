@@ -1,12 +1,17 @@
 """FastAPI entrypoint for the Databricks RAG platform."""
+from typing import List
+
 from fastapi import FastAPI
 
-from app.api import health, ingest, query
-from app.config import Settings
+from app.api import health, ingest, metrics, query
+from app.config import get_settings
+from app.databricks import lexical_index, mlflow_tracking, vector_search
+from app.databricks.serving_client import close_serving_client
+from app.databricks.telemetry import get_telemetry
 from app.utils.logging import configure_logging
 
 
-settings = Settings()
+settings = get_settings()
 logger = configure_logging(settings.log_level)
 
 
@@ -17,7 +22,9 @@ def create_app() -> FastAPI:
         description="Production-ready RAG stack targeting Databricks and local parity.",
         version="0.1.0",
     )
+    app.add_middleware(metrics.TimingMiddleware, timing_header=settings.metrics_timing_header)
     app.include_router(health.router)
+    app.include_router(metrics.router)
     app.include_router(ingest.router)
     app.include_router(query.router)
     return app
@@ -28,6 +35,45 @@ app = create_app()
 
 @app.on_event("startup")
 async def startup_event() -> None:
-    """Lifecycle hook to ensure metadata tables are ready."""
-    logger.info("Application startup: initializing tables and vector indices")
-    health.bootstrap_platform()
+    """Start background warm-up; ``/health/ready`` reports 503 until it finishes."""
+    logger.info("Application startup: warming tables, indexes and services in the background")
+    health.readiness.start(warmup_steps())
+    ingest.get_bulk_service().start()
+    if settings.pipeline_enabled:
+        await ingest.get_pipeline().start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    """Stop background pipeline and bulk workers, flush telemetry and index state, close serving connections."""
+    await ingest.get_pipeline().stop()
+    ingest.get_bulk_service().stop()
+    get_telemetry().stop()
+    vector_search.flush_local_index()
+    close_serving_client()
+
+
+def warmup_steps() -> List[health.WarmupStep]:
+    """Startup work, in order; see ``health.Readiness`` for gating."""
+    steps: List[health.WarmupStep] = [("bootstrap", health.bootstrap_platform, True)]
+    if settings.startup_warmup:
+        steps += [
+            ("services", _build_services, True),
+            ("lexical_index", lexical_index.get_lexical_index, True),
+            ("search", _warm_search, True),
+            ("mlflow", mlflow_tracking.configure_experiment, False),
+        ]
+    return steps
+
+
+def _build_services() -> None:
+    ingest.get_service()
+    ingest.get_bulk_service()
+    query.get_generation_service()
+
+
+def _warm_search() -> None:
+    """Fault in index pages and numeric kernels with throwaway searches (results are not cached)."""
+    embedding = vector_search.embed_batch(["warm up"], settings.embedding_model)
+    vector_search.search_batch_by_vector(embedding, 1)
+    lexical_index.search_hits("warm up", 1)
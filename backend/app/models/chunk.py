@@ -2,16 +2,35 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Optional, Sequence
 
 
-@dataclass
+@dataclass(slots=True)
 class Chunk:
-    """A chunk of text derived from a source document."""
+    """A chunk of text derived from a source document.
+
+    Slotted to drop the per-instance ``__dict__``; ``ChunkArray`` stores large chunk
+    sets column-wise behind the same attribute API.
+    """
 
     id: str
     document_id: str
     content: str
     chunk_index: int
     metadata: Dict[str, Any] = field(default_factory=dict)
-    embedding: Optional[List[float]] = None
+    # A list of floats or a row view into the float32 matrix of an embedding batch.
+    embedding: Optional[Sequence[float]] = None
+    # Content-addressed identity: hash of the normalized text plus the embedding model.
+    content_hash: Optional[str] = None
+    # Character offsets of ``content`` in the document's normalized text, for citations.
+    start_offset: Optional[int] = None
+    end_offset: Optional[int] = None
+
+
+def content_chunk_id(document_id: str, content_hash: str, occurrence: int = 0) -> str:
+    """Content-addressed chunk id, stable while the text of the chunk is unchanged.
+
+    ``occurrence`` counts earlier chunks of the same document with identical text.
+    """
+    base = f"{document_id}-{content_hash[:16]}"
+    return base if occurrence == 0 else f"{base}-{occurrence}"
@@ -0,0 +1,298 @@
+"""Columnar, array-backed chunk container for large in-memory chunk sets."""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Sized, Union, overload
+
+import numpy as np
+
+from app.models.chunk import Chunk, content_chunk_id
+
+INITIAL_CAPACITY = 64
+
+
+class ChunkView:
+    """Chunk-compatible record that reads and writes one row of a ``ChunkArray``.
+
+    Exposes the same attributes as ``Chunk`` so services that iterate chunks accept
+    either. ``embedding`` is a view into the array's shared buffer and ``metadata`` is
+    the interned dict shared by every chunk with equal metadata, so treat it as
+    read-only.
+    """
+
+    __slots__ = ("_array", "_row")
+
+    def __init__(self, array: "ChunkArray", row: int) -> None:
+        self._array = array
+        self._row = row
+
+    @property
+    def id(self) -> str:
+        return self._array.chunk_id(self._row)
+
+    @property
+    def document_id(self) -> str:
+        array = self._array
+        return array._documents[array._document_codes[self._row]]
+
+    @property
+    def content(self) -> str:
+        return self._array._contents[self._row]
+
+    @property
+    def chunk_index(self) -> int:
+        return int(self._array._chunk_indexes[self._row])
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        array = self._array
+        return array._metadata[array._metadata_codes[self._row]]
+
+    @property
+    def embedding(self) -> Optional[np.ndarray]:
+        return self._array.embedding(self._row)
+
+    @embedding.setter
+    def embedding(self, value: Optional[Sequence[float]]) -> None:
+        self._array.set_embedding(self._row, value)
+
+    @property
+    def start_offset(self) -> Optional[int]:
+        return self._array.offset(self._array._start_offsets, self._row)
+
+    @property
+    def end_offset(self) -> Optional[int]:
+        return self._array.offset(self._array._end_offsets, self._row)
+
+    @property
+    def content_hash(self) -> Optional[str]:
+        return self._array._content_hashes[self._row]
+
+    @content_hash.setter
+    def content_hash(self, value: Optional[str]) -> None:
+        self._array.set_content_hash(self._row, value)
+
+    def to_chunk(self) -> Chunk:
+        """Materialize a standalone ``Chunk`` (the embedding stays a view)."""
+        return Chunk(
+            id=self.id,
+            document_id=self.document_id,
+            content=self.content,
+            chunk_index=self.chunk_index,
+            metadata=self.metadata,
+            embedding=self.embedding,
+            content_hash=self.content_hash,
+            start_offset=self.start_offset,
+            end_offset=self.end_offset,
+        )
+
+    def __repr__(self) -> str:
+        return f"ChunkView(id={self.id!r}, document_id={self.document_id!r}, chunk_index={self.chunk_index})"
+
+
+class ChunkArray:
+    """Chunks stored column-wise instead of one Python object per chunk.
+
+    Integer columns are numpy arrays, embeddings are rows of one contiguous float32
+    (or float16) matrix rather than lists of boxed floats, and document ids and
+    metadata dicts are interned so a document's values are stored once however many
+    chunks it has. Content-addressed ids (``"<document_id>-<hash prefix>"``, as produced by
+    ``build_chunks``) are derived on access instead of stored. Indexing yields
+    ``ChunkView`` records that behave like ``Chunk``.
+    """
+
+    def __init__(self, dim: Optional[int] = None, dtype: Union[str, np.dtype] = np.float32) -> None:
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float32, np.float16):
+            raise ValueError("ChunkArray embeddings must be float32 or float16")
+        self.dim = dim
+        self._size = 0
+        self._ids: List[Optional[str]] = []
+        self._contents: List[str] = []
+        self._content_hashes: List[Optional[str]] = []
+        self._chunk_indexes = np.empty(0, dtype=np.int32)
+        self._document_codes = np.empty(0, dtype=np.int32)
+        self._metadata_codes = np.empty(0, dtype=np.int32)
+        # -1 marks a missing offset.
+        self._start_offsets = np.empty(0, dtype=np.int64)
+        self._end_offsets = np.empty(0, dtype=np.int64)
+        self._has_embedding = np.empty(0, dtype=bool)
+        self._vectors: Optional[np.ndarray] = None
+        self._documents: List[str] = []
+        self._document_lookup: Dict[str, int] = {}
+        self._metadata: List[Dict[str, Any]] = []
+        self._metadata_lookup: Dict[str, int] = {}
+        # Consecutive chunks usually share one metadata object; skip re-serializing it.
+        self._last_metadata: Optional[Dict[str, Any]] = None
+        self._last_metadata_code = -1
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[Chunk], dtype: Union[str, np.dtype] = np.float32) -> "ChunkArray":
+        array = cls(dtype=dtype)
+        if isinstance(chunks, Sized):
+            array.reserve(len(chunks))
+        array.extend(chunks)
+        return array
+
+    def __len__(self) -> int:
+        return self._size
+
+    @overload
+    def __getitem__(self, index: int) -> ChunkView: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[ChunkView]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[ChunkView, List[ChunkView]]:
+        if isinstance(index, slice):
+            return [ChunkView(self, row) for row in range(*index.indices(self._size))]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("ChunkArray index out of range")
+        return ChunkView(self, index)
+
+    def __iter__(self) -> Iterator[ChunkView]:
+        return (ChunkView(self, row) for row in range(self._size))
+
+    def append(
+        self,
+        id: str,
+        document_id: str,
+        content: str,
+        chunk_index: int,
+        metadata: Optional[Dict[str, Any]] = None,
+        embedding: Optional[Sequence[float]] = None,
+        content_hash: Optional[str] = None,
+        start_offset: Optional[int] = None,
+        end_offset: Optional[int] = None,
+    ) -> ChunkView:
+        """Add one chunk and return its view."""
+        row = self._size
+        if row == len(self._chunk_indexes):
+            self.reserve(max(INITIAL_CAPACITY, row * 2))
+        derived = content_hash is not None and id == content_chunk_id(document_id, content_hash)
+        self._ids.append(None if derived else id)
+        self._contents.append(content)
+        self._content_hashes.append(content_hash)
+        self._chunk_indexes[row] = chunk_index
+        self._document_codes[row] = self._intern_document(document_id)
+        self._metadata_codes[row] = self._intern_metadata(metadata or {})
+        self._start_offsets[row] = -1 if start_offset is None else start_offset
+        self._end_offsets[row] = -1 if end_offset is None else end_offset
+        self._has_embedding[row] = False
+        self._size += 1
+        if embedding is not None:
+            self.set_embedding(row, embedding)
+        return ChunkView(self, row)
+
+    def add(self, chunk: Chunk) -> ChunkView:
+        """Copy a ``Chunk`` (or ``ChunkView``) into the array."""
+        return self.append(
+            chunk.id,
+            chunk.document_id,
+            chunk.content,
+            chunk.chunk_index,
+            chunk.metadata,
+            chunk.embedding,
+            chunk.content_hash,
+            chunk.start_offset,
+            chunk.end_offset,
+        )
+
+    def extend(self, chunks: Iterable[Chunk]) -> None:
+        for chunk in chunks:
+            self.add(chunk)
+
+    def chunk_id(self, row: int) -> str:
+        chunk_id = self._ids[row]
+        if chunk_id is None:
+            return content_chunk_id(self._documents[self._document_codes[row]], self._content_hashes[row])
+        return chunk_id
+
+    def set_content_hash(self, row: int, value: Optional[str]) -> None:
+        if self._ids[row] is None:
+            self._ids[row] = self.chunk_id(row)  # The id was derived from the old hash.
+        self._content_hashes[row] = value
+
+    @staticmethod
+    def offset(column: np.ndarray, row: int) -> Optional[int]:
+        value = int(column[row])
+        return None if value < 0 else value
+
+    def embedding(self, row: int) -> Optional[np.ndarray]:
+        if self._vectors is None or not self._has_embedding[row]:
+            return None
+        return self._vectors[row]
+
+    def set_embedding(self, row: int, value: Optional[Sequence[float]]) -> None:
+        if value is None:
+            self._has_embedding[row] = False
+            return
+        vector = np.asarray(value)
+        self._ensure_vectors(vector.shape[-1])
+        self._vectors[row] = vector
+        self._has_embedding[row] = True
+
+    @property
+    def embeddings(self) -> Optional[np.ndarray]:
+        """All embeddings as one ``(len, dim)`` view; rows never set are zero."""
+        return None if self._vectors is None else self._vectors[: self._size]
+
+    def set_embeddings(self, matrix: np.ndarray, start: int = 0) -> None:
+        """Copy a batch matrix into rows ``start : start + len(matrix)`` in one assignment."""
+        matrix = np.asarray(matrix)
+        end = start + matrix.shape[0]
+        if end > self._size:
+            raise IndexError("embedding rows exceed the number of chunks")
+        self._ensure_vectors(matrix.shape[1])
+        self._vectors[start:end] = matrix
+        self._has_embedding[start:end] = True
+
+    def to_chunks(self) -> List[Chunk]:
+        return [view.to_chunk() for view in self]
+
+    def reserve(self, capacity: int) -> None:
+        """Pre-size the columns (and embedding buffer) for ``capacity`` chunks."""
+        if capacity <= len(self._chunk_indexes):
+            return
+        self._chunk_indexes = _grow(self._chunk_indexes, capacity)
+        self._document_codes = _grow(self._document_codes, capacity)
+        self._metadata_codes = _grow(self._metadata_codes, capacity)
+        self._start_offsets = _grow(self._start_offsets, capacity)
+        self._end_offsets = _grow(self._end_offsets, capacity)
+        self._has_embedding = _grow(self._has_embedding, capacity)
+        if self._vectors is not None:
+            self._vectors = _grow(self._vectors, capacity)
+
+    def _ensure_vectors(self, dim: int) -> None:
+        if self.dim is None:
+            self.dim = dim
+        elif dim != self.dim:
+            raise ValueError(f"expected {self.dim}-dimensional embeddings, got {dim}")
+        if self._vectors is None:
+            self._vectors = np.zeros((len(self._chunk_indexes), self.dim), dtype=self.dtype)
+
+    def _intern_document(self, document_id: str) -> int:
+        code = self._document_lookup.get(document_id)
+        if code is None:
+            code = self._document_lookup[document_id] = len(self._documents)
+            self._documents.append(document_id)
+        return code
+
+    def _intern_metadata(self, metadata: Dict[str, Any]) -> int:
+        if metadata is self._last_metadata:
+            return self._last_metadata_code
+        key = json.dumps(metadata, sort_keys=True, default=str)
+        code = self._metadata_lookup.get(key)
+        if code is None:
+            code = self._metadata_lookup[key] = len(self._metadata)
+            self._metadata.append(metadata)
+        self._last_metadata, self._last_metadata_code = metadata, code
+        return code
+
+
+def _grow(values: np.ndarray, capacity: int) -> np.ndarray:
+    grown = np.zeros((capacity,) + values.shape[1:], dtype=values.dtype)
+    grown[: len(values)] = values
+    return grown
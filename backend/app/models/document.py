@@ -1,8 +1,9 @@
 """Document model used throughout the platform."""
 from __future__ import annotations
 
+import uuid
 from dataclasses import dataclass, field
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 
 @dataclass
@@ -15,3 +16,8 @@ class Document:
     raw_text: str
     cleaned_text: str
     metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+def new_document_id(key: Optional[str] = None) -> str:
+    """Return ``key`` when the caller supplies a stable one, otherwise a fresh per-upload id."""
+    return key or str(uuid.uuid4())
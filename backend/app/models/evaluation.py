@@ -0,0 +1,53 @@
+"""Models for offline retrieval evaluation."""
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+
+@dataclass
+class LabelledQuery:
+    """A query with the chunk ids a correct retrieval should return."""
+
+    query: str
+    relevant_ids: List[str]
+    # {field: value or [values]} over Settings.filter_fields, as in QueryRequest.filters.
+    filters: Optional[Dict[str, Any]] = None
+
+
+@dataclass(frozen=True)
+class RetrievalParams:
+    """One point of a retrieval sweep; ``None`` fields fall back to ``Settings``."""
+
+    k: int = 10
+    mode: str = "vector"
+    nprobe: Optional[int] = None
+    quantization: Optional[str] = None
+    rerank: Optional[int] = None
+    # (vector, lexical) fusion weights; only used in hybrid mode.
+    weights: Optional[Tuple[float, float]] = None
+
+    @property
+    def label(self) -> str:
+        return " ".join(f"{name}={value}" for name, value in asdict(self).items() if value is not None)
+
+
+@dataclass
+class RetrievalEvaluation:
+    """Quality and latency of one sweep point over a labelled query set."""
+
+    params: RetrievalParams
+    queries: int
+    recall: float
+    mrr: float
+    ndcg: float
+    latency_ms: Dict[str, float] = field(default_factory=dict)
+    queries_per_second: float = 0.0
+    # False when a requested quantizer has not trained yet, so float32 rows were scored.
+    quantized: bool = False
+    on_frontier: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        payload = asdict(self)
+        payload["label"] = self.params.label
+        return payload
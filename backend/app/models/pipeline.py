@@ -0,0 +1,33 @@
+"""Models describing background ingestion pipeline jobs."""
+from __future__ import annotations
+
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class PipelineJob:
+    """Progress of one document through the chunk → embed pipeline."""
+
+    id: str
+    document_id: Optional[str] = None
+    status: str = "queued"
+    submitted_at: float = field(default_factory=time.time)
+    completed_at: Optional[float] = None
+    chunks: int = 0
+    chunks_embedded: int = 0
+    chunks_skipped: int = 0
+    pending_batches: int = 0
+    sealed: bool = False
+    error: Optional[str] = None
+
+    @property
+    def searchable_latency_s(self) -> Optional[float]:
+        """Seconds from submission until every chunk was indexed."""
+        return None if self.completed_at is None else self.completed_at - self.submitted_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        payload = asdict(self)
+        payload["searchable_latency_s"] = self.searchable_latency_s
+        return payload
@@ -2,7 +2,9 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import List
+from typing import Dict, List, Literal, Optional, Union
+
+FilterValue = Union[str, int, float, bool]
 
 
 @dataclass
@@ -11,6 +13,12 @@ class QueryRequest:
 
     query: str
     top_k: int = 5
+    # Defaults to Settings.retrieval_mode; the weights only apply to hybrid retrieval.
+    retrieval_mode: Optional[Literal["vector", "lexical", "hybrid"]] = None
+    vector_weight: Optional[float] = None
+    lexical_weight: Optional[float] = None
+    # {field: value or [values]} over Settings.filter_fields, e.g. {"content_type": "application/pdf"}.
+    filters: Optional[Dict[str, Union[FilterValue, List[FilterValue]]]] = None
 
 
 @dataclass
@@ -20,3 +28,22 @@ class QueryResponse:
     answer: str
     retrieved_chunks: List[str] = field(default_factory=list)
     prompt: str | None = None
+    # Whitespace tokens of packed context in the prompt, and tokens packing removed.
+    context_tokens: int = 0
+    context_tokens_saved: int = 0
+    # "<generation>.<version>" of the local vector index that served retrieval; None if unused or remote.
+    index_version: Optional[str] = None
+
+
+@dataclass
+class BatchQueryRequest:
+    """Many queries answered in one call (offline evaluation, regression replay)."""
+
+    queries: List[QueryRequest] = field(default_factory=list)
+
+
+@dataclass
+class BatchQueryResponse:
+    """Responses in the same order as ``BatchQueryRequest.queries``."""
+
+    results: List[QueryResponse] = field(default_factory=list)
@@ -1,12 +1,14 @@
 """Service to chunk normalized documents."""
-import mlflow
+from typing import Dict, Iterable, Iterator, Optional, Set, Union
 
 from app.config import get_settings
-from app.databricks import delta_tables
+from app.databricks import delta_tables, lexical_index, vector_search
 from app.databricks import mlflow_tracking
-from app.models.chunk import Chunk
+from app.models.chunk import Chunk, content_chunk_id
 from app.models.document import Document
-from app.utils import text_utils
+from app.utils import chunker, text_utils
+from app.utils.chunker import TextChunk
+from app.utils.metrics import span
 
 
 class ChunkingService:
@@ -14,29 +16,86 @@ class ChunkingService:
 
     def __init__(self) -> None:
         self.settings = get_settings()
-        mlflow_tracking.configure_experiment()
 
     def chunk_document(self, document: Document) -> list[Chunk]:
-        """Create overlapping chunks and write to Delta."""
-        text_chunks = text_utils.chunk_text(
+        """Create overlapping chunks and write to Delta, replacing the document's earlier chunks."""
+        text_chunks = chunker.iter_chunks(
             document.cleaned_text,
             self.settings.chunk_size,
             self.settings.chunk_overlap,
+            self.settings.chunk_boundary,
         )
-        chunks: list[Chunk] = []
-        for idx, content in enumerate(text_chunks):
-            chunk = Chunk(
-                id=f"{document.id}-{idx}",
-                document_id=document.id,
-                content=content,
-                chunk_index=idx,
-                metadata=document.metadata,
-            )
-            chunks.append(chunk)
-        with mlflow.start_run(run_name="chunking"):
+        with span("chunk"):
+            chunks = list(build_chunks(document, text_chunks))
+        previous = delta_tables.document_chunk_ids([document.id])
+        with mlflow_tracking.start_run("chunking") as mlflow:
             mlflow.log_params(
-                {"chunk_size": self.settings.chunk_size, "chunk_overlap": self.settings.chunk_overlap}
+                {
+                    "chunk_size": self.settings.chunk_size,
+                    "chunk_overlap": self.settings.chunk_overlap,
+                    "chunk_boundary": self.settings.chunk_boundary,
+                }
             )
-            delta_tables.write_chunks(chunks)
+            delta_tables.write_chunks(chunks, replace_documents=[document.id])
+            lexical_index.index_chunks(chunks)
+            retire_stale_chunks(previous, {chunk.id for chunk in chunks})
             mlflow.log_metric("chunks_created", len(chunks))
         return chunks
+
+    def chunk_stream(self, document: Document, normalized_parts: Iterable[str]) -> Iterator[Chunk]:
+        """Lazily chunk a document whose normalized text arrives in parts.
+
+        Produces the same chunks as ``chunk_document`` with whitespace boundaries, without
+        holding the document text (and so without offsets); persisting them is left to
+        the caller so they can be written in batches.
+        """
+        tokens = text_utils.iter_tokens(normalized_parts)
+        text_chunks = text_utils.iter_chunk_text(tokens, self.settings.chunk_size, self.settings.chunk_overlap)
+        return build_chunks(document, text_chunks)
+
+
+def build_chunks(
+    document: Document, text_chunks: Iterable[Union[str, TextChunk]], model: Optional[str] = None
+) -> Iterator[Chunk]:
+    """Wrap chunk texts of ``document`` in ``Chunk`` records with content-addressed ids.
+
+    Each chunk's ``content_hash`` covers its normalized text and the embedding ``model``
+    (``Settings.embedding_model`` by default), and its id is the document id plus that
+    hash, so unchanged chunks keep their ids when the document is re-ingested.
+    ``TextChunk`` inputs also carry their offsets into the normalized text.
+    """
+    model = model or get_settings().embedding_model
+    occurrences: Dict[str, int] = {}
+    for idx, piece in enumerate(text_chunks):
+        content, start, end = piece if isinstance(piece, TextChunk) else (piece, None, None)
+        content_hash = text_utils.content_fingerprint(content, model)
+        occurrence = occurrences.get(content_hash, 0)
+        occurrences[content_hash] = occurrence + 1
+        yield Chunk(
+            id=content_chunk_id(document.id, content_hash, occurrence),
+            document_id=document.id,
+            content=content,
+            chunk_index=idx,
+            metadata=document.metadata,
+            content_hash=content_hash,
+            start_offset=start,
+            end_offset=end,
+        )
+
+
+def retire_stale_chunks(previous: Dict[str, Set[str]], current: Set[str]) -> int:
+    """Drop chunks of re-ingested documents that the new version no longer produces.
+
+    ``previous`` maps document ids to their chunk ids before the re-ingest (see
+    ``delta_tables.document_chunk_ids``) and ``current`` holds the chunk ids just
+    written. Stale chunks leave ``embedded_chunks``, the vector index and the lexical
+    index; returns how many were retired.
+    """
+    stale = {document_id: ids - current for document_id, ids in previous.items() if ids - current}
+    if not stale:
+        return 0
+    delta_tables.delete_embeddings(stale)
+    stale_ids = [chunk_id for ids in stale.values() for chunk_id in ids]
+    vector_search.delete_chunks(stale_ids)
+    lexical_index.delete_chunks(stale_ids)
+    return sum(len(ids) for ids in stale.values())
@@ -1,13 +1,17 @@
 """Service to embed chunks and write them to Delta and Vector Search."""
 from __future__ import annotations
 
+import time
 from typing import Iterable, List
 
-import mlflow
+import numpy as np
 
 from app.config import get_settings
 from app.databricks import delta_tables, mlflow_tracking, vector_search
+from app.databricks.fingerprint_store import get_fingerprint_store
 from app.models.chunk import Chunk
+from app.utils import text_utils
+from app.utils.batching import batched
 from app.utils.logging import get_logger
 
 logger = get_logger(__name__)
@@ -18,19 +22,62 @@ class EmbeddingService:
 
     def __init__(self) -> None:
         self.settings = get_settings()
-        mlflow_tracking.configure_experiment()
 
     def embed_chunks(self, chunks: Iterable[Chunk]) -> List[Chunk]:
-        """Embed provided chunks and persist embeddings."""
-        with mlflow.start_run(run_name="embedding"):
-            mlflow.log_param("embedding_model", self.settings.embedding_model)
-            enriched_chunks: List[Chunk] = []
-            for chunk in chunks:
-                # Production would call Databricks Model Serving. We simulate with hash-based vector.
-                embedding = vector_search.embed_text(chunk.content, self.settings.embedding_model)
-                chunk.embedding = embedding
-                enriched_chunks.append(chunk)
-            delta_tables.write_embeddings(enriched_chunks)
-            vector_search.upsert_embeddings(enriched_chunks)
-            mlflow.log_metric("chunks_embedded", len(enriched_chunks))
-        return enriched_chunks
+        """Embed and index chunks not yet in the index; return the chunks written.
+
+        Chunk ids are content-addressed per document (see ``build_chunks``), so chunks
+        whose id is already indexed are skipped and re-ingesting a mostly unchanged
+        document only writes its new chunks. Vectors come from the fingerprint store when
+        the same text was embedded before, in any document; only the remaining texts go
+        to the model. Chunks flow through embedding, the Delta write and the index upsert
+        one window at a time, where a window holds one request batch per embedding worker.
+        """
+        model = self.settings.embedding_model
+        window = self.settings.embedding_batch_size * max(self.settings.embedding_max_workers, 1)
+        store = get_fingerprint_store()
+        with mlflow_tracking.start_run("embedding") as mlflow:
+            mlflow.log_params(
+                {
+                    "embedding_model": model,
+                    "embedding_batch_size": self.settings.embedding_batch_size,
+                    "embedding_max_workers": self.settings.embedding_max_workers,
+                }
+            )
+            start = time.monotonic()
+            written: List[Chunk] = []
+            embedded = skipped = 0
+            for batch in batched(chunks, window):
+                for chunk in batch:
+                    if chunk.content_hash is None:
+                        chunk.content_hash = text_utils.content_fingerprint(chunk.content, model)
+                indexed = vector_search.indexed_chunk_ids(chunk.id for chunk in batch)
+                pending = list({chunk.id: chunk for chunk in batch if chunk.id not in indexed}.values())
+                skipped += len(batch) - len(pending)
+                if not pending:
+                    continue
+                vectors = store.lookup(chunk.content_hash for chunk in pending)
+                texts = {chunk.content_hash: chunk.content for chunk in pending if chunk.content_hash not in vectors}
+                if texts:
+                    # Production would call Databricks Model Serving. We simulate with hash-based vectors.
+                    fresh = vector_search.embed_batch(list(texts.values()), model)
+                    vectors.update(zip(texts, fresh))
+                    store.record((fingerprint, model, vectors[fingerprint]) for fingerprint in texts)
+                    embedded += len(texts)
+                embeddings = np.vstack([vectors[chunk.content_hash] for chunk in pending])
+                for chunk, embedding in zip(pending, embeddings):
+                    chunk.embedding = embedding
+                delta_tables.write_embeddings(pending, embeddings)
+                vector_search.upsert_embeddings(pending, embeddings)
+                written.extend(pending)
+            elapsed = time.monotonic() - start
+            mlflow.log_metric("chunks_indexed", len(written))
+            mlflow.log_metric("chunks_embedded", embedded)
+            mlflow.log_metric("chunks_reused", len(written) - embedded)
+            mlflow.log_metric("chunks_skipped", skipped)
+            mlflow.log_metric("chunks_per_second", len(written) / elapsed if elapsed > 0 else 0.0)
+        logger.info(
+            "Embedded chunks",
+            extra={"indexed": len(written), "embedded": embedded, "skipped": skipped},
+        )
+        return written
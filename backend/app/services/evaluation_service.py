@@ -1,25 +1,38 @@
 """Evaluate RAG responses for relevance and latency."""
 from __future__ import annotations
 
+import itertools
+import json
 import time
-from typing import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Collection, Dict, Iterable, List, Optional, Sequence, Tuple
 
-import mlflow
+import numpy as np
 
 from app.config import get_settings
+from app.models.evaluation import LabelledQuery, RetrievalEvaluation, RetrievalParams
 from app.models.query import QueryResponse
-from app.databricks import mlflow_tracking
+from app.databricks import lexical_index, mlflow_tracking, vector_search
+from app.databricks.local_index import LocalVectorIndex
+from app.services.retrieval_service import RETRIEVAL_MODES, reciprocal_rank_fusion
+from app.utils import text_utils
 from app.utils.logging import get_logger
 
 logger = get_logger(__name__)
 
 
 class EvaluationService:
-    """Track evaluation metrics and optionally capture human feedback."""
+    """Track evaluation metrics and optionally capture human feedback.
+
+    ``sweep_retrieval`` is the offline harness: it runs a labelled query set through
+    retrieval once per parameter point, scores recall@k, MRR and nDCG against the labels,
+    and logs the quality-vs-latency frontier to MLflow as one run. Retrieval goes straight
+    to the indexes, bypassing ``RetrievalService`` caches, so latencies are real searches.
+    """
 
     def __init__(self) -> None:
         self.settings = get_settings()
-        mlflow_tracking.configure_experiment()
+        self._indexes: Dict[Tuple[str, Optional[str], Optional[int]], LocalVectorIndex] = {}
 
     def evaluate(self, responses: Iterable[QueryResponse]) -> dict[str, float]:
         """Compute basic metrics and log them to MLflow."""
@@ -27,13 +40,210 @@ class EvaluationService:
         scores = [self._score_response(resp) for resp in responses]
         latency_ms = (time.monotonic() - start) * 1000
         avg_score = sum(scores) / max(len(scores), 1)
-        with mlflow.start_run(run_name="evaluation"):
+        with mlflow_tracking.start_run("evaluation") as mlflow:
             mlflow.log_metric("avg_relevance_score", avg_score)
             mlflow.log_metric("latency_ms", latency_ms)
             mlflow.log_metric("responses_evaluated", len(scores))
         return {"avg_relevance_score": avg_score, "latency_ms": latency_ms}
 
+    def evaluate_retrieval(
+        self,
+        queries: Sequence[LabelledQuery],
+        params: RetrievalParams,
+        workers: Optional[int] = None,
+        embeddings: Optional[np.ndarray] = None,
+    ) -> RetrievalEvaluation:
+        """Retrieve every labelled query with ``params`` on a worker pool and score the results.
+
+        Latency is measured per query around search and fusion; query embeddings are
+        computed up front (or passed in) so every sweep point scores the same vectors.
+        """
+        if params.mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode {params.mode!r}; expected one of {RETRIEVAL_MODES}")
+        normalized = [text_utils.normalize_text(labelled.query) for labelled in queries]
+        if embeddings is None and params.mode != "lexical":
+            embeddings = vector_search.embed_batch(normalized, self.settings.embedding_model)
+        index = self._index(params) if params.mode != "lexical" else None
+
+        def run(i: int) -> Tuple[List[str], float]:
+            begin = time.perf_counter()
+            embedding = None if embeddings is None else embeddings[i]
+            found = self._retrieve(index, params, normalized[i], embedding, queries[i])
+            return found, time.perf_counter() - begin
+
+        if queries:
+            run(0)  # Fault in index pages before timing.
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers or self.settings.evaluation_workers) as pool:
+            runs = list(pool.map(run, range(len(queries))))
+        elapsed = time.perf_counter() - start
+        latencies = np.array([latency for _, latency in runs]) * 1000
+        relevant = [labelled.relevant_ids for labelled in queries]
+        metrics = ranking_metrics([found for found, _ in runs], relevant, params.k)
+        return RetrievalEvaluation(
+            params=params,
+            queries=len(queries),
+            latency_ms=latency_summary(latencies),
+            queries_per_second=len(queries) / elapsed if elapsed > 0 else 0.0,
+            quantized=index is not None and index.quantizer is not None and index.quantizer.trained,
+            **metrics,
+        )
+
+    def sweep_retrieval(
+        self, queries: Sequence[LabelledQuery], grid: Sequence[RetrievalParams], workers: Optional[int] = None
+    ) -> List[RetrievalEvaluation]:
+        """Evaluate every point of ``grid`` and log all of them, frontier marked, as one MLflow run."""
+        embeddings = vector_search.embed_batch(
+            [text_utils.normalize_text(labelled.query) for labelled in queries], self.settings.embedding_model
+        )
+        results = [self.evaluate_retrieval(queries, params, workers, embeddings) for params in grid]
+        mark_frontier(results)
+        with mlflow_tracking.start_run("retrieval_sweep") as mlflow:
+            mlflow.log_params(
+                {
+                    "labelled_queries": len(queries),
+                    "sweep_points": len(results),
+                    "evaluation_workers": workers or self.settings.evaluation_workers,
+                    "embedding_model": self.settings.embedding_model,
+                    "vector_index_mode": self.settings.vector_index_mode,
+                    "index_rows": len(vector_search.get_local_index()),
+                }
+            )
+            for step, result in enumerate(results):
+                mlflow.log_metrics(
+                    {
+                        "recall_at_k": result.recall,
+                        "mrr": result.mrr,
+                        "ndcg": result.ndcg,
+                        "p50_latency_ms": result.latency_ms["p50"],
+                        "p95_latency_ms": result.latency_ms["p95"],
+                        "queries_per_second": result.queries_per_second,
+                        "on_frontier": float(result.on_frontier),
+                    },
+                    step=step,
+                )
+            mlflow.log_dict({"points": [result.to_dict() for result in results]}, "retrieval_sweep.json")
+        logger.info(
+            "Retrieval sweep complete",
+            extra={"points": len(results), "frontier": [item.params.label for item in results if item.on_frontier]},
+        )
+        return results
+
+    def _index(self, params: RetrievalParams) -> LocalVectorIndex:
+        live = vector_search.get_local_index()
+        if (params.quantization, params.rerank) == (None, None):
+            return live
+        # Keyed by path so variants follow the live generation after a rebuild.
+        key = (live.path, params.quantization, params.rerank)
+        if key not in self._indexes:
+            self._indexes[key] = vector_search.open_local_index(params.quantization, params.rerank, live.path)
+        return self._indexes[key]
+
+    def _retrieve(
+        self,
+        index: Optional[LocalVectorIndex],
+        params: RetrievalParams,
+        query: str,
+        embedding: Optional[np.ndarray],
+        labelled: LabelledQuery,
+    ) -> List[str]:
+        if params.mode == "lexical":
+            return [hit.chunk.id for hit in lexical_index.search_hits(query, params.k, labelled.filters)]
+        depth = params.k if params.mode == "vector" else max(params.k, self.settings.hybrid_candidates)
+        hits = index.search(embedding, depth, nprobe=params.nprobe, filters=labelled.filters)
+        if params.mode == "vector":
+            return [row.chunk_id for row, _ in hits]
+        weights = params.weights or (self.settings.hybrid_vector_weight, self.settings.hybrid_lexical_weight)
+        lexical = lexical_index.search_hits(query, depth, labelled.filters)
+        rankings = [[row.to_chunk() for row, _ in hits], [hit.chunk for hit in lexical]]
+        return [chunk.id for chunk in reciprocal_rank_fusion(rankings, weights, params.k, self.settings.hybrid_rrf_k)]
+
     @staticmethod
     def _score_response(response: QueryResponse) -> float:
         """Heuristic scoring placeholder; replace with offline eval or crowd feedback."""
         return 0.8 if response.retrieved_chunks else 0.2
+
+
+def load_labelled_queries(path: str) -> List[LabelledQuery]:
+    """Read ``{"query", "relevant_ids", "filters"?}`` lines from a JSONL file."""
+    queries: List[LabelledQuery] = []
+    with open(path, encoding="utf-8") as handle:
+        for number, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not record.get("relevant_ids"):
+                raise ValueError(f"{path}:{number}: labelled query has no relevant_ids")
+            queries.append(LabelledQuery(record["query"], list(record["relevant_ids"]), record.get("filters")))
+    return queries
+
+
+def parameter_grid(
+    k: Sequence[int] = (10,),
+    mode: Sequence[str] = ("vector",),
+    nprobe: Sequence[Optional[int]] = (None,),
+    quantization: Sequence[Optional[str]] = (None,),
+    rerank: Sequence[Optional[int]] = (None,),
+    weights: Sequence[Optional[Tuple[float, float]]] = (None,),
+) -> List[RetrievalParams]:
+    """Cartesian product of sweep values, without points that differ only in unused parameters."""
+    points: Dict[RetrievalParams, None] = {}
+    for values in itertools.product(k, mode, nprobe, quantization, rerank, weights):
+        params = RetrievalParams(*values)
+        if params.mode == "lexical":
+            params = RetrievalParams(k=params.k, mode="lexical")
+        elif params.mode == "vector":
+            params = RetrievalParams(params.k, params.mode, params.nprobe, params.quantization, params.rerank)
+        if params.quantization == "none":
+            params = RetrievalParams(params.k, params.mode, params.nprobe, "none", None, params.weights)
+        points[params] = None
+    return list(points)
+
+
+def ranking_metrics(
+    retrieved: Sequence[Sequence[str]], relevant: Sequence[Collection[str]], k: int
+) -> Dict[str, float]:
+    """Mean recall@k, MRR@k and binary-relevance nDCG@k.
+
+    Hits are gathered into one ``(queries, k)`` boolean matrix; every metric is then a
+    reduction over it.
+    """
+    if not retrieved:
+        return {"recall": 0.0, "mrr": 0.0, "ndcg": 0.0}
+    hits = np.zeros((len(retrieved), k), dtype=bool)
+    for i, (found, truth) in enumerate(zip(retrieved, relevant)):
+        truth = truth if isinstance(truth, (set, frozenset)) else set(truth)
+        row = [chunk_id in truth for chunk_id in found[:k]]
+        hits[i, : len(row)] = row
+    totals = np.array([len(truth) for truth in relevant], dtype=np.int64)
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    ideal = np.concatenate(([0.0], np.cumsum(discounts)))[np.minimum(totals, k)]
+    reciprocal = np.where(hits.any(axis=1), 1.0 / (hits.argmax(axis=1) + 1), 0.0)
+    return {
+        "recall": float(np.mean(hits.sum(axis=1) / np.maximum(totals, 1))),
+        "mrr": float(np.mean(reciprocal)),
+        "ndcg": float(np.mean((hits @ discounts) / np.where(ideal > 0, ideal, 1.0))),
+    }
+
+
+def latency_summary(latencies_ms: np.ndarray) -> Dict[str, float]:
+    """Mean, percentiles and max of per-query latencies in milliseconds."""
+    if latencies_ms.size == 0:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {
+        "mean": float(latencies_ms.mean()),
+        "p50": float(p50),
+        "p95": float(p95),
+        "p99": float(p99),
+        "max": float(latencies_ms.max()),
+    }
+
+
+def mark_frontier(results: Sequence[RetrievalEvaluation]) -> None:
+    """Flag the points no other point beats on both recall and p95 latency."""
+    best = -1.0
+    for result in sorted(results, key=lambda item: (item.latency_ms["p95"], -item.recall)):
+        result.on_frontier = result.recall > best
+        best = max(best, result.recall)
+
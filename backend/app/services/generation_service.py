@@ -1,43 +1,238 @@
 """Generate grounded responses using retrieved context."""
-from typing import List
+import asyncio
+import json
+import re
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
 
-import mlflow
+from fastapi.concurrency import run_in_threadpool
 
 from app.config import get_settings
+from app.models.chunk import Chunk
 from app.models.query import QueryRequest, QueryResponse
-from app.databricks import mlflow_tracking
+from app.databricks.serving_client import get_serving_client, remote_serving
+from app.databricks.telemetry import get_telemetry
 from app.services.retrieval_service import RetrievalService
+from app.utils.context_packing import PackedContext, pack_context, unpacked
 from app.utils.logging import get_logger
+from app.utils.metrics import record, span, timed
 from app.utils.text_utils import format_prompt
 
 logger = get_logger(__name__)
 
+PROMPT_VERSION = "rag_prompt_v1"
+
 
 class GenerationService:
-    """Orchestrate retrieval, prompt construction, and generation."""
+    """Orchestrate retrieval, prompt construction, and generation.
+
+    Blocking work (retrieval, and later model-serving calls) runs on the threadpool so
+    the event loop keeps serving other requests, and MLflow logging goes through the
+    telemetry queue rather than synchronous tracking calls on the request path. With
+    ``query_micro_batching`` on, concurrent single queries are retrieved together.
+    """
 
     def __init__(self) -> None:
         self.settings = get_settings()
         self.retrieval = RetrievalService()
-        mlflow_tracking.configure_experiment()
 
     async def generate_response(self, request: QueryRequest) -> QueryResponse:
-        """Generate a RAG response and log parameters to MLflow."""
-        with mlflow.start_run(run_name="generation"):
-            mlflow.log_params(
-                {
-                    "llm_model": self.settings.llm_model,
-                    "prompt_version": "rag_prompt_v1",
-                    "top_k": request.top_k,
-                }
-            )
-            retrieved = self.retrieval.retrieve(request.query, k=request.top_k)
-            prompt = format_prompt(request.query, [chunk.content for chunk in retrieved])
-            # Mock LLM response; in production call Databricks Model Serving endpoint.
-            answer = f"Simulated answer to '{request.query}' grounded on {len(retrieved)} chunks."
-            mlflow.log_metric("retrieved_chunks", len(retrieved))
-            return QueryResponse(
-                answer=answer,
-                retrieved_chunks=[chunk.content for chunk in retrieved],
-                prompt=prompt,
-            )
+        """Generate a RAG response and queue its parameters for MLflow."""
+        start = time.perf_counter()
+        retrieved, index_version = await self._retrieve(request)
+        response = await self._respond(request, retrieved, index_version)
+        get_telemetry().emit(
+            "generation",
+            params={
+                "llm_model": self.settings.llm_model,
+                "prompt_version": PROMPT_VERSION,
+                "retrieval_mode": request.retrieval_mode or self.settings.retrieval_mode,
+                "index_version": index_version,
+            },
+            metrics={
+                "top_k": request.top_k,
+                "retrieved_chunks": len(retrieved),
+                "context_tokens": response.context_tokens,
+                "context_tokens_saved": response.context_tokens_saved,
+                "latency_ms": (time.perf_counter() - start) * 1000,
+            },
+        )
+        return response
+
+    async def stream_response(self, request: QueryRequest) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Yield ``(event, data)`` pairs: citations, then tokens as generated, then timings.
+
+        The ``retrieval`` event is produced as soon as retrieval finishes, so time to
+        first byte is retrieval latency rather than full generation time.
+        """
+        start = time.perf_counter()
+        retrieved, index_version = await self._retrieve(request)
+        retrieval_ms = (time.perf_counter() - start) * 1000
+        yield "retrieval", {"chunks": [_citation(chunk) for chunk in retrieved]}
+        first_byte_ms = (time.perf_counter() - start) * 1000
+        first_token_ms: Optional[float] = None
+        tokens = 0
+        context, prompt = await run_in_threadpool(self._build_prompt, request, retrieved)
+        generation_start = time.perf_counter()
+        async for token in self._generate_tokens(request.query, prompt, retrieved):
+            if first_token_ms is None:
+                first_token_ms = (time.perf_counter() - start) * 1000
+            tokens += 1
+            yield "token", {"text": token}
+        record("generate", time.perf_counter() - generation_start)
+        timings = {
+            "retrieval_ms": retrieval_ms,
+            "ttfb_ms": first_byte_ms,
+            "first_token_ms": first_token_ms or 0.0,
+            "total_ms": (time.perf_counter() - start) * 1000,
+        }
+        yield "done", {"tokens": tokens, "index_version": index_version, **context.stats(), **timings}
+        get_telemetry().emit(
+            "generation_stream",
+            params={
+                "llm_model": self.settings.llm_model,
+                "prompt_version": PROMPT_VERSION,
+                "retrieval_mode": request.retrieval_mode or self.settings.retrieval_mode,
+                "index_version": index_version,
+            },
+            metrics={
+                "top_k": request.top_k,
+                "retrieved_chunks": len(retrieved),
+                "tokens": tokens,
+                "context_tokens": context.tokens_packed,
+                "context_tokens_saved": context.tokens_saved,
+                **timings,
+            },
+        )
+
+    async def generate_batch(self, requests: Sequence[QueryRequest]) -> List[QueryResponse]:
+        """Answer many queries with batched retrieval and one aggregated telemetry event.
+
+        Requests sharing ``top_k``, retrieval mode, weights and filters are retrieved
+        together through ``RetrievalService.retrieve_batch_versioned``; responses keep request order.
+        """
+        start = time.perf_counter()
+        groups: Dict[Tuple[Any, ...], List[int]] = {}
+        for i, request in enumerate(requests):
+            filters_key = json.dumps(request.filters, sort_keys=True) if request.filters else None
+            key = (request.top_k, request.retrieval_mode, _fusion_weights(request), filters_key)
+            groups.setdefault(key, []).append(i)
+        retrieved: List[List[Chunk]] = [[] for _ in requests]
+        versions: List[Optional[str]] = [None for _ in requests]
+        for (top_k, mode, weights, _), indexes in groups.items():
+            with span("retrieve"):
+                results, version = await run_in_threadpool(
+                    self.retrieval.retrieve_batch_versioned,
+                    [requests[i].query for i in indexes],
+                    top_k,
+                    mode,
+                    weights,
+                    requests[indexes[0]].filters,
+                )
+            for i, chunks in zip(indexes, results):
+                retrieved[i] = chunks
+                versions[i] = version
+        responses = await asyncio.gather(
+            *(self._respond(*args) for args in zip(requests, retrieved, versions))
+        )
+        elapsed = time.perf_counter() - start
+        get_telemetry().emit(
+            "generation_batch",
+            params={"llm_model": self.settings.llm_model, "prompt_version": PROMPT_VERSION},
+            metrics={
+                "queries": len(requests),
+                "retrieval_groups": len(groups),
+                "retrieved_chunks": sum(len(chunks) for chunks in retrieved),
+                "context_tokens": sum(response.context_tokens for response in responses),
+                "context_tokens_saved": sum(response.context_tokens_saved for response in responses),
+                "latency_ms": elapsed * 1000,
+                "queries_per_second": len(requests) / elapsed if elapsed > 0 else 0.0,
+            },
+        )
+        return list(responses)
+
+    @timed("retrieve")
+    async def _retrieve(self, request: QueryRequest) -> Tuple[List[Chunk], Optional[str]]:
+        options = (request.top_k, request.retrieval_mode, _fusion_weights(request), request.filters)
+        if self.settings.query_micro_batching:
+            return await self.retrieval.retrieve_async(request.query, *options)
+        results, version = await run_in_threadpool(self.retrieval.retrieve_batch_versioned, [request.query], *options)
+        return results[0], version
+
+    def pack(self, retrieved: List[Chunk]) -> PackedContext:
+        """Merge overlapping chunks, drop near-duplicates and fit the context token budget."""
+        if not self.settings.context_packing:
+            return unpacked(retrieved)
+        return pack_context(
+            retrieved,
+            self.settings.context_token_budget,
+            self.settings.context_dedup_threshold,
+            self.settings.chunk_overlap,
+        )
+
+    def _build_prompt(self, request: QueryRequest, retrieved: List[Chunk]) -> Tuple[PackedContext, str]:
+        """Pack context and format the prompt; CPU-bound, so callers run it on the threadpool."""
+        with span("prompt"):
+            context = self.pack(retrieved)
+            return context, format_prompt(request.query, context.texts)
+
+    async def _respond(
+        self, request: QueryRequest, retrieved: List[Chunk], index_version: Optional[str] = None
+    ) -> QueryResponse:
+        context, prompt = await run_in_threadpool(self._build_prompt, request, retrieved)
+        with span("generate"):
+            tokens = self._generate_tokens(request.query, prompt, retrieved, stream=False)
+            answer = "".join([token async for token in tokens])
+        return QueryResponse(
+            answer=answer,
+            retrieved_chunks=[chunk.content for chunk in retrieved],
+            prompt=prompt,
+            context_tokens=context.tokens_packed,
+            context_tokens_saved=context.tokens_saved,
+            index_version=index_version,
+        )
+
+    async def _generate_tokens(
+        self, query: str, prompt: str, retrieved: List[Chunk], stream: bool = True
+    ) -> AsyncIterator[str]:
+        """Stream the answer token by token.
+
+        Mock LLM: yields a canned answer word by word, pausing ``mock_llm_token_delay_ms``
+        per token to imitate decoding. With ``serving_backend="http"`` the ``llm_model``
+        endpoint is asked to stream and its deltas are relayed as they arrive; with
+        ``stream=False`` (whole responses) the answer comes from one coalescable call.
+        """
+        if remote_serving():
+            client, model, max_tokens = get_serving_client(), self.settings.llm_model, self.settings.llm_max_tokens
+            if not stream:
+                yield await client.chat(prompt, model, max_tokens)
+                return
+            async for delta in client.chat_stream(prompt, model, max_tokens):
+                yield delta
+            return
+        answer = f"Simulated answer to '{query}' grounded on {len(retrieved)} chunks."
+        delay = self.settings.mock_llm_token_delay_ms / 1000
+        for token in re.findall(r"\S+\s*", answer):
+            await asyncio.sleep(delay)
+            yield token
+
+
+def _fusion_weights(request: QueryRequest) -> Optional[Tuple[float, float]]:
+    """Per-request hybrid weights; a missing side keeps its configured default."""
+    if request.vector_weight is None and request.lexical_weight is None:
+        return None
+    settings = get_settings()
+    return (
+        settings.hybrid_vector_weight if request.vector_weight is None else request.vector_weight,
+        settings.hybrid_lexical_weight if request.lexical_weight is None else request.lexical_weight,
+    )
+
+
+def _citation(chunk: Chunk) -> Dict[str, Any]:
+    return {
+        "chunk_id": chunk.id,
+        "document_id": chunk.document_id,
+        "chunk_index": chunk.chunk_index,
+        "start_offset": chunk.start_offset,
+        "end_offset": chunk.end_offset,
+    }
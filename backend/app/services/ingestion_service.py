@@ -1,36 +1,56 @@
 """Service responsible for accepting files and staging them into Delta."""
-import mlflow
-import uuid
 from pathlib import Path
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Optional, TypeVar
 
 from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
 
-from app.databricks import delta_tables
+from app.config import get_settings
+from app.databricks import delta_tables, lexical_index
 from app.databricks import mlflow_tracking
-from app.models.document import Document
+from app.models.chunk import Chunk
+from app.models.document import Document, new_document_id
+from app.services.chunking_service import ChunkingService, retire_stale_chunks
 from app.utils import text_utils
+from app.utils.batching import batched
+from app.utils.metrics import timed
+
+T = TypeVar("T")
+ChunkSink = Callable[[Document, List[Chunk]], None]
 
 
 class IngestionService:
-    """Handle document ingestion lifecycle."""
+    """Handle document ingestion lifecycle.
+
+    Every upload gets a new document id unless the caller passes ``document_id``; uploading
+    again under the same id re-ingests that document: its chunks are replaced and
+    unchanged ones keep their ids.
+    """
 
     def __init__(self) -> None:
-        mlflow_tracking.configure_experiment()
+        self.settings = get_settings()
+        self.chunking = ChunkingService()
 
-    async def ingest_file(self, file: UploadFile) -> str:
+    async def ingest_file(self, file: UploadFile, document_id: Optional[str] = None) -> str:
         """Persist file to disk, clean content, and write to Delta raw table."""
+        return (await self.ingest_upload(file, document_id)).id
+
+    @timed("ingest")
+    async def ingest_upload(self, file: UploadFile, document_id: Optional[str] = None) -> Document:
+        """Same as ``ingest_file`` but returns the staged ``Document`` for downstream stages."""
         contents = await file.read()
         raw_text = contents.decode("utf-8", errors="ignore")
-        normalized = text_utils.normalize_text(raw_text)
+        normalized = text_utils.normalize_text(raw_text, keep_paragraphs=self.settings.chunk_boundary == "paragraph")
+        source_path = Path(file.filename).as_posix()
         doc = Document(
-            id=str(uuid.uuid4()),
+            id=new_document_id(document_id),
             name=file.filename,
-            source_path=Path(file.filename).as_posix(),
+            source_path=source_path,
             raw_text=raw_text,
             cleaned_text=normalized,
             metadata={"content_type": file.content_type},
         )
-        with mlflow.start_run(run_name="ingestion"):
+        with mlflow_tracking.start_run("ingestion") as mlflow:
             mlflow.log_params(
                 {
                     "file_name": file.filename,
@@ -41,4 +61,96 @@ class IngestionService:
             delta_tables.write_raw_document(doc)
             mlflow.log_metric("documents_ingested", 1)
             mlflow.log_metric("characters_ingested", len(raw_text))
+        return doc
+
+    async def ingest_file_streaming(
+        self,
+        file: UploadFile,
+        on_chunks: Optional[ChunkSink] = None,
+        document_id: Optional[str] = None,
+    ) -> str:
+        """Stream an upload through decode → normalize → chunk without buffering it.
+
+        Runs on the threadpool because every stage is a synchronous generator over the
+        spooled upload file. ``on_chunks`` receives each chunk batch after it is written,
+        e.g. to hand it to the embedding pipeline.
+        """
+        return await run_in_threadpool(
+            self._ingest_stream, file.file, file.filename, file.content_type, on_chunks, document_id
+        )
+
+    @timed("ingest")
+    def _ingest_stream(
+        self,
+        stream: BinaryIO,
+        filename: str,
+        content_type: str,
+        on_chunks: Optional[ChunkSink] = None,
+        document_id: Optional[str] = None,
+    ) -> str:
+        """Read ``stream`` in fixed-size blocks and write raw parts, parsed parts and chunks.
+
+        Peak memory is one block plus one chunk window: the raw and normalized text are
+        written part by part and never joined, and chunks are flushed in batches.
+        """
+        source_path = Path(filename).as_posix()
+        doc = Document(
+            id=new_document_id(document_id),
+            name=filename,
+            source_path=source_path,
+            raw_text="",
+            cleaned_text="",
+            metadata={"content_type": content_type, "streamed": True},
+        )
+        totals = {"bytes": 0, "characters": 0, "chunks": 0}
+
+        def read_blocks() -> Iterator[bytes]:
+            while block := stream.read(self.settings.ingest_block_size):
+                totals["bytes"] += len(block)
+                yield block
+
+        def write_raw(index: int, part: str) -> None:
+            totals["characters"] += len(part)
+            delta_tables.write_raw_document_part(doc, index, part)
+
+        raw_parts = _tap(text_utils.iter_decode(read_blocks()), write_raw)
+        normalized_parts = _tap(
+            text_utils.iter_normalize(raw_parts),
+            lambda index, part: delta_tables.write_parsed_document_part(doc, index, part),
+        )
+        with mlflow_tracking.start_run("ingestion") as mlflow:
+            mlflow.log_params(
+                {
+                    "file_name": filename,
+                    "content_type": content_type or "unknown",
+                    "mode": "streaming",
+                    "block_size": self.settings.ingest_block_size,
+                }
+            )
+            delta_tables.write_raw_document(doc)
+            previous = delta_tables.document_chunk_ids([doc.id])
+            written = set()
+            chunks = self.chunking.chunk_stream(doc, normalized_parts)
+            for batch in batched(chunks, self.settings.ingest_chunk_batch_size):
+                # The first batch replaces the chunks of an earlier ingest of this document.
+                delta_tables.write_chunks(batch, replace_documents=None if written else [doc.id])
+                lexical_index.index_chunks(batch)
+                written.update(chunk.id for chunk in batch)
+                totals["chunks"] += len(batch)
+                if on_chunks is not None:
+                    on_chunks(doc, batch)
+            if not written:
+                delta_tables.write_chunks([], replace_documents=[doc.id])
+            retire_stale_chunks(previous, written)
+            mlflow.log_metric("documents_ingested", 1)
+            mlflow.log_metric("bytes_received", totals["bytes"])
+            mlflow.log_metric("characters_ingested", totals["characters"])
+            mlflow.log_metric("chunks_created", totals["chunks"])
         return doc.id
+
+
+def _tap(parts: Iterable[T], writer: Callable[[int, T], None]) -> Iterator[T]:
+    """Pass ``parts`` through unchanged, handing each one to ``writer`` on the way."""
+    for index, part in enumerate(parts):
+        writer(index, part)
+        yield part
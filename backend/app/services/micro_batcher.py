@@ -0,0 +1,120 @@
+"""Coalesce concurrent single-item requests into vectorized batches."""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Generic, Hashable, List, Optional, Sequence, Set, Tuple, TypeVar
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DELAY_WINDOW = 1000
+
+
+class MicroBatcher(Generic[T, R]):
+    """Collect items submitted within ``max_delay_ms`` of each other into one batch call.
+
+    Items are grouped by a hashable key (callers put whatever must be shared by a
+    batch, such as ``top_k`` and filters, in it). A group is flushed when it reaches
+    ``max_batch_size`` items or when its oldest item has waited ``max_delay_ms``;
+    ``run_batch(key, items)`` then runs once on the threadpool and must return one result
+    per item, in order. Each ``submit`` awaits only its own result, and an exception
+    from ``run_batch`` is raised to every caller in that batch.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[Hashable, List[T]], Sequence[R]],
+        max_batch_size: int,
+        max_delay_ms: float,
+    ) -> None:
+        self.run_batch = run_batch
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_delay = max(max_delay_ms, 0.0) / 1000
+        self._pending: Dict[Hashable, List[Tuple[T, "asyncio.Future[R]", float]]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._delays: Deque[float] = deque(maxlen=DELAY_WINDOW)
+        self._running: Set["asyncio.Task[None]"] = set()
+        self.items = 0
+        self.batches = 0
+        self.size_flushes = 0
+        self.failures = 0
+        self.max_batch_seen = 0
+
+    async def submit(self, key: Hashable, item: T) -> R:
+        """Queue ``item`` under ``key`` and wait for its result."""
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[R]" = loop.create_future()
+        pending = self._pending.setdefault(key, [])
+        pending.append((item, future, time.perf_counter()))
+        if len(pending) >= self.max_batch_size:
+            self.size_flushes += 1
+            self._flush(key)
+        elif len(pending) == 1:
+            self._timers[key] = loop.call_later(self.max_delay, self._flush, key)
+        return await future
+
+    def metrics(self) -> Dict[str, Any]:
+        """Report batch sizes and how long items waited before their batch started."""
+        delays = sorted(self._delays)
+        return {
+            "items": self.items,
+            "batches": self.batches,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size_seen": self.max_batch_seen,
+            "size_flushes": self.size_flushes,
+            "timer_flushes": self.batches - self.size_flushes,
+            "failures": self.failures,
+            "pending": sum(len(items) for items in self._pending.values()),
+            "queue_delay_ms": {
+                "p50": _percentile(delays, 0.50),
+                "p95": _percentile(delays, 0.95),
+                "max": delays[-1] if delays else None,
+            },
+            "config": {"max_batch_size": self.max_batch_size, "max_delay_ms": self.max_delay * 1000},
+        }
+
+    def _flush(self, key: Hashable) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, None)
+        if batch:
+            # A fresh context keeps the batch's work out of whichever caller triggered the
+            # flush (e.g. its per-request stage timings); the batch serves all of them.
+            task = asyncio.get_running_loop().create_task(self._run(key, batch), context=contextvars.Context())
+            self._running.add(task)  # The loop only keeps weak references to tasks.
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, key: Hashable, batch: List[Tuple[T, "asyncio.Future[R]", float]]) -> None:
+        started = time.perf_counter()
+        self.items += len(batch)
+        self.batches += 1
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        self._delays.extend((started - queued) * 1000 for _, _, queued in batch)
+        try:
+            results = await run_in_threadpool(self.run_batch, key, [item for item, _, _ in batch])
+        except Exception as exc:  # noqa: BLE001 - surfaced to every waiting caller.
+            self.failures += 1
+            logger.warning("Micro-batch failed", extra={"batch_size": len(batch), "error": str(exc)})
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():  # The caller may have been cancelled meanwhile.
+                future.set_result(result)
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    return values[min(int(fraction * len(values)), len(values) - 1)]
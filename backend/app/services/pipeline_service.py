@@ -0,0 +1,230 @@
+"""In-process ingestion → chunk → embed pipeline with bounded queues."""
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.config import get_settings
+from app.databricks import delta_tables
+from app.models.chunk import Chunk
+from app.models.document import Document
+from app.models.pipeline import PipelineJob
+from app.services.chunking_service import ChunkingService
+from app.services.embedding_service import EmbeddingService
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+LATENCY_WINDOW = 1000
+
+
+class StageStats:
+    """Throughput counters for one pipeline stage."""
+
+    def __init__(self) -> None:
+        self.items = 0
+        self.chunks = 0
+        self.busy_seconds = 0.0
+        self.failures = 0
+
+    def record(self, chunks: int, seconds: float) -> None:
+        self.items += 1
+        self.chunks += chunks
+        self.busy_seconds += seconds
+
+    def to_dict(self, uptime: float) -> Dict[str, float]:
+        return {
+            "items": self.items,
+            "chunks": self.chunks,
+            "failures": self.failures,
+            "busy_seconds": self.busy_seconds,
+            "chunks_per_second": self.chunks / uptime if uptime > 0 else 0.0,
+        }
+
+
+class IngestionPipeline:
+    """Run chunking and embedding concurrently, connected by bounded asyncio queues.
+
+    Documents enter the chunk queue; chunk workers write the parsed document, chunk it
+    and push chunk batches onto the embed queue; embed workers embed, persist and upsert
+    each batch. Both queues are bounded, so a slow embedding stage pushes back on
+    chunking and, in turn, on ``submit_document`` callers instead of growing memory.
+    Blocking service calls run on a dedicated thread pool so the pipeline never competes
+    with request handlers for the default threadpool.
+    """
+
+    def __init__(
+        self,
+        chunking: Optional[ChunkingService] = None,
+        embedding: Optional[EmbeddingService] = None,
+    ) -> None:
+        self.settings = get_settings()
+        self.chunking = chunking or ChunkingService()
+        self.embedding = embedding or EmbeddingService()
+        self.chunk_workers = self.settings.pipeline_chunk_workers
+        self.embed_workers = self.settings.pipeline_embed_workers
+        self.embed_batch_size = self.settings.embedding_batch_size * max(self.settings.embedding_max_workers, 1)
+        self.jobs: "OrderedDict[str, PipelineJob]" = OrderedDict()
+        self.chunk_stats = StageStats()
+        self.embed_stats = StageStats()
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._chunk_queue: Optional["asyncio.Queue[Tuple[PipelineJob, Document]]"] = None
+        self._embed_queue: Optional["asyncio.Queue[Tuple[PipelineJob, List[Chunk]]]"] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tasks: List["asyncio.Task[None]"] = []
+        self._started_at = 0.0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        """Create the queues and worker tasks on the running event loop."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._chunk_queue = asyncio.Queue(maxsize=self.settings.pipeline_queue_size)
+        self._embed_queue = asyncio.Queue(maxsize=self.settings.pipeline_queue_size)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.chunk_workers + self.embed_workers, thread_name_prefix="pipeline"
+        )
+        self._tasks = [asyncio.create_task(self._chunk_worker()) for _ in range(self.chunk_workers)]
+        self._tasks += [asyncio.create_task(self._embed_worker()) for _ in range(self.embed_workers)]
+        self._started_at = time.monotonic()
+        logger.info(
+            "Started ingestion pipeline",
+            extra={"chunk_workers": self.chunk_workers, "embed_workers": self.embed_workers},
+        )
+
+    async def stop(self) -> None:
+        """Cancel workers; queued work is abandoned and reported as such by job status."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def create_job(self, document_id: Optional[str] = None) -> PipelineJob:
+        """Register a job whose chunks will be pushed with ``submit_chunks_threadsafe``."""
+        job = PipelineJob(id=str(uuid.uuid4()), document_id=document_id)
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.settings.pipeline_job_history:
+            self.jobs.popitem(last=False)
+        return job
+
+    async def submit_document(self, document: Document) -> PipelineJob:
+        """Queue a raw document for chunking and embedding; waits while the queue is full."""
+        job = self.create_job(document.id)
+        await self._chunk_queue.put((job, document))
+        return job
+
+    def submit_chunks_threadsafe(self, job: PipelineJob, chunks: List[Chunk]) -> None:
+        """Queue already chunked text from a worker thread, blocking it while the queue is full."""
+        asyncio.run_coroutine_threadsafe(self._enqueue_chunks(job, chunks), self._loop).result()
+
+    def seal(self, job: PipelineJob) -> None:
+        """Mark that no more chunks will be submitted for ``job``."""
+        job.sealed = True
+        self._maybe_complete(job)
+
+    def get_job(self, job_id: str) -> Optional[PipelineJob]:
+        return self.jobs.get(job_id)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Report queue depths, per-stage throughput and ingest-to-searchable latency."""
+        uptime = time.monotonic() - self._started_at if self._started_at else 0.0
+        statuses: Dict[str, int] = {}
+        for job in self.jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        latencies = sorted(self._latencies)
+        return {
+            "running": self.running,
+            "uptime_seconds": uptime,
+            "queue_depth": {
+                "chunk": self._chunk_queue.qsize() if self._chunk_queue else 0,
+                "embed": self._embed_queue.qsize() if self._embed_queue else 0,
+            },
+            "queue_capacity": self.settings.pipeline_queue_size,
+            "workers": {"chunk": self.chunk_workers, "embed": self.embed_workers},
+            "stages": {"chunk": self.chunk_stats.to_dict(uptime), "embed": self.embed_stats.to_dict(uptime)},
+            "jobs": statuses,
+            "searchable_latency_s": {
+                "p50": _percentile(latencies, 0.50),
+                "p95": _percentile(latencies, 0.95),
+                "max": latencies[-1] if latencies else None,
+            },
+        }
+
+    async def _chunk_worker(self) -> None:
+        while True:
+            job, document = await self._chunk_queue.get()
+            try:
+                job.status = "chunking"
+                start = time.monotonic()
+                chunks = await self._loop.run_in_executor(self._executor, self._chunk, document)
+                self.chunk_stats.record(len(chunks), time.monotonic() - start)
+                for offset in range(0, len(chunks), self.embed_batch_size):
+                    await self._enqueue_chunks(job, chunks[offset : offset + self.embed_batch_size])
+                self.seal(job)
+            except Exception as exc:  # noqa: BLE001 - failures are reported through job status.
+                self.chunk_stats.failures += 1
+                self.fail(job, exc)
+            finally:
+                self._chunk_queue.task_done()
+
+    async def _embed_worker(self) -> None:
+        while True:
+            job, chunks = await self._embed_queue.get()
+            try:
+                if job.status != "failed":
+                    job.status = "embedding"
+                    start = time.monotonic()
+                    embedded = await self._loop.run_in_executor(
+                        self._executor, self.embedding.embed_chunks, chunks
+                    )
+                    self.embed_stats.record(len(chunks), time.monotonic() - start)
+                    job.chunks_embedded += len(embedded)
+                    job.chunks_skipped += len(chunks) - len(embedded)
+                job.pending_batches -= 1
+                self._maybe_complete(job)
+            except Exception as exc:  # noqa: BLE001 - failures are reported through job status.
+                job.pending_batches -= 1
+                self.embed_stats.failures += 1
+                self.fail(job, exc)
+            finally:
+                self._embed_queue.task_done()
+
+    async def _enqueue_chunks(self, job: PipelineJob, chunks: List[Chunk]) -> None:
+        job.chunks += len(chunks)
+        job.pending_batches += 1
+        await self._embed_queue.put((job, chunks))
+
+    def _chunk(self, document: Document) -> List[Chunk]:
+        delta_tables.write_parsed_document(document)
+        return self.chunking.chunk_document(document)
+
+    def _maybe_complete(self, job: PipelineJob) -> None:
+        if job.sealed and job.pending_batches == 0 and job.status not in ("failed", "completed"):
+            job.status = "completed"
+            job.completed_at = time.time()
+            self._latencies.append(job.searchable_latency_s)
+
+    @staticmethod
+    def fail(job: PipelineJob, exc: Exception) -> None:
+        """Record a job failure from any stage, including the ingestion request itself."""
+        job.status = "failed"
+        job.error = str(exc)
+        logger.exception("Pipeline job failed", extra={"job_id": job.id, "document_id": job.document_id})
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    return values[min(int(fraction * len(values)), len(values) - 1)]
@@ -1,17 +1,220 @@
 """Retrieve top-k chunks using Databricks Vector Search with local fallback."""
-from typing import List
+import json
+from contextlib import nullcontext
+from typing import ContextManager, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
 
 from app.config import get_settings
-from app.databricks import vector_search
+from app.databricks import lexical_index, vector_search
+from app.databricks.filter_index import Filters
+from app.databricks.index_generations import IndexGeneration
+from app.databricks.serving_client import remote_serving
 from app.models.chunk import Chunk
+from app.services.micro_batcher import MicroBatcher
+from app.utils import text_utils
+from app.utils.cache import TTLCache
+
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
 
 
 class RetrievalService:
-    """Abstract retrieval to allow Databricks and local parity."""
+    """Abstract retrieval to allow Databricks and local parity.
+
+    Two cache levels sit in front of Vector Search: query embeddings keyed by
+    (normalized query, embedding model), and top-k results keyed by
+    (normalized query, k, mode, weights, filters, index versions). Upserts and index
+    generation swaps change the index versions, so cached results from an older index are
+    never served; a new vector index version also drops them on the next lookup. With
+    remote Vector Search (``serving_backend="http"``) the index syncs from Delta on its
+    own schedule and exposes no version to key on, so vector and hybrid results skip the
+    result cache (query embeddings are still cached); lexical results stay cached.
+
+    Each batch pins one vector index generation for its whole search, and
+    ``retrieve_batch_versioned`` reports that generation's ``<generation>.<version>``.
+
+    ``hybrid`` mode fetches ``hybrid_candidates`` hits from both the vector index and
+    the BM25 lexical index and fuses the two rankings with weighted reciprocal-rank
+    fusion, so exact identifiers (part numbers, error codes) rank well without
+    over-fetching a large ``k``.
+
+    ``filters`` are applied as pre-filters inside both retrievers, so hybrid fusion only
+    ever sees allowed chunks.
+
+    ``retrieve_async`` routes single queries through a ``MicroBatcher`` so concurrent
+    requests with the same options share one ``retrieve_batch`` call.
+    """
 
     def __init__(self) -> None:
         self.settings = get_settings()
+        ttl = self.settings.retrieval_cache_ttl_seconds
+        self.embedding_cache: TTLCache[np.ndarray] = TTLCache(self.settings.query_embedding_cache_size, ttl)
+        self.result_cache: TTLCache[List[Chunk]] = TTLCache(self.settings.retrieval_cache_size, ttl)
+        self._cached_index_version = -1
+        self.batcher: MicroBatcher[Tuple[str, Optional[Filters]], Tuple[List[Chunk], Optional[str]]] = MicroBatcher(
+            self._run_micro_batch,
+            self.settings.query_micro_batch_size,
+            self.settings.query_micro_batch_delay_ms,
+        )
+
+    def retrieve(
+        self,
+        query: str,
+        k: int = 5,
+        mode: Optional[str] = None,
+        weights: Optional[Tuple[float, float]] = None,
+        filters: Optional[Filters] = None,
+    ) -> List[Chunk]:
+        """Retrieve top-k chunks for a user query.
+
+        ``mode`` overrides ``Settings.retrieval_mode``; ``weights`` are the
+        ``(vector, lexical)`` fusion weights used in hybrid mode; ``filters`` restrict
+        results to chunks whose fields match (see ``filter_index``).
+        """
+        return self.retrieve_batch([query], k, mode, weights, filters)[0]
+
+    async def retrieve_async(
+        self,
+        query: str,
+        k: int = 5,
+        mode: Optional[str] = None,
+        weights: Optional[Tuple[float, float]] = None,
+        filters: Optional[Filters] = None,
+    ) -> Tuple[List[Chunk], Optional[str]]:
+        """Awaitable ``retrieve``, micro-batched with concurrent callers; also returns the index version."""
+        key = (k, mode, weights, json.dumps(filters, sort_keys=True) if filters else None)
+        return await self.batcher.submit(key, (query, filters))
+
+    def retrieve_batch(
+        self,
+        queries: Sequence[str],
+        k: int = 5,
+        mode: Optional[str] = None,
+        weights: Optional[Tuple[float, float]] = None,
+        filters: Optional[Filters] = None,
+    ) -> List[List[Chunk]]:
+        """Retrieve top-k chunks for many queries sharing the same options.
+
+        Cached queries are answered from the result cache; the rest are embedded in one
+        call and scored against the vector index as one matrix-matrix product.
+        """
+        return self.retrieve_batch_versioned(queries, k, mode, weights, filters)[0]
+
+    def retrieve_batch_versioned(
+        self,
+        queries: Sequence[str],
+        k: int = 5,
+        mode: Optional[str] = None,
+        weights: Optional[Tuple[float, float]] = None,
+        filters: Optional[Filters] = None,
+    ) -> Tuple[List[List[Chunk]], Optional[str]]:
+        """``retrieve_batch`` plus the local vector index version that served it.
+
+        The version is None for lexical retrieval and remote Vector Search, whose results
+        are never cached.
+        """
+        mode = mode or self.settings.retrieval_mode
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode {mode!r}; expected one of {RETRIEVAL_MODES}")
+        if mode == "hybrid":
+            weights = weights or (self.settings.hybrid_vector_weight, self.settings.hybrid_lexical_weight)
+            if min(weights) < 0 or max(weights) == 0:
+                raise ValueError("Hybrid weights must be non-negative and not both zero")
+        else:
+            weights = None
+        normalized = [text_utils.normalize_text(query) for query in queries]
+        remote = remote_serving()
+        cacheable = mode == "lexical" or not remote
+        with self._pin(mode) as generation:
+            version = vector_search.index_version(generation) if generation is not None else None
+            if version is not None and version != self._cached_index_version:
+                self.result_cache.clear()
+                self._cached_index_version = version
+            lexical_version = lexical_index.index_version() if mode != "vector" else None
+            filters_key = json.dumps(filters, sort_keys=True) if filters else None
+            keys = [(query, k, mode, weights, filters_key, version, lexical_version) for query in normalized]
+            results: List[Optional[List[Chunk]]] = [
+                self.result_cache.get(key) if cacheable else None for key in keys
+            ]
+            misses = [i for i, cached in enumerate(results) if cached is None]
+            if misses:
+                # Repeated queries within a batch are searched once.
+                pending = list(dict.fromkeys(normalized[i] for i in misses))
+                found = dict(zip(pending, self._search(pending, k, mode, weights, filters, generation)))
+                for i in misses:
+                    results[i] = found[normalized[i]]
+                    if cacheable:
+                        self.result_cache.put(keys[i], results[i])
+        # Remote Vector Search syncs on its own schedule; the local version says nothing about it.
+        return [list(chunks) for chunks in results], None if remote else version
+
+    def cache_stats(self) -> Dict[str, Dict[str, float]]:
+        """Expose hit/miss/eviction counters for both cache levels."""
+        return {"query_embedding": self.embedding_cache.stats(), "results": self.result_cache.stats()}
+
+    def _run_micro_batch(
+        self, key: Hashable, items: List[Tuple[str, Optional[Filters]]]
+    ) -> List[Tuple[List[Chunk], Optional[str]]]:
+        k, mode, weights, _ = key
+        results, version = self.retrieve_batch_versioned([query for query, _ in items], k, mode, weights, items[0][1])
+        return [(chunks, version) for chunks in results]
+
+    def _pin(self, mode: str) -> ContextManager[Optional[IndexGeneration]]:
+        """Pin the local index generation for vector and hybrid searches."""
+        if mode == "lexical":
+            return nullcontext(None)
+        return vector_search.acquire_index()
+
+    def _search(
+        self,
+        queries: List[str],
+        k: int,
+        mode: str,
+        weights: Optional[Tuple[float, float]],
+        filters: Optional[Filters],
+        generation: Optional[IndexGeneration],
+    ) -> List[List[Chunk]]:
+        if mode == "lexical":
+            return [[hit.chunk for hit in lexical_index.search_hits(query, k, filters)] for query in queries]
+        depth = k if mode == "vector" else max(k, self.settings.hybrid_candidates)
+        vector = [
+            [hit.chunk for hit in hits]
+            for hits in vector_search.search_batch_by_vector(
+                self._embed_queries(queries), depth, filters=filters, generation=generation
+            )
+        ]
+        if mode == "vector":
+            return vector
+        return [
+            reciprocal_rank_fusion(
+                [ranking, [hit.chunk for hit in lexical_index.search_hits(query, depth, filters)]],
+                weights,
+                k,
+                self.settings.hybrid_rrf_k,
+            )
+            for query, ranking in zip(queries, vector)
+        ]
+
+    def _embed_queries(self, normalized_queries: List[str]) -> np.ndarray:
+        model = self.settings.embedding_model
+        embeddings = [self.embedding_cache.get((query, model)) for query in normalized_queries]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            fresh = vector_search.embed_batch([normalized_queries[i] for i in missing], model)
+            for i, embedding in zip(missing, fresh):
+                embeddings[i] = embedding.copy()
+                self.embedding_cache.put((normalized_queries[i], model), embeddings[i])
+        return np.stack(embeddings)
+
 
-    def retrieve(self, query: str, k: int = 5) -> List[Chunk]:
-        """Retrieve top-k chunks for a user query."""
-        return vector_search.search(query, k=k)
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Chunk]], weights: Sequence[float], k: int, damping: int = 60
+) -> List[Chunk]:
+    """Fuse ranked chunk lists by ``sum(weight / (damping + rank))`` and keep the top ``k``."""
+    scores: Dict[str, float] = {}
+    chunks: Dict[str, Chunk] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, chunk in enumerate(ranking, start=1):
+            scores[chunk.id] = scores.get(chunk.id, 0.0) + weight / (damping + rank)
+            chunks.setdefault(chunk.id, chunk)
+    return [chunks[chunk_id] for chunk_id in sorted(scores, key=scores.__getitem__, reverse=True)[:k]]
@@ -0,0 +1,12 @@
+"""Helpers for processing iterables in bounded batches."""
+from itertools import islice
+from typing import Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Yield lists of at most ``size`` items without materializing the whole iterable."""
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
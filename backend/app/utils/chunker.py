@@ -0,0 +1,135 @@
+"""Offset-based chunking: lazily yield ``(start, end)`` spans over a document's text."""
+from __future__ import annotations
+
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Deque, Iterator, NamedTuple, Pattern, Tuple
+
+Span = Tuple[int, int]
+
+NON_SPACE_RE = re.compile(r"\S")
+# Whitespace other than " " (str.isspace); normalized text contains none of it.
+ASCII_OTHER_SPACES = "\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f"
+UNICODE_SPACES = "\x85\xa0\u1680" + "".join(map(chr, range(0x2000, 0x200B))) + "\u2028\u2029\u202f\u205f\u3000"
+TOKEN_RE = re.compile(r"\S+")
+# A sentence runs up to and including its terminator run (or the end of the text).
+SENTENCE_RE = re.compile(r"\S[^.!?]*[.!?]*")
+# A paragraph runs until a blank line; only meaningful on text that keeps newlines.
+PARAGRAPH_RE = re.compile(r"\S(?:.|\n(?![^\S\n]*\n))*")
+BOUNDARY_PATTERNS = {"sentence": SENTENCE_RE, "paragraph": PARAGRAPH_RE}
+BOUNDARIES = ("whitespace",) + tuple(BOUNDARY_PATTERNS)
+
+
+class TextChunk(NamedTuple):
+    """Chunk text together with its ``[start, end)`` offsets in the source text."""
+
+    text: str
+    start: int
+    end: int
+
+
+def validate(chunk_size: int, overlap: int, boundary: str = "whitespace") -> None:
+    """Raise ``ValueError`` for parameters that cannot produce a terminating chunking."""
+    if chunk_size <= 0:
+        raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+    if not 0 <= overlap < chunk_size:
+        raise ValueError(f"overlap must be in [0, chunk_size), got {overlap} for chunk_size {chunk_size}")
+    if boundary not in BOUNDARIES:
+        raise ValueError(f"Unknown chunk boundary {boundary!r}; expected one of {BOUNDARIES}")
+
+
+def iter_spans(text: str, chunk_size: int, overlap: int, boundary: str = "whitespace") -> Iterator[Span]:
+    """Yield ``(start, end)`` offsets of overlapping chunks of ``text``.
+
+    Sizes are counted in whitespace-separated tokens. ``whitespace`` windows exactly
+    ``chunk_size`` tokens and advances by ``chunk_size - overlap``; ``sentence`` and
+    ``paragraph`` pack whole units up to ``chunk_size`` tokens and carry up to
+    ``overlap`` tokens of trailing units into the next chunk, splitting units that are
+    longer than a chunk on whitespace. Chunks never start or end in whitespace.
+    """
+    validate(chunk_size, overlap, boundary)
+    if boundary == "whitespace":
+        return _whitespace_spans(text, chunk_size, overlap, 0, len(text))
+    return _packed_spans(text, BOUNDARY_PATTERNS[boundary], chunk_size, overlap)
+
+
+def iter_chunks(text: str, chunk_size: int, overlap: int, boundary: str = "whitespace") -> Iterator[TextChunk]:
+    """Like ``iter_spans`` but also slices each chunk's text; nothing else is copied."""
+    spans = iter_spans(text, chunk_size, overlap, boundary)
+    return (TextChunk(text[start:end], start, end) for start, end in spans)
+
+
+@lru_cache(maxsize=64)
+def _window_patterns(chunk_size: int, overlap: int, single_spaced: bool) -> Tuple[Pattern[str], ...]:
+    # Token counting runs inside the regex engine, so no per-token Python objects are
+    # created; possessive repeats and a literal-space separator keep it from backtracking.
+    token, separator = (r"[^ ]++", " ") if single_spaced else (r"\S++", r"\s++")
+    step = chunk_size - overlap
+    # ``step`` tokens; group 1 is the separator before the next window's first token.
+    advance = re.compile(r"(?:%s%s){%d}%s(%s)" % (token, separator, step - 1, token, separator))
+    tail = re.compile(r"%s(?:%s%s){0,%d}" % (token, separator, token, max(overlap - 1, 0)))
+    window = re.compile(r"%s(?:%s%s){0,%d}" % (token, separator, token, chunk_size - 1))
+    return advance, tail, window
+
+
+def _whitespace_spans(text: str, chunk_size: int, overlap: int, pos: int, endpos: int) -> Iterator[Span]:
+    first = NON_SPACE_RE.search(text, pos, endpos)
+    if first is None:
+        return
+    advance, tail, window = _window_patterns(chunk_size, overlap, _single_spaced(text))
+    start = first.start()
+    while True:
+        step = advance.match(text, start, endpos)
+        if step is None or step.end() == endpos:
+            # At most ``step`` tokens remain: this is the last window.
+            yield start, window.match(text, start, endpos).end()
+            return
+        end = tail.match(text, step.end(), endpos).end() if overlap else step.start(1)
+        yield start, end
+        if NON_SPACE_RE.search(text, end, endpos) is None:
+            return
+        start = step.end()
+
+
+def _single_spaced(text: str) -> bool:
+    """True if tokens are separated by exactly one " "; each check is a C substring scan."""
+    if "  " in text or any(space in text for space in ASCII_OTHER_SPACES):
+        return False
+    return text.isascii() or not any(space in text for space in UNICODE_SPACES)
+
+
+def _units(text: str, pattern: Pattern[str], chunk_size: int) -> Iterator[Tuple[int, int, int]]:
+    """Yield ``(start, end, tokens)`` boundary units, splitting any longer than a chunk."""
+    single_spaced = _single_spaced(text)
+
+    def count(start: int, end: int) -> int:
+        return text.count(" ", start, end) + 1 if single_spaced else len(TOKEN_RE.findall(text, start, end))
+
+    for match in pattern.finditer(text):
+        start, end = match.span()
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        tokens = count(start, end)
+        if tokens <= chunk_size:
+            yield start, end, tokens
+            continue
+        for piece_start, piece_end in _whitespace_spans(text, chunk_size, 0, start, end):
+            yield piece_start, piece_end, count(piece_start, piece_end)
+
+
+def _packed_spans(text: str, pattern: Pattern[str], chunk_size: int, overlap: int) -> Iterator[Span]:
+    window: Deque[Tuple[int, int, int]] = deque()
+    tokens = 0
+    fresh = False
+    for unit in _units(text, pattern, chunk_size):
+        if window and tokens + unit[2] > chunk_size:
+            yield window[0][0], window[-1][1]
+            fresh = False
+            while window and (tokens > overlap or tokens + unit[2] > chunk_size):
+                tokens -= window.popleft()[2]
+        window.append(unit)
+        tokens += unit[2]
+        fresh = True
+    if fresh:
+        yield window[0][0], window[-1][1]
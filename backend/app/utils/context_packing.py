@@ -0,0 +1,197 @@
+"""Pack retrieved chunks into a token-budgeted, de-duplicated prompt context."""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+from app.models.chunk import Chunk
+
+SHINGLE_SIZE = 5
+
+
+@dataclass
+class Passage:
+    """Contiguous text from one document, built from one or more retrieved chunks."""
+
+    document_id: str
+    text: str
+    chunk_ids: List[str]
+    rank: int
+    start_offset: Optional[int] = None
+    end_offset: Optional[int] = None
+    last_index: int = 0
+
+    @property
+    def tokens(self) -> int:
+        return count_tokens(self.text)
+
+
+@dataclass
+class PackedContext:
+    """Passages in score order plus what packing removed."""
+
+    passages: List[Passage] = field(default_factory=list)
+    tokens_in: int = 0
+    tokens_packed: int = 0
+    merged_chunks: int = 0
+    duplicates_dropped: int = 0
+    over_budget_dropped: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_in - self.tokens_packed
+
+    @property
+    def texts(self) -> List[str]:
+        return [passage.text for passage in self.passages]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "context_tokens_in": self.tokens_in,
+            "context_tokens": self.tokens_packed,
+            "context_tokens_saved": self.tokens_saved,
+            "context_merged_chunks": self.merged_chunks,
+            "context_duplicates_dropped": self.duplicates_dropped,
+            "context_over_budget_dropped": self.over_budget_dropped,
+        }
+
+
+def count_tokens(text: str) -> int:
+    """Whitespace tokens, the unit ``chunk_size`` and ``chunk_overlap`` are counted in."""
+    return len(text.split())
+
+
+def unpacked(chunks: Sequence[Chunk]) -> PackedContext:
+    """Every chunk verbatim as its own passage (packing disabled)."""
+    passages = [
+        Passage(chunk.document_id, chunk.content, [chunk.id], rank, chunk.start_offset, chunk.end_offset)
+        for rank, chunk in enumerate(chunks)
+    ]
+    tokens = sum(passage.tokens for passage in passages)
+    return PackedContext(passages=passages, tokens_in=tokens, tokens_packed=tokens)
+
+
+def pack_context(
+    chunks: Sequence[Chunk], token_budget: int, dedup_threshold: float = 0.9, overlap: int = 0
+) -> PackedContext:
+    """Budget, de-duplicate and merge ``chunks``, which must be in score order.
+
+    1. Chunks are taken in score order while they fit ``token_budget``, each charged its
+       full token count; if the best chunk alone exceeds the budget it is truncated
+       rather than dropped. Chunks already seen (same id or content, or offsets inside
+       a kept chunk of the same document) are dropped before anything else, and only
+       chunks that fit are shingled: those whose word-shingle Jaccard similarity to a
+       kept chunk is at least ``dedup_threshold`` are dropped too.
+    2. Kept chunks of the same document with consecutive ``chunk_index`` (or
+       overlapping offsets) are merged into one passage, removing the text they share:
+       located by offsets when chunks carry them, else the ``overlap`` tokens they were
+       chunked with. A passage ranks as its best-ranked chunk.
+
+    Budgeting before merging means the top-ranked chunk is never cut off by the
+    neighbours it is merged with, and merging can only bring the total under budget.
+    """
+    packed = PackedContext(tokens_in=sum(count_tokens(chunk.content) for chunk in chunks))
+    kept: List[Tuple[int, Chunk]] = []
+    seen: Set[str] = set()
+    spans: Dict[str, List[Tuple[int, int]]] = {}
+    kept_shingles: List[FrozenSet[Tuple[str, ...]]] = []
+    remaining = token_budget
+    for rank, chunk in enumerate(chunks):
+        if chunk.id in seen or (chunk.content_hash or chunk.content) in seen or _contained(chunk, spans):
+            packed.duplicates_dropped += 1
+            continue
+        tokens = count_tokens(chunk.content)
+        if tokens > remaining and (kept or remaining <= 0):
+            packed.over_budget_dropped += 1
+            continue
+        shingles = _shingles(chunk.content)
+        if any(_jaccard(shingles, other) >= dedup_threshold for other in kept_shingles):
+            packed.duplicates_dropped += 1
+            continue
+        if tokens > remaining:
+            text = " ".join(chunk.content.split()[:remaining])
+            chunk = Chunk(chunk.id, chunk.document_id, text, chunk.chunk_index, start_offset=chunk.start_offset)
+            tokens = remaining
+        seen.update((chunk.id, chunk.content_hash or chunk.content))
+        if chunk.start_offset is not None and chunk.end_offset is not None:
+            spans.setdefault(chunk.document_id, []).append((chunk.start_offset, chunk.end_offset))
+        kept_shingles.append(shingles)
+        kept.append((rank, chunk))
+        remaining -= tokens
+    packed.passages = sorted(_merge(kept, overlap), key=lambda passage: passage.rank)
+    packed.merged_chunks = len(kept) - len(packed.passages)
+    packed.tokens_packed = sum(passage.tokens for passage in packed.passages)
+    return packed
+
+
+def _contained(chunk: Chunk, spans: Dict[str, List[Tuple[int, int]]]) -> bool:
+    if chunk.start_offset is None or chunk.end_offset is None:
+        return False
+    return any(
+        start <= chunk.start_offset and chunk.end_offset <= end for start, end in spans.get(chunk.document_id, ())
+    )
+
+
+def _merge(ranked: Sequence[Tuple[int, Chunk]], overlap: int) -> List[Passage]:
+    by_document: Dict[str, List[tuple]] = {}
+    for rank, chunk in ranked:
+        by_document.setdefault(chunk.document_id, []).append((chunk.chunk_index, rank, chunk))
+    passages: List[Passage] = []
+    for document_id, members in by_document.items():
+        current: Optional[Passage] = None
+        for chunk_index, rank, chunk in sorted(members, key=lambda member: member[0]):
+            if current is not None and chunk_index == current.last_index:
+                current.rank = min(current.rank, rank)  # The same chunk retrieved twice.
+                continue
+            if current is not None and _continues(current, chunk):
+                current.text = _join(current, chunk, overlap)
+                current.chunk_ids.append(chunk.id)
+                current.rank = min(current.rank, rank)
+                current.last_index = chunk_index
+                current.end_offset = chunk.end_offset if current.end_offset is not None else None
+                continue
+            current = Passage(
+                document_id=document_id,
+                text=chunk.content,
+                chunk_ids=[chunk.id],
+                rank=rank,
+                start_offset=chunk.start_offset,
+                end_offset=chunk.end_offset,
+                last_index=chunk_index,
+            )
+            passages.append(current)
+    return passages
+
+
+def _continues(passage: Passage, chunk: Chunk) -> bool:
+    if chunk.chunk_index == passage.last_index + 1:
+        return True
+    if passage.end_offset is None or chunk.start_offset is None:
+        return False
+    return chunk.start_offset <= passage.end_offset
+
+
+def _join(passage: Passage, chunk: Chunk, overlap: int) -> str:
+    if passage.end_offset is not None and chunk.start_offset is not None:
+        shared = passage.end_offset - chunk.start_offset
+        if shared >= 0:
+            return passage.text + chunk.content[shared:]
+        return f"{passage.text} {chunk.content}"
+    head, tail = passage.text.split(), chunk.content.split()
+    if 0 < overlap <= min(len(head), len(tail)) and head[-overlap:] == tail[:overlap]:
+        return " ".join(head + tail[overlap:])
+    return f"{passage.text} {chunk.content}"
+
+
+def _shingles(text: str) -> FrozenSet[Tuple[str, ...]]:
+    words = text.split()
+    if len(words) <= SHINGLE_SIZE:
+        return frozenset([tuple(words)])
+    # zip builds and hashes the word tuples in C; no per-shingle joins or encodes.
+    return frozenset(zip(*(words[i:] for i in range(SHINGLE_SIZE))))
+
+
+def _jaccard(left: FrozenSet[Tuple[str, ...]], right: FrozenSet[Tuple[str, ...]]) -> float:
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
@@ -0,0 +1,205 @@
+"""In-process latency histograms and counters, rendered in the Prometheus text format."""
+from __future__ import annotations
+
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+Labels = Tuple[Tuple[str, str], ...]
+
+# Seconds; spans from sub-millisecond index lookups to multi-second ingestion.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STAGE_SECONDS = "rag_stage_duration_seconds"
+STAGE_ERRORS = "rag_stage_errors_total"
+
+# Stage histograms resolved once; ``record`` skips the registry's label lookup.
+_stage_histograms: Dict[str, Histogram] = {}
+# Per-request ``{stage: milliseconds}``; set by the HTTP middleware, None elsewhere.
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    """Observation counts per upper bound, plus their sum (Prometheus histogram semantics)."""
+
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf.
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Thread-safe named histograms and counters keyed by label values.
+
+    Recording takes one lock and a bisect, so it is cheap enough for every request and
+    every pipeline batch. Label values should have bounded cardinality (stage names,
+    route templates, status codes), never ids or query text.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._help: Dict[str, str] = {
+            STAGE_SECONDS: "Time spent in each pipeline stage.",
+            STAGE_ERRORS: "Pipeline stage calls that raised.",
+        }
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    def histogram(self, name: str, **labels: str) -> Histogram:
+        """The series for ``labels``, created on first use; hot paths can hold on to it."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            return histogram
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        self.observe_into(self.histogram(name, **labels), value)
+
+    def observe_into(self, histogram: Histogram, value: float) -> None:
+        with self._lock:
+            histogram.observe(value)
+
+    def increment(self, name: str, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    def render(self) -> str:
+        """Every series in the Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted(self._counters):
+                self._header(lines, name, "counter")
+                for key, value in sorted(self._counters[name].items()):
+                    lines.append(f"{name}{_labels(key)} {_number(value)}")
+            for name in sorted(self._histograms):
+                self._header(lines, name, "histogram")
+                for key, histogram in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(self.buckets + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(key + (('le', _number(bound)),))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(key)} {_number(histogram.total)}")
+                    lines.append(f"{name}_count{_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines: List[str], name: str, kind: str) -> None:
+        if name in self._help:
+            lines.append(f"# HELP {name} {self._help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+
+@lru_cache()
+def get_metrics() -> MetricsRegistry:
+    """Return the process-wide metrics registry."""
+    return MetricsRegistry()
+
+
+def record(stage: str, seconds: float) -> None:
+    """Record ``seconds`` spent in ``stage``, and add it to the current request's breakdown."""
+    registry = get_metrics()
+    histogram = _stage_histograms.get(stage)
+    if histogram is None:
+        histogram = _stage_histograms[stage] = registry.histogram(STAGE_SECONDS, stage=stage)
+    registry.observe_into(histogram, seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds * 1000
+
+
+class span:
+    """Time the enclosed ``with`` block as ``stage``; exceptions are counted and re-raised.
+
+    A class rather than ``@contextmanager``: it runs on every pipeline call, and a
+    generator-based context manager costs several times more per use.
+    """
+
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+        self.start = 0.0
+
+    def __enter__(self) -> "span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, traceback: Any) -> None:
+        if exc_type is not None and issubclass(exc_type, Exception):
+            get_metrics().increment(STAGE_ERRORS, stage=self.stage)
+        record(self.stage, time.perf_counter() - self.start)
+
+
+def timed(stage: str) -> Callable[[F], F]:
+    """Decorate a function or coroutine function so every call is timed as ``stage``."""
+
+    def decorate(fn: F) -> F:
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with span(stage):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(stage):
+                return fn(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+@contextmanager
+def collect_request_timings() -> Iterator[Dict[str, float]]:
+    """Collect ``{stage: ms}`` for spans recorded in this context (and threads it spawns)."""
+    timings: Dict[str, float] = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """Format a breakdown as a ``Server-Timing`` header value."""
+    return ", ".join(f"{stage};dur={ms:.2f}" for stage, ms in timings.items())
+
+
+def _labels(key: Labels) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in key) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
@@ -1,33 +1,112 @@
 """Text processing utilities used across the pipeline."""
+import codecs
+import hashlib
 import re
-from typing import Iterable, List
+from collections import deque
+from typing import Deque, Iterable, Iterator, List
 
+from app.utils import chunker
+from app.utils.metrics import timed
 
 WHITESPACE_RE = re.compile(r"\s+")
+# A blank line (possibly holding other whitespace) and the whitespace around it.
+PARAGRAPH_BREAK_RE = re.compile(r"\s*\n[^\S\n]*\n\s*")
 
 
-def normalize_text(text: str) -> str:
-    """Lowercase and normalize whitespace to stabilize downstream embeddings."""
+@timed("normalize")
+def normalize_text(text: str, keep_paragraphs: bool = False) -> str:
+    """Lowercase and normalize whitespace to stabilize downstream embeddings.
+
+    ``keep_paragraphs`` normalizes each paragraph separately and joins them with one
+    blank line, so paragraph chunk boundaries survive normalization.
+    """
     cleaned = text.replace("\u00a0", " ")
+    if keep_paragraphs:
+        paragraphs = (WHITESPACE_RE.sub(" ", paragraph).strip() for paragraph in PARAGRAPH_BREAK_RE.split(cleaned))
+        return "\n\n".join(paragraph for paragraph in paragraphs if paragraph).lower()
     cleaned = WHITESPACE_RE.sub(" ", cleaned)
     return cleaned.strip().lower()
 
 
+def content_fingerprint(text: str, model: str) -> str:
+    """Stable identity of a chunk's embedding: hash of the model and normalized text."""
+    payload = f"{model}\x00{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
 def chunk_text(text: str, chunk_size: int, overlap: int) -> List[str]:
-    """Chunk text with token overlap to preserve context across splits."""
-    tokens = text.split(" ")
-    chunks: List[str] = []
-    start = 0
-    while start < len(tokens):
-        end = min(start + chunk_size, len(tokens))
-        chunk_tokens = tokens[start:end]
-        chunks.append(" ".join(chunk_tokens))
-        start = end - overlap
-        if start < 0:
-            start = 0
-        if end == len(tokens):
-            break
-    return chunks
+    """Chunk text with token overlap to preserve context across splits.
+
+    Each chunk is one slice of ``text`` located by ``chunker.iter_spans``; use the
+    chunker directly for lazy iteration, offsets or other boundary strategies.
+    """
+    return [text[start:end] for start, end in chunker.iter_spans(text, chunk_size, overlap)]
+
+
+def iter_decode(blocks: Iterable[bytes], encoding: str = "utf-8") -> Iterator[str]:
+    """Incrementally decode byte blocks, carrying split multi-byte sequences across blocks."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="ignore")
+    for block in blocks:
+        text = decoder.decode(block)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def iter_normalize(parts: Iterable[str]) -> Iterator[str]:
+    """Streaming ``normalize_text``: joining the output equals normalizing the joined input.
+
+    Whitespace runs that straddle part boundaries collapse to one space, and leading or
+    trailing whitespace of the whole stream is dropped.
+    """
+    started = False
+    pending_space = False
+    for part in parts:
+        collapsed = WHITESPACE_RE.sub(" ", part.replace("\u00a0", " "))
+        core = collapsed.strip(" ")
+        if not core:
+            pending_space = pending_space or bool(collapsed)
+            continue
+        separator = " " if started and (pending_space or collapsed.startswith(" ")) else ""
+        started = True
+        pending_space = collapsed.endswith(" ")
+        yield separator + core.lower()
+
+
+def iter_tokens(normalized_parts: Iterable[str]) -> Iterator[str]:
+    """Split a stream of normalized text into space-separated tokens across part boundaries."""
+    pending = ""
+    for part in normalized_parts:
+        tokens = (pending + part).split(" ")
+        pending = tokens.pop()
+        for token in tokens:
+            if token:
+                yield token
+    if pending:
+        yield pending
+
+
+def iter_chunk_text(tokens: Iterable[str], chunk_size: int, overlap: int) -> Iterator[str]:
+    """Generator version of ``chunk_text`` over a token stream.
+
+    Only the current window of ``chunk_size`` tokens is held in memory.
+    """
+    if chunk_size <= 0 or not 0 <= overlap < chunk_size:
+        raise ValueError("chunk_size must be positive and overlap must be in [0, chunk_size)")
+    window: Deque[str] = deque()
+    fresh = 0
+    for token in tokens:
+        if len(window) == chunk_size:
+            yield " ".join(window)
+            for _ in range(chunk_size - overlap):
+                window.popleft()
+            fresh = 0
+        window.append(token)
+        fresh += 1
+    if fresh:
+        yield " ".join(window)
 
 
 def format_prompt(question: str, contexts: Iterable[str]) -> str:
@@ -0,0 +1,135 @@
+"""Compare resident bytes per chunk for list-backed, slotted and columnar chunk storage."""
+import argparse
+import gc
+import hashlib
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.models.chunk import Chunk, content_chunk_id
+from app.models.chunk_array import ChunkArray
+
+
+@dataclass
+class LegacyChunk:
+    """The original ``Chunk`` layout: ``__dict__`` per instance and list embeddings."""
+
+    id: str
+    document_id: str
+    content: str
+    chunk_index: int
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    embedding: Optional[List[float]] = None
+    content_hash: Optional[str] = None
+
+
+def corpus(chunks: int, chunks_per_doc: int, chars: int, dim: int):
+    rng = np.random.default_rng(0)
+    vectors = rng.random((chunks, dim), dtype=np.float32)
+    contents = ["x" * chars for _ in range(chunks)]
+    return vectors, contents, chunks_per_doc
+
+
+def content_hash(i: int) -> str:
+    """Stand-in for ``content_fingerprint``: a distinct SHA-256 hex digest per chunk."""
+    return hashlib.sha256(str(i).encode()).hexdigest()
+
+
+def build_legacy(vectors, contents, per_doc) -> List[LegacyChunk]:
+    # Chunks read back from storage carry their own metadata dict and list embedding.
+    return [
+        LegacyChunk(
+            id=content_chunk_id(f"doc-{i // per_doc}", content_hash(i)),
+            document_id=f"doc-{i // per_doc}",
+            content=content,
+            chunk_index=i % per_doc,
+            metadata={"content_type": "text/plain", "source": f"doc-{i // per_doc}.txt"},
+            embedding=vectors[i].tolist(),
+            content_hash=content_hash(i),
+        )
+        for i, content in enumerate(contents)
+    ]
+
+
+def build_slotted(vectors, contents, per_doc) -> List[Chunk]:
+    matrix = vectors.copy()
+    chunks = []
+    for i, content in enumerate(contents):
+        if i % per_doc == 0:
+            metadata = {"content_type": "text/plain", "source": f"doc-{i // per_doc}.txt"}
+        chunks.append(
+            Chunk(
+                id=content_chunk_id(f"doc-{i // per_doc}", content_hash(i)),
+                document_id=f"doc-{i // per_doc}",
+                content=content,
+                chunk_index=i % per_doc,
+                metadata=metadata,
+                embedding=matrix[i],
+                content_hash=content_hash(i),
+            )
+        )
+    return chunks
+
+
+def build_array(dtype) -> Callable:
+    def build(vectors, contents, per_doc) -> ChunkArray:
+        array = ChunkArray(dtype=dtype)
+        array.reserve(len(contents))
+        for i, content in enumerate(contents):
+            document_id = f"doc-{i // per_doc}"
+            array.append(
+                content_chunk_id(document_id, content_hash(i)),
+                document_id,
+                content,
+                i % per_doc,
+                {"content_type": "text/plain", "source": f"{document_id}.txt"},
+                content_hash=content_hash(i),
+            )
+        array.set_embeddings(vectors)
+        return array
+
+    return build
+
+
+def measure(build: Callable, vectors, contents, per_doc) -> int:
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    held = build(vectors, contents, per_doc)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del held
+    return used
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--chunks-per-doc", type=int, default=50)
+    parser.add_argument("--chars", type=int, default=800, help="Characters per chunk")
+    parser.add_argument("--dim", type=int, default=1024, help="Embedding dimensions")
+    args = parser.parse_args()
+
+    vectors, contents, per_doc = corpus(args.chunks, args.chunks_per_doc, args.chars, args.dim)
+    content_bytes = sum(len(content) for content in contents) + 49 * len(contents)
+    variants = [
+        ("legacy dataclass + list[float]", build_legacy),
+        ("slotted Chunk + float32 row views", build_slotted),
+        ("ChunkArray float32", build_array(np.float32)),
+        ("ChunkArray float16", build_array(np.float16)),
+    ]
+    print(f"{args.chunks} chunks, dim={args.dim}, {args.chars} chars/chunk (text not counted)")
+    legacy = None
+    for name, build in variants:
+        # Chunk text is shared by every variant, so it is excluded from the per-chunk overhead.
+        per_chunk = max(measure(build, vectors, contents, per_doc), 0) / args.chunks
+        legacy = legacy or per_chunk
+        print(f"{name:36s} {per_chunk:10.0f} bytes/chunk  {legacy / per_chunk:6.1f}x smaller than legacy")
+    print(f"(chunk text itself: {content_bytes / args.chunks:.0f} bytes/chunk in every variant)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Time and allocation cost per MB of the offset chunker against the legacy token chunker."""
+import argparse
+import random
+import time
+import tracemalloc
+from typing import Callable, List
+
+from app.utils import chunker, text_utils
+
+
+def legacy_chunk_text(text: str, chunk_size: int, overlap: int) -> List[str]:
+    """The original ``text_utils.chunk_text``: split to tokens, re-join every window."""
+    tokens = text.split(" ")
+    chunks: List[str] = []
+    start = 0
+    while start < len(tokens):
+        end = min(start + chunk_size, len(tokens))
+        chunk_tokens = tokens[start:end]
+        chunks.append(" ".join(chunk_tokens))
+        start = end - overlap
+        if start < 0:
+            start = 0
+        if end == len(tokens):
+            break
+    return chunks
+
+
+def make_text(megabytes: float, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    vocabulary = [
+        "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 10))) for _ in range(5000)
+    ]
+    words: List[str] = []
+    size = 0
+    while size < megabytes * 1_000_000:
+        word = rng.choice(vocabulary) + ("." if rng.random() < 0.07 else "")
+        words.append(word)
+        size += len(word) + 1
+    return text_utils.normalize_text(" ".join(words))
+
+
+def check_paragraphs() -> None:
+    """Paragraph mode must split raw text on its blank lines once normalized for it."""
+    paragraphs = [" ".join(f"Word{i}x{j}" for j in range(30)) for i in range(6)]
+    raw = "\n \n\n".join(" \t".join(paragraph.split(" ")) for paragraph in paragraphs)
+    text = text_utils.normalize_text(raw, keep_paragraphs=True)
+    chunks = [chunk.text for chunk in chunker.iter_chunks(text, 40, 0, "paragraph")]
+    assert chunks == [paragraph.lower() for paragraph in paragraphs], chunks
+    # Without keep_paragraphs the breaks are gone and paragraph packing degrades to whitespace windows.
+    assert "\n" not in text_utils.normalize_text(raw)
+
+
+def run(fn: Callable[[], object], repeats: int) -> tuple:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--megabytes", type=float, default=8.0)
+    parser.add_argument("--chunk-size", type=int, default=800)
+    parser.add_argument("--overlap", type=int, default=120)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    check_paragraphs()
+    text = make_text(args.megabytes)
+    mb = len(text.encode("utf-8")) / 1_000_000
+    size, overlap = args.chunk_size, args.overlap
+    assert legacy_chunk_text(text, size, overlap) == text_utils.chunk_text(text, size, overlap)
+
+    cases = [
+        ("legacy chunk_text (list)", lambda: legacy_chunk_text(text, size, overlap)),
+        ("chunk_text (list, offsets)", lambda: text_utils.chunk_text(text, size, overlap)),
+        ("iter_spans whitespace", lambda: sum(1 for _ in chunker.iter_spans(text, size, overlap))),
+        ("iter_chunks whitespace (lazy)", lambda: sum(1 for _ in chunker.iter_chunks(text, size, overlap))),
+        ("iter_chunks sentence (lazy)", lambda: sum(1 for _ in chunker.iter_chunks(text, size, overlap, "sentence"))),
+    ]
+    print(f"{mb:.1f} MB normalized text, chunk_size={size}, overlap={overlap}")
+    print(f"{'case':32s} {'ms/MB':>9s} {'peak alloc MB/MB':>17s}")
+    for name, fn in cases:
+        seconds, peak = run(fn, args.repeats)
+        print(f"{name:32s} {seconds * 1000 / mb:9.2f} {peak / 1_000_000 / mb:17.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Synthetic corpus and request-log generator for the benchmark suite and replay harness."""
+import argparse
+import json
+import os
+import random
+from typing import Dict, Iterator, List
+
+# Zipf-ish vocabulary: a few frequent function words and a long tail of content words,
+# so BM25 postings and chunk boundaries look like prose rather than uniform noise.
+COMMON = "the of and to in a is that for on with as by at from this are be or it".split()
+TOPICS = [
+    "delta", "lakehouse", "vector", "embedding", "retrieval", "cluster", "notebook", "pipeline",
+    "catalog", "schema", "partition", "streaming", "checkpoint", "warehouse", "serving", "model",
+    "latency", "throughput", "governance", "lineage", "feature", "inference", "index", "query",
+]
+CONTENT_TYPES = ["text/plain", "text/markdown", "application/pdf"]
+
+
+def make_text(rng: random.Random, words: int, vocabulary: int = 5000) -> str:
+    """``words`` tokens of sentence-structured prose with paragraph breaks."""
+    tail = [f"term{i}" for i in range(vocabulary)]
+    sentences: List[str] = []
+    produced = 0
+    while produced < words:
+        length = min(rng.randint(8, 24), words - produced)
+        tokens = []
+        for _ in range(length):
+            roll = rng.random()
+            if roll < 0.45:
+                tokens.append(rng.choice(COMMON))
+            elif roll < 0.70:
+                tokens.append(rng.choice(TOPICS))
+            else:
+                tokens.append(tail[min(int(rng.paretovariate(1.2)) - 1, vocabulary - 1)])
+        sentence = " ".join(tokens).capitalize() + "."
+        sentences.append(sentence + ("\n\n" if rng.random() < 0.15 else " "))
+        produced += length
+    return "".join(sentences).strip()
+
+
+def iter_documents(documents: int, words: int, seed: int = 0) -> Iterator[Dict[str, object]]:
+    """Yield ``{"id", "name", "text", "metadata"}`` records of about ``words`` tokens each."""
+    rng = random.Random(seed)
+    for i in range(documents):
+        length = max(1, int(rng.gauss(words, words / 4)))
+        yield {
+            "id": f"bench-doc-{i}",
+            "name": f"bench-{i}.txt",
+            "text": make_text(rng, length),
+            "metadata": {"content_type": rng.choice(CONTENT_TYPES)},
+        }
+
+
+def make_queries(count: int, seed: int = 1) -> List[str]:
+    """Short keyword questions drawn from the corpus vocabulary."""
+    rng = random.Random(seed)
+    return [
+        f"how does {rng.choice(TOPICS)} {rng.choice(TOPICS)} affect term{int(rng.paretovariate(1.2))}"
+        for _ in range(count)
+    ]
+
+
+def iter_request_log(count: int, top_k: int = 5, seed: int = 1) -> Iterator[Dict[str, object]]:
+    """Request-log lines: ``request_id`` and a ``/query`` payload under ``body``."""
+    modes = ["vector", "lexical", "hybrid"]
+    rng = random.Random(seed)
+    for i, query in enumerate(make_queries(count, seed)):
+        body = {"query": query, "top_k": top_k, "retrieval_mode": rng.choice(modes)}
+        yield {"request_id": f"bench-{i:06d}", "body": body}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--words", type=int, default=2000, help="Mean tokens per document")
+    parser.add_argument("--output", default="bench_corpus", help="Directory for the .txt documents")
+    parser.add_argument("--requests", type=int, default=1000, help="Lines in the generated request log")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    os.makedirs(args.output, exist_ok=True)
+    for document in iter_documents(args.documents, args.words, args.seed):
+        with open(os.path.join(args.output, str(document["name"])), "w", encoding="utf-8") as handle:
+            handle.write(str(document["text"]))
+    log_path = os.path.join(args.output, "requests.jsonl")
+    with open(log_path, "w", encoding="utf-8") as handle:
+        for line in iter_request_log(args.requests, seed=args.seed + 1):
+            handle.write(json.dumps(line) + "\n")
+    print(f"Wrote {args.documents} documents and {args.requests} requests ({log_path}) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Offline retrieval sweep: recall@k, MRR, nDCG and latency per parameter point, logged to MLflow.
+
+With ``--labels`` the labelled queries (``{"query", "relevant_ids"}`` JSONL lines) are run
+against the configured stores. Without it a synthetic corpus is indexed into scratch
+storage and each query is the rarest terms of one chunk, labelled with that chunk's id
+(the hash-based mock embeddings cannot match such queries, so vector recall stays near chance).
+"""
+import argparse
+import json
+import os
+import random
+from collections import Counter
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from harness import use_scratch_storage
+
+if TYPE_CHECKING:
+    from app.models.evaluation import LabelledQuery
+
+QUERY_TERMS = 6
+
+
+def parse_list(spec: str) -> List[str]:
+    return [value.strip() for value in spec.split(",") if value.strip()]
+
+
+def parse_optional_ints(spec: str) -> List[Optional[int]]:
+    return [None if value == "default" else int(value) for value in parse_list(spec)]
+
+
+def parse_weights(spec: str) -> List[Optional[Tuple[float, float]]]:
+    weights: List[Optional[Tuple[float, float]]] = []
+    for value in parse_list(spec):
+        vector, lexical = value.split(":")
+        weights.append((float(vector), float(lexical)))
+    return weights or [None]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--labels", help="Labelled query JSONL; omit to evaluate a synthetic corpus")
+    parser.add_argument("--documents", type=int, default=100, help="Synthetic documents to index")
+    parser.add_argument("--queries", type=int, default=200, help="Synthetic labelled queries")
+    parser.add_argument("--k", default="5,10", help="Comma-separated top-k values")
+    parser.add_argument("--modes", default="vector,lexical,hybrid")
+    parser.add_argument("--nprobe", default="default", help="IVF probes, e.g. 4,16,default")
+    parser.add_argument("--quantization", default="default", help="e.g. none,int8,pq,default")
+    parser.add_argument("--rerank", default="default", help="Quantized re-rank factors, e.g. 0,4,default")
+    parser.add_argument("--weights", default="", help="Hybrid vector:lexical weights, e.g. 1:1,1:0.5")
+    parser.add_argument("--workers", type=int, help="Query threads (default Settings.evaluation_workers)")
+    parser.add_argument("--output", default="benchmarks/results/evaluation.json")
+    args = parser.parse_args()
+    if not args.labels:
+        use_scratch_storage()
+
+    from app.services.evaluation_service import EvaluationService, load_labelled_queries, parameter_grid
+
+    queries = load_labelled_queries(args.labels) if args.labels else synthetic_labelled_queries(args)
+    grid = parameter_grid(
+        k=[int(value) for value in parse_list(args.k)],
+        mode=parse_list(args.modes),
+        nprobe=parse_optional_ints(args.nprobe),
+        quantization=[None if value == "default" else value for value in parse_list(args.quantization)],
+        rerank=parse_optional_ints(args.rerank),
+        weights=parse_weights(args.weights),
+    )
+    results = EvaluationService().sweep_retrieval(queries, grid, args.workers)
+
+    print(f"{len(queries)} labelled queries, {len(grid)} sweep points")
+    print("* on the recall / p95 latency frontier; q scored quantized codes (untrained quantizers use float32)")
+    print(f"   {'point':64s} {'recall':>7s} {'mrr':>7s} {'ndcg':>7s} {'p50 ms':>8s} {'p95 ms':>8s} {'qps':>9s}")
+    for result in sorted(results, key=lambda item: item.latency_ms["p95"]):
+        flags = ("*" if result.on_frontier else " ") + ("q" if result.quantized else " ")
+        print(
+            f"{flags} {result.params.label:64s} {result.recall:7.3f} {result.mrr:7.3f} {result.ndcg:7.3f} "
+            f"{result.latency_ms['p50']:8.3f} {result.latency_ms['p95']:8.3f} {result.queries_per_second:9.1f}"
+        )
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as handle:
+        json.dump({"config": vars(args), "points": [result.to_dict() for result in results]}, handle, indent=2)
+    print(f"Results written to {args.output}")
+
+
+def synthetic_labelled_queries(args: argparse.Namespace) -> List["LabelledQuery"]:
+    """Index a synthetic corpus and label each sampled chunk with a query of its rarest words."""
+    from suite import chunk_corpus, load_documents, seed_index
+
+    from app.databricks.lexical_index import tokenize
+    from app.models.evaluation import LabelledQuery  # noqa: F811
+
+    chunks = chunk_corpus(load_documents(args.documents, 1000))
+    seed_index(chunks)
+    frequency = Counter(term for chunk in chunks for term in set(tokenize(chunk.content)))
+    rng = random.Random(3)
+    queries: List[LabelledQuery] = []
+    for chunk in rng.sample(chunks, min(args.queries, len(chunks))):
+        terms = sorted(set(tokenize(chunk.content)), key=lambda term: (frequency[term], term))[:QUERY_TERMS]
+        queries.append(LabelledQuery(" ".join(terms), [chunk.id]))
+    return queries
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Timing, percentile, result-file and baseline-comparison helpers shared by the suite and replay."""
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+Summary = Dict[str, float]
+# Metrics checked against the baseline and whether a larger value is better.
+COMPARED = {"throughput": True, "p95_ms": False}
+
+
+def use_scratch_storage() -> str:
+    """Point every on-disk store at a fresh temporary directory.
+
+    Must run before anything imports ``app.config``: the settings singleton reads the
+    environment once. Paths already set in the environment are left alone.
+    """
+    scratch = tempfile.mkdtemp(prefix="rag_bench_")
+    os.environ.setdefault("LOCAL_DELTA_PATH", os.path.join(scratch, "delta"))
+    os.environ.setdefault("LOCAL_VECTOR_STORE_PATH", os.path.join(scratch, "vectors.f32"))
+    os.environ.setdefault("LEXICAL_INDEX_PATH", os.path.join(scratch, "lexical"))
+    os.environ.setdefault("FINGERPRINT_STORE_PATH", os.path.join(scratch, "fingerprints.sqlite"))
+    return scratch
+
+
+def summarize(latencies: Sequence[float], elapsed: float, items: float) -> Summary:
+    """Throughput (items/s) and latency percentiles (ms) from per-call seconds."""
+    values = np.asarray(latencies, dtype=np.float64) * 1000
+    if values.size == 0:
+        return {"count": 0, "throughput": 0.0}
+    return {
+        "count": int(values.size),
+        "throughput": items / elapsed if elapsed > 0 else 0.0,
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "max_ms": float(values.max()),
+    }
+
+
+def measure(fn: Callable[[], Any], repeat: int, items_per_call: float = 1, warmup: int = 1) -> Summary:
+    """Call ``fn`` ``warmup`` times untimed, then ``repeat`` times timed."""
+    for _ in range(warmup):
+        fn()
+    latencies: List[float] = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        call = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - call)
+    return summarize(latencies, time.perf_counter() - started, repeat * items_per_call)
+
+
+def environment() -> Dict[str, Any]:
+    """Machine and library details stored next to the numbers they explain."""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def print_table(results: Mapping[str, Summary]) -> None:
+    print(f"{'benchmark':44s} {'items/s':>12s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}")
+    for name, summary in results.items():
+        print(
+            f"{name:44s} {summary.get('throughput', 0.0):12.1f} {summary.get('p50_ms', 0.0):9.3f}"
+            f" {summary.get('p95_ms', 0.0):9.3f} {summary.get('p99_ms', 0.0):9.3f}"
+        )
+
+
+def write_results(path: str, results: Mapping[str, Summary], config: Mapping[str, Any]) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump({"environment": environment(), "config": dict(config), "results": dict(results)}, handle, indent=2)
+    print(f"Results written to {path}")
+
+
+def compare(
+    results: Mapping[str, Summary],
+    baseline_path: str,
+    tolerance: float,
+    config: Optional[Mapping[str, Any]] = None,
+    config_keys: Sequence[str] = (),
+) -> Optional[List[str]]:
+    """Regressions beyond ``tolerance`` (a fraction) against a stored results file.
+
+    Returns None when there is no baseline. Benchmarks missing from either side are
+    skipped, so the baseline can be refreshed independently of new benchmarks. A
+    warning is printed when ``config_keys`` of ``config`` (corpus size, profile, ...)
+    differ from the baseline's, since latencies are then not comparable.
+    """
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path}; skipping comparison")
+        return None
+    with open(baseline_path, encoding="utf-8") as handle:
+        stored = json.load(handle)
+    baseline = stored["results"]
+    for key in config_keys:
+        old_value, new_value = stored.get("config", {}).get(key), (config or {}).get(key)
+        if old_value != new_value:
+            print(f"WARNING baseline {key}={old_value!r} but this run has {key}={new_value!r}")
+    regressions: List[str] = []
+    for name, summary in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        for metric, higher_is_better in COMPARED.items():
+            old, new = reference.get(metric), summary.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{name} {metric}: {old:.3f} -> {new:.3f} ({change:+.1%})")
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print(f"No regressions beyond {tolerance:.0%} against {baseline_path}")
+    return regressions
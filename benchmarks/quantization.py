@@ -0,0 +1,103 @@
+"""Quantized vector storage against float32: bytes per row, recall@k and search latency per mode.
+
+Builds one local index per ``--dims`` width from clustered synthetic vectors (closer to
+real embeddings than isotropic noise), attaches each quantizer in turn and reports its
+compression ratio and recall@k with and without float re-ranking against exact float32
+search over the same rows.
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+from harness import Summary, compare, print_table, summarize, use_scratch_storage, write_results
+
+SCRATCH = use_scratch_storage()
+
+import numpy as np  # noqa: E402
+
+from app.databricks.local_index import IndexRow, LocalVectorIndex  # noqa: E402
+from app.databricks.quantization import ProductQuantizer, Quantizer, ScalarQuantizer  # noqa: E402
+
+
+def clustered(rng: np.random.Generator, centers: np.ndarray, count: int, noise: float) -> np.ndarray:
+    labels = rng.integers(0, centers.shape[0], count)
+    return (centers[labels] + noise * rng.standard_normal((count, centers.shape[1]))).astype(np.float32)
+
+
+def quantizers(path: str, dim: int, args: argparse.Namespace) -> Dict[str, Quantizer]:
+    modes: Dict[str, Quantizer] = {"int8": ScalarQuantizer(f"{path}.int8", args.size, args.rerank)}
+    for subvectors in args.subvectors:
+        if dim % subvectors == 0:
+            modes[f"pq{subvectors}"] = ProductQuantizer(
+                f"{path}.pq{subvectors}", subvectors, 256, args.size, args.rerank
+            )
+    return modes
+
+
+def timed_each(index: LocalVectorIndex, queries: np.ndarray, k: int, exact: bool = False) -> Summary:
+    """Latency of single-query searches (re-ranked when the index is quantized)."""
+    index.search(queries[0], k, exact=exact)
+    latencies: List[float] = []
+    started = time.perf_counter()
+    for query in queries:
+        begin = time.perf_counter()
+        index.search(query, k, exact=exact)
+        latencies.append(time.perf_counter() - begin)
+    return summarize(latencies, time.perf_counter() - started, len(queries))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=50_000, help="Rows per index")
+    parser.add_argument("--dims", default="128,768", help="Comma-separated vector widths")
+    parser.add_argument("--subvectors", default="8,32,96", help="PQ sub-vector counts (skipped unless they divide dim)")
+    parser.add_argument("--rerank", type=int, default=4, help="Re-rank k times this many candidates in float32")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--noise", type=float, default=0.5, help="Spread of rows around their cluster centre")
+    parser.add_argument("--output", default="benchmarks/results/quantization.json")
+    parser.add_argument("--baseline", help="Quantization results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed fractional regression")
+    args = parser.parse_args()
+    args.subvectors = [int(value) for value in args.subvectors.split(",") if value.strip()]
+
+    results: Dict[str, Summary] = {}
+    reports: List[Dict[str, Any]] = []
+    for dim in (int(value) for value in args.dims.split(",") if value.strip()):
+        rng = np.random.default_rng(dim)
+        centers = rng.standard_normal((max(args.size // 100, 1), dim))
+        vectors = clustered(rng, centers, args.size, args.noise)
+        queries = clustered(rng, centers, args.queries, args.noise)
+        records = [
+            IndexRow(row=-1, chunk_id=f"c{i}", document_id=f"d{i // 10}", chunk_index=0, content="")
+            for i in range(args.size)
+        ]
+        path = os.path.join(SCRATCH, f"quantize-{dim}.f32")
+        LocalVectorIndex(path).upsert(records, vectors)
+        results[f"quantize.float32 n={args.size} dim={dim} [queries]"] = timed_each(
+            LocalVectorIndex(path), queries, args.top_k, exact=True
+        )
+        for name, quantizer in quantizers(path, dim, args).items():
+            index = LocalVectorIndex(path, quantizer=quantizer)  # Trains on open: every row is already present.
+            reports.append({"quantizer": name, "dim": dim, **index.quantization_report(queries, args.top_k)})
+            results[f"quantize.{name} n={args.size} dim={dim} [queries]"] = timed_each(index, queries, args.top_k)
+
+    header = f"{'quantizer':10s} {'dim':>5s} {'bytes/row':>10s} {'ratio':>7s} {'recall':>8s} {'reranked':>9s}"
+    print(header + f" {'adc ms':>8s} {'rerank ms':>10s} {'f32 ms':>8s}")
+    for report in reports:
+        print(
+            f"{report['quantizer']:10s} {report['dim']:5d} {report['code_bytes_per_row']:10d} "
+            f"{report['compression_ratio']:7.1f} {report['adc_recall']:8.3f} {report['reranked_recall']:9.3f} "
+            f"{report['adc_latency_ms']:8.3f} {report['reranked_latency_ms']:10.3f} {report['float32_latency_ms']:8.3f}"
+        )
+    print_table(results)
+    config = {**vars(args), "reports": reports}
+    write_results(args.output, results, config)
+    if args.baseline and compare(results, args.baseline, args.tolerance, config, ("size", "dims", "top_k", "rerank")):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Queries per second of looped single-query search against the batched matrix path."""
+import argparse
+import os
+import tempfile
+import time
+from typing import Callable, List, Sequence, Tuple
+
+# Point the indexes at a scratch directory before the settings singleton is created.
+SCRATCH = tempfile.mkdtemp(prefix="rag_bench_")
+os.environ.setdefault("LOCAL_VECTOR_STORE_PATH", os.path.join(SCRATCH, "vectors.f32"))
+os.environ.setdefault("LEXICAL_INDEX_PATH", os.path.join(SCRATCH, "lexical"))
+
+import numpy as np  # noqa: E402
+
+from app.databricks import vector_search  # noqa: E402
+from app.databricks.local_index import IndexRow, LocalVectorIndex  # noqa: E402
+from app.services.retrieval_service import RetrievalService  # noqa: E402
+
+
+def fill(index: LocalVectorIndex, rows: int, dim: int, batch: int = 50_000) -> None:
+    rng = np.random.default_rng(0)
+    for start in range(0, rows, batch):
+        count = min(batch, rows - start)
+        records = [
+            IndexRow(row=-1, chunk_id=f"c{i}", document_id=f"d{i // 10}", chunk_index=i % 10, content=f"chunk {i}")
+            for i in range(start, start + count)
+        ]
+        index.upsert(records, rng.standard_normal((count, dim), dtype=np.float32))
+
+
+def compare(label: str, looped: Callable[[], Sequence], batched: Callable[[], Sequence], queries: int) -> None:
+    timings: List[Tuple[float, Sequence]] = []
+    for fn in (looped, batched):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start, result))
+    (loop_seconds, expected), (batch_seconds, actual) = timings
+    agreement = np.mean([len(set(a) & set(b)) / max(len(a), 1) for a, b in zip(expected, actual)])
+    print(
+        f"{label:34s} {queries / loop_seconds:10.1f} {queries / batch_seconds:10.1f}"
+        f" {loop_seconds / batch_seconds:8.1f}x {agreement:9.3f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=768, help="Vector width for the index-level comparison")
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+    k = args.top_k
+    print(f"{args.rows} rows, {args.queries} distinct queries, top_k={k}")
+    print(f"{'path':34s} {'loop q/s':>10s} {'batch q/s':>10s} {'speed-up':>9s} {'agreement':>9s}")
+
+    # Index level at a production embedding width: search() per query vs search_batch().
+    index = LocalVectorIndex(os.path.join(SCRATCH, f"bench-{args.dim}.f32"))
+    fill(index, args.rows, args.dim)
+    vectors = np.random.default_rng(1).standard_normal((args.queries, args.dim), dtype=np.float32)
+    compare(
+        f"LocalVectorIndex, dim={args.dim}",
+        lambda: [[row.row for row, _ in index.search(vector, k)] for vector in vectors],
+        lambda: [[row.row for row, _ in hits] for hits in index.search_batch(vectors, k)],
+        args.queries,
+    )
+
+    # Service level, including query normalization, (mock) embedding and caching.
+    fill(vector_search.get_local_index(), args.rows, vector_search.EMBEDDING_DIM)
+    queries = [f"benchmark query {i}" for i in range(args.queries)]
+    looped, batched = RetrievalService(), RetrievalService()  # Fresh caches for both runs.
+    compare(
+        f"RetrievalService, dim={vector_search.EMBEDDING_DIM} (mock)",
+        lambda: [[chunk.id for chunk in looped.retrieve(query, k, "vector")] for query in queries],
+        lambda: [[chunk.id for chunk in chunks] for chunks in batched.retrieve_batch(queries, k, "vector")],
+        args.queries,
+    )
+
+
+if __name__ == "__main__":
+    main()
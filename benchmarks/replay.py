@@ -0,0 +1,138 @@
+"""Replay a JSONL request log against /query at a target rate and report latency percentiles.
+
+Each line is a JSON object. ``{"query": ...}`` lines are sent as-is; lines in the backlog
+format (``request_id``, ``title``, ``body``) send ``body`` when it is an object and
+otherwise use the text of ``body`` (or ``title``) as the query. Requests are scheduled
+open-loop at ``--qps``: latency is measured from each request's scheduled start, so a
+server that falls behind shows it as queueing delay instead of silently lowering the
+offered load.
+
+Without ``--url`` the app runs in-process over an ASGI transport against a synthetic
+corpus; with ``--url`` requests go to a running server.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from harness import compare, print_table, summarize, write_results
+from suite import SCRATCH, chunk_corpus, load_documents, seed_index
+
+
+def load_log(path: str, top_k: Optional[int]) -> List[Dict[str, Any]]:
+    payloads: List[Dict[str, Any]] = []
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            body = record.get("body")
+            if "query" in record:
+                payload = {key: value for key, value in record.items() if key != "request_id"}
+            elif isinstance(body, dict):
+                payload = dict(body)
+            else:
+                payload = {"query": str(body or record.get("title") or "")}
+            if top_k is not None:
+                payload["top_k"] = top_k
+            payloads.append(payload)
+    if not payloads:
+        raise SystemExit(f"No requests in {path}")
+    return payloads
+
+
+async def replay(
+    client: httpx.AsyncClient, path: str, payloads: List[Dict[str, Any]], qps: float, requests: int, timeout: float
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    lags: List[float] = []
+    statuses: Counter = Counter()
+
+    async def send(payload: Dict[str, Any], scheduled: float) -> None:
+        lags.append(time.perf_counter() - scheduled)
+        try:
+            response = await client.post(path, json=payload, timeout=timeout)
+            statuses[str(response.status_code)] += 1
+        except httpx.HTTPError as exc:
+            statuses[type(exc).__name__] += 1
+            return
+        if response.status_code < 400:
+            latencies.append(time.perf_counter() - scheduled)
+
+    started = time.perf_counter()
+    tasks = []
+    for i in range(requests):
+        scheduled = started + i / qps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(send(payloads[i % len(payloads)], scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    summary = summarize(latencies, elapsed, len(latencies))
+    summary["offered_qps"] = qps
+    summary["errors"] = requests - len(latencies)
+    summary["max_send_lag_ms"] = max(lags) * 1000 if lags else 0.0
+    return {"summary": summary, "statuses": dict(statuses)}
+
+
+async def run(args: argparse.Namespace, payloads: List[Dict[str, Any]]) -> Dict[str, Any]:
+    requests = args.requests or len(payloads)
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, limits=limits) as client:
+            return await replay(client, args.path, payloads, args.qps, requests, args.timeout)
+    from app.main import app
+
+    documents = load_documents(args.documents, args.words)
+    seed_index(chunk_corpus(documents))
+    print(f"Serving in-process over {args.documents} synthetic documents (scratch {SCRATCH})")
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://replay", limits=limits) as client:
+            return await replay(client, args.path, payloads, args.qps, requests, args.timeout)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log", help="JSONL request log (see benchmarks/corpus.py to generate one)")
+    parser.add_argument("--qps", type=float, default=50.0, help="Target requests per second")
+    parser.add_argument("--requests", type=int, help="Requests to send; cycles through the log (default: its length)")
+    parser.add_argument("--url", help="Base URL of a running server; in-process when omitted")
+    parser.add_argument("--path", default="/query/", help="Endpoint to replay against")
+    parser.add_argument("--top-k", type=int, help="Override top_k on every request")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--max-connections", type=int, default=100)
+    parser.add_argument("--documents", type=int, default=200, help="Synthetic documents for in-process runs")
+    parser.add_argument("--words", type=int, default=2000)
+    parser.add_argument("--output", default="benchmarks/results/replay.json")
+    parser.add_argument("--baseline", help="Replay results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed fractional regression")
+    args = parser.parse_args()
+    if args.qps <= 0:
+        parser.error("--qps must be positive")
+
+    payloads = load_log(args.log, args.top_k)
+    outcome = asyncio.run(run(args, payloads))
+    name = f"replay {args.path} qps={args.qps:g}"
+    results = {name: outcome["summary"]}
+    print_table(results)
+    summary = outcome["summary"]
+    print(f"statuses {outcome['statuses']}, max send lag {summary['max_send_lag_ms']:.1f} ms")
+    config = {**vars(args), "statuses": outcome["statuses"]}
+    write_results(args.output, results, config)
+    failed = bool(summary["errors"])
+    compared = ("log", "requests", "url", "documents", "words")
+    if args.baseline and compare(results, args.baseline, args.tolerance, config, compared):
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Serving-client pool sizing against the local stand-in server: throughput and latency per setting.
+
+Starts ``app.databricks.standin_server`` as a subprocess on a free port, then issues
+``--requests`` embedding calls, ``--clients`` at a time, through a fresh ``ServingClient``
+for each sweep point: every ``--connections`` pool size and ``--concurrency`` endpoint
+limit, plus one run without keep-alive and one with coalescing off. Runs of
+``--duplicates`` consecutive calls share a payload, so each point also reports how many
+calls actually reached the server. Run from the repository root.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+from harness import Summary, compare, print_table, summarize, use_scratch_storage, write_results
+
+use_scratch_storage()
+
+from app.databricks.serving_client import EMBEDDINGS, ServingClient  # noqa: E402
+
+MODEL = "bench-embeddings"
+
+
+def start_standin(args: argparse.Namespace) -> Tuple[str, "subprocess.Popen[bytes]"]:
+    """Launch the stand-in server on a free port and wait until it accepts connections."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    command = [sys.executable, "-m", "app.databricks.standin_server", "--port", str(port)]
+    command += ["--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms)]
+    command += ["--concurrency", str(args.server_concurrency)]
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, ["backend", os.environ.get("PYTHONPATH")]))}
+    process = subprocess.Popen(command, env=env)
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return f"http://127.0.0.1:{port}", process
+        except OSError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                raise RuntimeError("Stand-in server did not start")
+            time.sleep(0.1)
+
+
+def payloads(count: int, duplicates: int, batch: int) -> List[Dict[str, Any]]:
+    """Embedding requests in runs of ``duplicates`` identical consecutive payloads."""
+    return [{"input": [f"text {i // duplicates} {j}" for j in range(batch)]} for i in range(count)]
+
+
+def run(client: ServingClient, requests: List[Dict[str, Any]], clients: int) -> Summary:
+    """Issue ``requests`` from ``clients`` concurrent callers; latency is per call, queueing included."""
+    path = f"/serving-endpoints/{MODEL}/invocations"
+
+    async def drive() -> Tuple[List[float], float]:
+        queue = iter(requests)
+        latencies: List[float] = []
+
+        async def caller() -> None:
+            for payload in queue:
+                begin = time.perf_counter()
+                await client.call(EMBEDDINGS, path, payload)
+                latencies.append(time.perf_counter() - begin)
+
+        await client.call(EMBEDDINGS, path, {"input": ["warm-up"]})
+        started = time.perf_counter()
+        await asyncio.gather(*(caller() for _ in range(clients)))
+        return latencies, time.perf_counter() - started
+
+    latencies, elapsed = asyncio.run(drive())
+    return summarize(latencies, elapsed, len(requests))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=128, help="Concurrent callers")
+    parser.add_argument("--connections", default="4,16,64", help="Comma-separated pool sizes")
+    parser.add_argument("--concurrency", default="16,64", help="Comma-separated embedding concurrency limits")
+    parser.add_argument("--batch", type=int, default=8, help="Texts per embedding call")
+    parser.add_argument("--duplicates", type=int, default=2, help="Consecutive calls sharing one payload")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Stand-in latency per call")
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--server-concurrency", type=int, default=0, help="Stand-in capacity; 0 is unlimited")
+    parser.add_argument("--output", default="benchmarks/results/serving_pool.json")
+    parser.add_argument("--baseline", help="Serving-pool results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed fractional regression")
+    args = parser.parse_args()
+
+    url, server = start_standin(args)
+    requests = payloads(args.requests, args.duplicates, args.batch)
+    connections = [int(value) for value in args.connections.split(",") if value.strip()]
+    limits = [int(value) for value in args.concurrency.split(",") if value.strip()]
+    points = [(size, limit, 30.0, True) for size in connections for limit in limits]
+    points += [(max(connections), max(limits), 0.0, True), (max(connections), max(limits), 30.0, False)]
+
+    results: Dict[str, Summary] = {}
+    upstream: Dict[str, int] = {}
+    try:
+        for size, limit, keepalive, coalesce in points:
+            label = f"serving.embed conn={size} limit={limit}"
+            label += "" if keepalive else " no-keepalive"
+            label += "" if coalesce else " no-coalesce"
+            client = ServingClient(
+                url, "bench", {EMBEDDINGS: limit}, max_connections=size, keepalive_seconds=keepalive, coalesce=coalesce
+            )
+            try:
+                results[label] = run(client, requests, args.clients)
+            finally:
+                client.close()
+            upstream[label] = client.stats["requests"] - 1  # Minus the warm-up call.
+    finally:
+        server.terminate()
+        server.wait()
+
+    print_table(results)
+    print(f"\n{'sweep point':44s} {'server calls':>12s} {'of':>6s}")
+    for label, calls in upstream.items():
+        print(f"{label:44s} {calls:12d} {args.requests:6d}")
+    config = {**vars(args), "server_calls": upstream}
+    write_results(args.output, results, config)
+    keys = ("requests", "clients", "batch", "duplicates", "latency_ms", "server_concurrency")
+    if args.baseline and compare(results, args.baseline, args.tolerance, config, keys):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Cold-start cost of the API: import time, startup, time to ready and first query, plus an import-time report.
+
+Each run is a fresh interpreter (so nothing is already imported or cached) serving the
+app in-process over an ASGI transport against scratch storage.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from harness import compare, print_table, summarize, write_results
+
+PROBE = r"""
+import asyncio, json, time
+started = time.perf_counter()
+from app.main import app
+from app.api import health
+imported = time.perf_counter()
+import httpx
+
+async def main():
+    async with app.router.lifespan_context(app):
+        up = time.perf_counter()
+        await health.readiness.wait()
+        ready = time.perf_counter()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+            response = await client.post("/query/", json={"query": "cold start"})
+            response.raise_for_status()
+        answered = time.perf_counter()
+    print(json.dumps({
+        "import_s": imported - started,
+        "startup_s": up - imported,
+        "ready_s": ready - started,
+        "first_query_s": answered - ready,
+        "status": health.readiness.status,
+    }))
+
+asyncio.run(main())
+"""
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def probe_environment() -> Dict[str, str]:
+    scratch = tempfile.mkdtemp(prefix="rag_startup_")
+    env = dict(os.environ)
+    env.setdefault("LOCAL_DELTA_PATH", os.path.join(scratch, "delta"))
+    env.setdefault("LOCAL_VECTOR_STORE_PATH", os.path.join(scratch, "vectors.f32"))
+    env.setdefault("LEXICAL_INDEX_PATH", os.path.join(scratch, "lexical"))
+    env.setdefault("FINGERPRINT_STORE_PATH", os.path.join(scratch, "fingerprints.sqlite"))
+    env.setdefault("PIPELINE_ENABLED", "false")
+    return env
+
+
+def run_probe() -> Dict[str, float]:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE], env=probe_environment(), capture_output=True, text=True, check=False
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Startup probe failed:\n{result.stderr[-4000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def import_report(top: int) -> Tuple[float, List[Tuple[str, float]], List[Tuple[str, float]]]:
+    """Total ``import app.main`` time, self time per top-level package, and slowest app modules."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=probe_environment(),
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    by_package: Dict[str, float] = defaultdict(float)
+    app_modules: List[Tuple[str, float]] = []
+    total = 0.0
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = int(match[1]), int(match[2]), match[3], match[4]
+        by_package[module.split(".")[0]] += self_us / 1e6
+        if module == "app.main":
+            total = cumulative_us / 1e6
+        elif module.startswith("app.") and len(indent) <= 2:
+            app_modules.append((module, cumulative_us / 1e6))
+    packages = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    return total, packages, sorted(app_modules, key=lambda item: item[1], reverse=True)[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to start")
+    parser.add_argument("--top", type=int, default=15, help="Rows in the import-time report")
+    parser.add_argument("--output", default="benchmarks/results/startup.json")
+    parser.add_argument("--baseline", help="Startup results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed fractional regression")
+    args = parser.parse_args()
+
+    total, packages, app_modules = import_report(args.top)
+    print(f"import app.main: {total * 1000:.0f} ms")
+    print(f"{'package (self time)':44s} {'ms':>9s}")
+    for name, seconds in packages:
+        print(f"{name:44s} {seconds * 1000:9.1f}")
+    print(f"{'app module (cumulative, direct imports)':44s} {'ms':>9s}")
+    for name, seconds in app_modules:
+        print(f"{name:44s} {seconds * 1000:9.1f}")
+
+    runs = [run_probe() for _ in range(args.runs)]
+    unready = [run["status"] for run in runs if run["status"] != "ok"]
+    if unready:
+        raise SystemExit(f"Warm-up did not reach ready: {unready}")
+    results = {
+        f"startup.{phase} [runs]": summarize([run[f"{phase}_s"] for run in runs], 1.0, 0)
+        for phase in ("import", "startup", "ready", "first_query")
+    }
+    print_table(results)
+    config = {
+        **vars(args),
+        "import_ms": total * 1000,
+        "import_by_package_ms": {name: seconds * 1000 for name, seconds in packages},
+    }
+    write_results(args.output, results, config)
+    if args.baseline and compare(results, args.baseline, args.tolerance, config, ("runs",)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
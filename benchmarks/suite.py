@@ -0,0 +1,245 @@
+"""Benchmark suite for the RAG pipeline: text processing, embedding, index build, search and /query.
+
+Reports throughput and p50/p95/p99 latency per benchmark, writes them as JSON and, with
+``--baseline``, exits non-zero when throughput drops or p95 latency rises by more than
+``--tolerance`` against a stored results file.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Sequence
+
+from harness import Summary, compare, measure, print_table, summarize, use_scratch_storage, write_results
+
+SCRATCH = use_scratch_storage()
+
+import numpy as np  # noqa: E402
+
+from corpus import iter_documents, make_queries  # noqa: E402
+
+from app.config import get_settings  # noqa: E402
+from app.databricks import lexical_index, vector_search  # noqa: E402
+from app.databricks.lexical_index import LexicalIndex  # noqa: E402
+from app.databricks.local_index import IndexRow, LocalVectorIndex  # noqa: E402
+from app.models.chunk import Chunk  # noqa: E402
+from app.models.document import Document  # noqa: E402
+from app.services.chunking_service import build_chunks  # noqa: E402
+from app.utils import chunker, text_utils  # noqa: E402
+
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "quick": {"documents": 100, "words": 1000, "sizes": [2_000, 10_000], "dims": [32, 128], "queries": 50},
+    "full": {"documents": 200, "words": 2000, "sizes": [10_000, 100_000], "dims": [128, 768], "queries": 200},
+}
+
+
+def load_documents(documents: int, words: int) -> List[Document]:
+    return [
+        Document(
+            id=str(record["id"]),
+            name=str(record["name"]),
+            source_path=str(record["name"]),
+            raw_text=str(record["text"]),
+            cleaned_text=text_utils.normalize_text(str(record["text"])),
+            metadata=dict(record["metadata"]),  # type: ignore[arg-type]
+        )
+        for record in iter_documents(documents, words)
+    ]
+
+
+def chunk_corpus(documents: Sequence[Document]) -> List[Chunk]:
+    settings = get_settings()
+    chunks: List[Chunk] = []
+    for document in documents:
+        spans = chunker.iter_chunks(document.cleaned_text, settings.chunk_size, settings.chunk_overlap)
+        chunks.extend(build_chunks(document, spans))
+    return chunks
+
+
+def bench_text(results: Dict[str, Summary], documents: Sequence[Document], repeat: int) -> None:
+    settings = get_settings()
+    raw = [document.raw_text for document in documents]
+    cleaned = [document.cleaned_text for document in documents]
+    megabytes = sum(len(text.encode("utf-8")) for text in raw) / 1e6
+    # Throughput in MB/s; latency is per pass over the corpus.
+    results["text.normalize_text [MB]"] = measure(
+        lambda: [text_utils.normalize_text(text) for text in raw], repeat, megabytes
+    )
+    results["text.chunk_text [MB]"] = measure(
+        lambda: [text_utils.chunk_text(text, settings.chunk_size, settings.chunk_overlap) for text in cleaned],
+        repeat,
+        megabytes,
+    )
+    for boundary in ("sentence", "paragraph"):
+        results[f"text.iter_chunks {boundary} [MB]"] = measure(
+            lambda: [
+                list(chunker.iter_chunks(text, settings.chunk_size, settings.chunk_overlap, boundary))
+                for text in cleaned
+            ],
+            repeat,
+            megabytes,
+        )
+
+
+def bench_embedding(results: Dict[str, Summary], chunks: Sequence[Chunk], repeat: int) -> None:
+    model = get_settings().embedding_model
+    texts = [chunk.content for chunk in chunks]
+    results["embed.embed_text [texts]"] = measure(
+        lambda: [vector_search.embed_text(text, model) for text in texts], repeat, len(texts)
+    )
+    results["embed.embed_batch [texts]"] = measure(lambda: vector_search.embed_batch(texts, model), repeat, len(texts))
+
+
+def bench_index_build(
+    results: Dict[str, Summary], chunks: Sequence[Chunk], sizes: Sequence[int], dims: Sequence[int]
+) -> None:
+    rng = np.random.default_rng(0)
+    for dim in dims:
+        for size in sizes:
+            records = synthetic_rows(size)
+            vectors = rng.standard_normal((size, dim), dtype=np.float32)
+            path = os.path.join(SCRATCH, f"build-{dim}-{size}.f32")
+            started = time.perf_counter()
+            LocalVectorIndex(path).upsert(records, vectors)
+            elapsed = time.perf_counter() - started
+            results[f"index.build vector n={size} dim={dim} [rows]"] = summarize([elapsed], elapsed, size)
+    started = time.perf_counter()
+    LexicalIndex(os.path.join(SCRATCH, "build-lexical")).add(chunks)
+    elapsed = time.perf_counter() - started
+    results["index.build lexical [chunks]"] = summarize([elapsed], elapsed, len(chunks))
+
+
+def bench_search(
+    results: Dict[str, Summary], sizes: Sequence[int], dims: Sequence[int], queries: int, top_k: int
+) -> None:
+    for dim in dims:
+        vectors = np.random.default_rng(1).standard_normal((queries, dim), dtype=np.float32)
+        for size in sizes:
+            index = LocalVectorIndex(os.path.join(SCRATCH, f"build-{dim}-{size}.f32"))
+            results[f"search.vector n={size} dim={dim} [queries]"] = timed_each(
+                [lambda vector=vector: index.search(vector, top_k) for vector in vectors]
+            )
+            results[f"search.vector_batch n={size} dim={dim} [queries]"] = measure(
+                lambda: index.search_batch(vectors, top_k), 3, queries
+            )
+    lexical = LexicalIndex(os.path.join(SCRATCH, "build-lexical"))
+    results["search.lexical [queries]"] = timed_each(
+        [lambda query=query: lexical.search(query, top_k) for query in make_queries(queries)]
+    )
+
+
+def bench_query(results: Dict[str, Summary], chunks: Sequence[Chunk], queries: int, concurrency: int) -> None:
+    """End-to-end ``POST /query`` through the ASGI app in-process (no sockets)."""
+    import httpx
+
+    from app.main import app
+
+    seed_index(chunks)
+    payloads = [{"query": query, "top_k": 5} for query in make_queries(queries, seed=7)]
+
+    async def run() -> None:
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+                async def post(payload: Dict[str, Any]) -> float:
+                    started = time.perf_counter()
+                    response = await client.post("/query/", json=payload)
+                    response.raise_for_status()
+                    return time.perf_counter() - started
+
+                await post(payloads[0])  # Warm caches, the thread pool and the telemetry worker.
+                started = time.perf_counter()
+                latencies = [await post(payload) for payload in payloads]
+                results["query.e2e sequential [requests]"] = summarize(
+                    latencies, time.perf_counter() - started, len(payloads)
+                )
+                semaphore = asyncio.Semaphore(concurrency)
+
+                async def bounded(payload: Dict[str, Any]) -> float:
+                    async with semaphore:
+                        return await post(payload)
+
+                fresh = [{**payload, "query": payload["query"] + " again"} for payload in payloads]
+                started = time.perf_counter()
+                latencies = list(await asyncio.gather(*(bounded(payload) for payload in fresh)))
+                results[f"query.e2e concurrency={concurrency} [requests]"] = summarize(
+                    latencies, time.perf_counter() - started, len(fresh)
+                )
+
+    asyncio.run(run())
+
+
+def seed_index(chunks: Sequence[Chunk]) -> None:
+    """Load chunks into the service's vector and lexical indexes without MLflow runs."""
+    model = get_settings().embedding_model
+    vector_search.upsert_embeddings(list(chunks), vector_search.embed_batch([chunk.content for chunk in chunks], model))
+    lexical_index.index_chunks(chunks)
+
+
+def synthetic_rows(size: int) -> List[IndexRow]:
+    return [
+        IndexRow(row=-1, chunk_id=f"c{i}", document_id=f"d{i // 10}", chunk_index=i % 10, content=f"chunk {i}")
+        for i in range(size)
+    ]
+
+
+def timed_each(calls: Sequence[Callable[[], Any]]) -> Summary:
+    """Latency of each call individually (one query per call)."""
+    calls[0]()
+    latencies: List[float] = []
+    started = time.perf_counter()
+    for call in calls:
+        begin = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - begin)
+    return summarize(latencies, time.perf_counter() - started, len(calls))
+
+
+def parse_ints(spec: str) -> List[int]:
+    return [int(value) for value in spec.split(",") if value.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    parser.add_argument("--only", default="text,embed,index,search,query", help="Comma-separated groups to run")
+    parser.add_argument("--sizes", type=parse_ints, help="Index sizes, e.g. 10000,100000 (overrides the profile)")
+    parser.add_argument("--dims", type=parse_ints, help="Vector widths, e.g. 128,768 (overrides the profile)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=16, help="In-flight /query requests")
+    parser.add_argument("--output", default="benchmarks/results/latest.json")
+    parser.add_argument("--baseline", help="Results file to compare against, e.g. benchmarks/results/baseline.json")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed fractional regression")
+    args = parser.parse_args()
+    profile = PROFILES[args.profile]
+    sizes, dims = args.sizes or profile["sizes"], args.dims or profile["dims"]
+    groups = set(args.only.split(","))
+
+    documents = load_documents(profile["documents"], profile["words"])
+    chunks = chunk_corpus(documents)
+    print(f"Profile {args.profile}: {len(documents)} documents, {len(chunks)} chunks, scratch {SCRATCH}")
+    results: Dict[str, Summary] = {}
+    if "text" in groups:
+        bench_text(results, documents, args.repeat)
+    if "embed" in groups:
+        bench_embedding(results, chunks, args.repeat)
+    if "index" in groups or "search" in groups:
+        bench_index_build(results, chunks, sizes, dims)
+    if "search" in groups:
+        bench_search(results, sizes, dims, profile["queries"], args.top_k)
+    if "query" in groups:
+        bench_query(results, chunks, profile["queries"], args.concurrency)
+
+    print_table(results)
+    config = {**vars(args), "sizes": sizes, "dims": dims, "documents": len(documents), "chunks": len(chunks)}
+    write_results(args.output, results, config)
+    compared = ("profile", "documents", "chunks", "sizes", "dims", "top_k", "concurrency")
+    if args.baseline and compare(results, args.baseline, args.tolerance, config, compared):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
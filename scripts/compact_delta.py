@@ -0,0 +1,23 @@
+"""Compact the local Delta tables and print their version history."""
+import argparse
+
+from app.databricks import delta_tables
+
+
+def main() -> None:
+    """Merge small Parquet files per partition in every local table."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--target-rows", type=int, default=100_000, help="Files below this row count are merged")
+    parser.add_argument("--history", action="store_true", help="Print each table's commit history afterwards")
+    args = parser.parse_args()
+
+    for table, version in delta_tables.compact_all(args.target_rows).items():
+        status = f"compacted to version {version}" if version is not None else "nothing to compact"
+        print(f"{table}: {status}")
+        if args.history:
+            for entry in delta_tables.get_table(table).history():
+                print(f"  v{entry['version']} {entry['operation']} @ {entry['timestamp']}")
+
+
+if __name__ == "__main__":
+    main()
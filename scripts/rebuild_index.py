@@ -0,0 +1,25 @@
+"""Rebuild the local vector index from embedded_chunks as a new generation."""
+import argparse
+
+from app.databricks import vector_search
+
+
+def main() -> None:
+    """Build the next index generation and swap it in, or apply only new embeddings."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--delta-version", type=int, help="Rebuild from this embedded_chunks version")
+    parser.add_argument(
+        "--incremental", action="store_true", help="Only apply embeddings appended since the live generation"
+    )
+    args = parser.parse_args()
+
+    if args.incremental:
+        print(f"applied {vector_search.sync_index()} rows")
+    else:
+        vector_search.rebuild_index(args.delta_version)
+    for key, value in vector_search.get_index_generations().status().items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()